@@ -0,0 +1,101 @@
+"""
+Benchmarks listing and bulk action APIs against a seeded redis, e.g.
+
+    python -m benchmarks --queues 100 --jobs 1000 --output results.json
+
+Results are printed as JSON, compare files of two versions to spot regressions
+"""
+
+import json
+import logging
+import platform
+import threading
+
+import click
+import redis
+
+from benchmarks.runner import run_benchmark
+from rqmonitor.version import VERSION
+
+
+def start_fakeredis():
+    """
+    :return: URL of an in-process fakeredis server, on a free port
+    """
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        raise click.UsageError("--fakeredis needs fakeredis>=2.23 to be installed")
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return "redis://{0}:{1}/0".format(host, port)
+
+
+@click.command()
+@click.option(
+    "-u",
+    "--redis-url",
+    default="redis://127.0.0.1:6379/15",
+    help="URL of an empty Redis database, flushed by the benchmark",
+)
+@click.option(
+    "--fakeredis",
+    "use_fakeredis",
+    is_flag=True,
+    default=False,
+    help="Run against an in-process fakeredis server instead of --redis-url",
+)
+@click.option("--queues", default=10, type=int, help="Number of queues")
+@click.option(
+    "--jobs", default=100, type=int, help="Jobs in every registry of every queue"
+)
+@click.option("--workers", default=10, type=int, help="Number of workers")
+@click.option("--payload-size", default=100, type=int, help="Bytes of job argument")
+@click.option("--runs", default=20, type=int, help="Requests per listing API")
+@click.option("--bulk-runs", default=3, type=int, help="Requests per bulk action API")
+@click.option("-o", "--output", default=None, help="File to write JSON results to")
+def main(
+    redis_url,
+    use_fakeredis,
+    queues,
+    jobs,
+    workers,
+    payload_size,
+    runs,
+    bulk_runs,
+    output,
+):
+    """Measure latency, Redis commands and memory of rqmonitor APIs."""
+    logging.disable(logging.ERROR)
+    if use_fakeredis:
+        redis_url = start_fakeredis()
+    connection = redis.Redis.from_url(redis_url)
+    try:
+        results = run_benchmark(
+            connection,
+            redis_url,
+            queues=queues,
+            jobs=jobs,
+            workers=workers,
+            payload_size=payload_size,
+            runs=runs,
+            bulk_runs=bulk_runs,
+        )
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    results.update(
+        version=VERSION,
+        python=platform.python_version(),
+        redis="fakeredis" if use_fakeredis else redis_url,
+    )
+    payload = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload + "\n")
+    click.echo(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import math
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+from redis.client import Pipeline, Redis
+
+from benchmarks.seed import queue_names, seed
+from rqmonitor import utils
+from rqmonitor.cli import create_app_with_blueprint
+from rqmonitor.utils import LuaScript, list_all_possible_job_status
+
+# threads doing work on behalf of a request, whose commands are charged to it
+REQUEST_THREAD_PREFIXES = ("rqmonitor-fanout", "rqmonitor-bulk-task")
+
+COMMANDS_NOTE = (
+    "redis_commands count commands sent by the request thread and by the "
+    "fanout and bulk task threads working for it, background samplers are "
+    "left out. A Lua script run (EVALSHA) counts as a single command whatever "
+    "it does on the server"
+)
+
+
+class CommandCounter(object):
+    """
+    Counts redis commands, pipelined ones included, by wrapping redis-py while
+    entered. Only commands sent by the thread which entered the counter and by
+    threads whose name starts with one of thread_prefixes are counted, so that
+    background samplers running meanwhile are not charged to measured
+    requests. A Lua script run counts as a single command whatever it does on
+    the server
+    """
+
+    def __init__(self, thread_prefixes=REQUEST_THREAD_PREFIXES):
+        """
+        :param thread_prefixes: name prefixes of other threads counted
+        """
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.counts = Counter()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._execute_command = None
+        self._execute_pipeline = None
+
+    def __enter__(self):
+        counter = self
+        self._thread = threading.current_thread()
+        self._execute_command = execute_command = Redis.execute_command
+        self._execute_pipeline = execute_pipeline = Pipeline.execute
+
+        def counting_execute_command(client, *args, **options):
+            counter.add([args])
+            return execute_command(client, *args, **options)
+
+        def counting_execute_pipeline(pipeline, *args, **kwargs):
+            counter.add([command_args for command_args, _ in pipeline.command_stack])
+            return execute_pipeline(pipeline, *args, **kwargs)
+
+        Redis.execute_command = counting_execute_command
+        Pipeline.execute = counting_execute_pipeline
+        return self
+
+    def __exit__(self, *exc_info):
+        Redis.execute_command = self._execute_command
+        Pipeline.execute = self._execute_pipeline
+
+    def counts_thread(self, thread):
+        """
+        :return: whether commands sent by thread are counted
+        """
+        return thread is self._thread or thread.name.startswith(self.thread_prefixes)
+
+    def add(self, commands):
+        if not self.counts_thread(threading.current_thread()):
+            return
+        with self._lock:
+            for command_args in commands:
+                self.counts[str(command_args[0]).upper()] += 1
+
+    def take(self):
+        """
+        :return: counts of commands by name since previous take
+        """
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+
+def peak_rss():
+    """
+    :return: highest resident set size of the process so far, in bytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in kilobytes on Linux, in bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def percentile(values, q):
+    """
+    :return: nearest-rank q-th percentile of values
+    """
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def load_scripts(connection):
+    """
+    Loads all Lua scripts of rqmonitor up front, for first runs not to pay
+    for SCRIPT LOAD
+    """
+    for value in vars(utils).values():
+        if isinstance(value, LuaScript):
+            connection.script_load(value.script)
+
+
+def create_benchmark_app(redis_url):
+    """
+    :return: app configured for every request to do its full work, with
+             timeseries sampling disabled. Memory estimation and search
+             indexing, started by requests, run in threads whose commands
+             CommandCounter leaves out, see stop_background_samplers
+    """
+    app = create_app_with_blueprint()
+    app.config.update(
+        RQ_MONITOR_REDIS_URL=redis_url,
+        RQ_MONITOR_SNAPSHOT_TTL=0,
+        RQ_MONITOR_METRICS_TTL=0,
+        RQ_MONITOR_ANALYTICS_TTL=0,
+        RQ_MONITOR_TIMESERIES_INTERVAL=0,
+        # bulk action requests answer once their task is done
+        RQ_MONITOR_TASK_WAIT=3600,
+    )
+    return app
+
+
+def stop_background_samplers(app):
+    """
+    Stops memory estimators and search indexes started by requests, waiting
+    for memory estimation to exit, for their load on redis not to skew
+    latencies of the endpoints measured next
+    """
+    for index in app.job_search_indexes:
+        index.stop()
+    for estimator in app.redis_memory_estimators:
+        estimator.stop()
+        estimator.join()
+
+
+def listing_endpoints(queues, jobs):
+    """
+    :return: (name, path, query string) of every listing API
+    """
+    statuses = list_all_possible_job_status()
+    total_jobs = queues * len(statuses) * jobs
+    jobs_query = {
+        "queues[]": queue_names(queues),
+        "jobstatus[]": statuses,
+        "start": 0,
+        "length": 50,
+        "draw": 1,
+    }
+    return [
+        # memory estimation started by this one is stopped before the others
+        ("GET /redis/memory", "/redis/memory", {}),
+        ("GET /queues", "/queues", {}),
+        ("GET /workers", "/workers", {}),
+        ("GET /registries", "/registries", {}),
+        ("GET /jobs", "/jobs", jobs_query),
+        (
+            "GET /jobs (last page)",
+            "/jobs",
+            dict(jobs_query, start=max(0, total_jobs - 50)),
+        ),
+        ("GET /metrics", "/metrics", {}),
+        (
+            "GET /queues/analytics",
+            "/queues/analytics",
+            {"queues[]": queue_names(queues)},
+        ),
+    ]
+
+
+def bulk_endpoints(queues):
+    """
+    :return: (name, path, form) of every bulk action API
+    """
+    all_queues = {"queues[]": queue_names(queues)}
+    return [
+        ("POST /jobs/requeue/all", "/jobs/requeue/all", all_queues),
+        ("POST /jobs/cancel/all", "/jobs/cancel/all", all_queues),
+        (
+            "POST /jobs/delete/all",
+            "/jobs/delete/all",
+            dict(all_queues, **{"jobstatus[]": list_all_possible_job_status()}),
+        ),
+        ("POST /queues/empty/all", "/queues/empty/all", {}),
+        ("POST /queues/delete/all", "/queues/delete/all", {}),
+    ]
+
+
+def measure(send, runs, counter, before_run=None):
+    """
+    :param send: callable sending one request, returning its response
+    :param before_run: callable run before every request, left out of results
+    :return: latency percentiles, mean redis commands and peak RSS growth
+    """
+    latencies = []
+    commands = Counter()
+    rss_before = peak_rss()
+    for _ in range(runs):
+        if before_run is not None:
+            before_run()
+        counter.take()
+        started = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - started)
+        commands.update(counter.take())
+        if response.status_code >= 300:
+            raise RuntimeError(
+                "Request failed with {0}: {1}".format(
+                    response.status_code, response.get_data(as_text=True)[:200]
+                )
+            )
+    return {
+        "runs": runs,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "redis_commands": round(sum(commands.values()) / runs, 1),
+        "redis_commands_by_name": {
+            name: round(count / runs, 1) for name, count in commands.most_common()
+        },
+        "peak_rss_growth_bytes": peak_rss() - rss_before,
+    }
+
+
+def run_benchmark(
+    connection, redis_url, queues, jobs, workers, payload_size, runs, bulk_runs
+):
+    """
+    Seeds redis with the given shape, then measures every listing API runs
+    times and every bulk action API bulk_runs times, reseeding before each
+    bulk action. Redis database must be empty, it is flushed in between and
+    after
+
+    :return: JSON serializable results
+    """
+    if connection.dbsize():
+        raise RuntimeError("Redis database is not empty, refusing to flush it")
+
+    shape = dict(queues=queues, jobs=jobs, workers=workers, payload_size=payload_size)
+
+    def reseed():
+        connection.flushdb()
+        seed(connection, **shape)
+
+    app = create_benchmark_app(redis_url)
+    client = app.test_client()
+    results = {"shape": shape, "redis_commands_note": COMMANDS_NOTE, "endpoints": {}}
+    try:
+        with CommandCounter() as counter:
+            load_scripts(connection)
+            results["seed_seconds"] = round(seed(connection, **shape), 3)
+            for name, path, query in listing_endpoints(queues, jobs):
+                send = partial(client.get, path, query_string=query)
+                # first request sets the app up and warms caches of redis-py
+                send()
+                results["endpoints"][name] = measure(send, runs, counter)
+                stop_background_samplers(app)
+
+            for name, path, form in bulk_endpoints(queues):
+                send = partial(client.post, path, data=form)
+                results["endpoints"][name] = measure(
+                    send, bulk_runs, counter, before_run=reseed
+                )
+    finally:
+        connection.flushdb()
+    results["peak_rss_bytes"] = peak_rss()
+    return results
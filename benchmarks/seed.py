@@ -0,0 +1,76 @@
+import time
+
+from rq.job import Job
+from rq.queue import Queue
+from rq.worker import Worker
+
+from rqmonitor.utils import REGISTRY_CLASSES
+
+# jobs written per pipeline while seeding
+SEED_BATCH_SIZE = 500
+# registry entries are kept for longer than any benchmark run
+SEED_TTL = 24 * 3600
+
+
+def noop(payload):
+    pass
+
+
+def queue_names(queues):
+    return ["bench-queue-{0}".format(i) for i in range(queues)]
+
+
+def seed(connection, queues, jobs, workers, payload_size):
+    """
+    Fills redis with a known shape of RQ data, without running any job
+
+    :param queues: count of queues
+    :param jobs: count of jobs in every registry (queued included) of every queue
+    :param workers: count of workers, half of them busy, listening on all queues
+    :param payload_size: bytes of the argument every job is created with
+    :return: seconds spent seeding
+    """
+    started = time.perf_counter()
+    payload = "x" * payload_size
+    statuses = ("queued",) + tuple(REGISTRY_CLASSES)
+    expire_at = time.time() + SEED_TTL
+
+    pipeline = connection.pipeline(transaction=False)
+    buffered = 0
+    for queue_name in queue_names(queues):
+        queue = Queue(queue_name, connection=connection)
+        pipeline.sadd(Queue.redis_queues_keys, queue.key)
+        for status in statuses:
+            for _ in range(jobs):
+                job = Job.create(
+                    func=noop,
+                    args=(payload,),
+                    connection=connection,
+                    status=status,
+                    origin=queue_name,
+                )
+                job.save(pipeline=pipeline)
+                if status == "queued":
+                    pipeline.rpush(queue.key, job.id)
+                else:
+                    score = "+inf" if status == "deferred" else expire_at
+                    registry_key = REGISTRY_CLASSES[status].key_template.format(
+                        queue_name
+                    )
+                    pipeline.zadd(registry_key, {job.id: score})
+                buffered += 1
+                if buffered >= SEED_BATCH_SIZE:
+                    pipeline.execute()
+                    buffered = 0
+    pipeline.execute()
+
+    worker_queues = [
+        Queue(queue_name, connection=connection) for queue_name in queue_names(queues)
+    ]
+    for i in range(workers):
+        worker = Worker(
+            worker_queues, name="bench-worker-{0}".format(i), connection=connection
+        )
+        worker.register_birth()
+        worker.set_state("busy" if i % 2 else "idle")
+    return time.perf_counter() - started
@@ -0,0 +1,733 @@
+import asyncio
+import base64
+import io
+import json
+import logging
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Empty
+from urllib.parse import parse_qs
+
+from rq.compat import as_text
+from rq.queue import Queue
+from rq.suspension import WORKERS_SUSPENDED
+from rq.worker import Worker
+from werkzeug.http import parse_accept_header
+
+from rqmonitor.bp import (
+    get_redis_urls,
+    get_redis_pool_options,
+    merge_instance_rows,
+    monitor_blueprint,
+    serialize_worker,
+)
+from rqmonitor.cache import Snapshot
+from rqmonitor.compression import available_encodings
+from rqmonitor.decorators import credentials_match, snapshot_key
+from rqmonitor.defaults import (
+    RQ_MONITOR_COMPRESS_MIN_SIZE,
+    RQ_MONITOR_SNAPSHOT_TTL,
+    RQ_MONITOR_JOBS_OVERFETCH,
+    RQ_MONITOR_SEARCH_INDEX_WAIT,
+    RQ_MONITOR_FANOUT_TIMEOUT,
+    RQ_MONITOR_STREAM_KEEPALIVE,
+    RQ_MONITOR_STREAM_WORKERS,
+)
+from rqmonitor.exceptions import RQMonitorException
+from rqmonitor.utils import (
+    WORKER_SNAPSHOT_FIELDS,
+    add_job_count_commands,
+    add_job_id_window_commands,
+    read_job_counts,
+    read_workers_snapshot,
+    page_job_ids,
+    add_job_row_commands,
+    read_job_rows,
+    parse_job_row_fields,
+    reformat_job_row,
+)
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:
+    # redis-py older than 4.2.0
+    aioredis = None
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+blocks = namedtuple("blocks", "queue registry count")
+
+
+def create_async_redis_connection(redis_url, **pool_options):
+    """
+    :param redis_url: Redis URL to connect to
+    :param pool_options: same as of utils.create_redis_connection
+    :return: asyncio Redis client backed by its own connection pool
+    """
+    if not pool_options:
+        return aioredis.Redis.from_url(redis_url)
+    connection_pool = aioredis.BlockingConnectionPool.from_url(
+        redis_url, **pool_options
+    )
+    return aioredis.Redis(connection_pool=connection_pool)
+
+
+async def list_queue_descriptors_async(queue_directory, connection):
+    """
+    :return: same as QueueDirectory.queues, cache being shared with Flask views
+    """
+    size = await connection.scard(Queue.redis_queues_keys)
+    queues = queue_directory.get_cached(connection, size)
+    if queues is None:
+        queue_keys = [
+            key
+            async for key in connection.sscan_iter(
+                Queue.redis_queues_keys, count=queue_directory.scan_count
+            )
+        ]
+        queues = queue_directory.update(connection, size, queue_keys)
+    return queues
+
+
+async def list_queues_async(queue_directory, connection):
+    """
+    :return: queue rows as returned by /queues
+    """
+    queues = await list_queue_descriptors_async(queue_directory, connection)
+    async with connection.pipeline(transaction=False) as pipeline:
+        for queue in queues:
+            pipeline.llen(queue.key)
+        job_counts = await pipeline.execute()
+    return [
+        {"queue_name": queue.name, "job_count": job_count}
+        for queue, job_count in zip(queues, job_counts)
+    ]
+
+
+async def list_workers_snapshot_async(connection):
+    """
+    :return: same as utils.list_workers_snapshot
+    """
+    worker_keys, suspended = await asyncio.gather(
+        connection.smembers(Worker.redis_workers_keys),
+        connection.exists(WORKERS_SUSPENDED),
+    )
+    worker_keys = sorted(as_text(key) for key in worker_keys)
+    async with connection.pipeline(transaction=False) as pipeline:
+        for worker_key in worker_keys:
+            pipeline.hmget(worker_key, *WORKER_SNAPSHOT_FIELDS)
+        worker_values = await pipeline.execute()
+    return read_workers_snapshot(worker_keys, worker_values, bool(suspended))
+
+
+async def job_counts_in_queues_registries_async(connection, queues, registries):
+    """
+    :return: same as utils.job_counts_in_queues_registries
+    """
+    async with connection.pipeline(transaction=False) as pipeline:
+        counts, lookups = add_job_count_commands(pipeline, queues, registries)
+        results = await pipeline.execute()
+    return read_job_counts(counts, lookups, results)
+
+
+async def resolve_jobs_async(connection, job_blocks, start, length, overfetch, fields):
+    """
+    Same as utils.resolve_jobs, paged by the same utils.page_job_ids, windows
+    of every round being read in one pipeline and jobs loaded in another
+    """
+    pager = page_job_ids(job_blocks, start, length, overfetch)
+    try:
+        windows = next(pager)
+        while True:
+            async with connection.pipeline(transaction=False) as pipeline:
+                add_job_id_window_commands(pipeline, windows)
+                windows = pager.send(await pipeline.execute())
+    except StopIteration as stop:
+        job_ids = stop.value
+    return await load_job_rows_async(connection, job_ids, fields)
+
+
+async def load_job_rows_async(connection, job_ids, fields):
+    """
+    :return: same as utils.load_job_rows
+    """
+    async with connection.pipeline(transaction=False) as pipeline:
+        row_fields = add_job_row_commands(pipeline, job_ids, fields)
+        results = await pipeline.execute()
+    return read_job_rows(job_ids, row_fields, results)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def build_wsgi_environ(scope, body):
+    """
+    :return: WSGI environ of ASGI http scope
+    """
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/{0}".format(scope.get("http_version", "1.1")),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin-1")
+        environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+def parse_if_none_match(header):
+    """
+    :return: set of entity tags in If-None-Match header, weakness dropped
+    """
+    etags = set()
+    for etag in header.split(","):
+        etag = etag.strip()
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        etags.add(etag.strip('"'))
+    return etags
+
+
+class AsyncRQMonitor(object):
+    """
+    ASGI application serving listing APIs (/queues, /workers, /jobs and
+    /redis/memory) on the event loop with redis.asyncio, independent redis
+    reads of a request being issued concurrently. Listings share snapshot
+    cache, ETags and request latencies with the Flask views. Every other
+    request is handed to the Flask app on a worker thread, so dashboard and
+    actions work exactly as in the WSGI mode.
+    """
+
+    def __init__(self, app, url_prefix="", username=None, password=None):
+        """
+        :param app: Flask app with rqmonitor blueprint registered
+        :param url_prefix: url prefix of the blueprint
+        :param username: HTTP Basic Auth username, not checked if None
+        :param password: HTTP Basic Auth password
+        """
+        if aioredis is None:
+            raise ImportError("Asyncio serving mode requires redis>=4.2.0")
+        self.app = app
+        self.url_prefix = url_prefix.rstrip("/")
+        self.username = username
+        self.password = password
+        self.connections = None
+        self._setup_lock = None
+        self._stream_executor = None
+        # listing snapshots being computed on the loop, awaited by requests
+        # asking for the same snapshot meanwhile
+        self._in_flight = {}
+        self.routes = {
+            "/queues": (self.list_queues_api, True),
+            "/workers": (self.list_workers_api, True),
+            "/jobs": (self.list_jobs_api, True),
+            "/redis/memory": (self.redis_memory_api, False),
+        }
+        self.streams = {"/stream": self.stream_api}
+
+    async def setup(self):
+        """
+        Runs setup of the Flask app (sync connections, memory estimators,
+        hostname resolver) and creates asyncio connections and the executor
+        relaying streamed Flask responses, once per process
+        """
+        if self._setup_lock is None:
+            self._setup_lock = asyncio.Lock()
+        async with self._setup_lock:
+            if self.connections is not None:
+                return
+            with self.app.app_context():
+                self.app.try_trigger_before_first_request_functions()
+                pool_options = get_redis_pool_options()
+                self.connections = [
+                    create_async_redis_connection(url, **pool_options)
+                    for url in get_redis_urls()
+                ]
+            # bounded apart from the default executor, so that long lived
+            # streams can't starve requests served by the Flask app
+            self._stream_executor = ThreadPoolExecutor(
+                max_workers=self.app.config.get(
+                    "RQ_MONITOR_STREAM_WORKERS", RQ_MONITOR_STREAM_WORKERS
+                ),
+                thread_name_prefix="rqmonitor-stream",
+            )
+
+    async def close(self):
+        if self.connections is not None:
+            for connection in self.connections:
+                await connection.connection_pool.disconnect()
+            self.connections = None
+        if self._stream_executor is not None:
+            self._stream_executor.shutdown(wait=False)
+            self._stream_executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+
+        path = None
+        if scope["method"] == "GET" and scope["path"].startswith(self.url_prefix):
+            path = scope["path"][len(self.url_prefix) :]
+        if path not in self.routes and path not in self.streams:
+            await self.call_wsgi(scope, receive, send)
+            return
+
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+        }
+        if not self.is_authorized(headers.get("authorization")):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": [
+                        (b"www-authenticate", b'Basic realm="RQ Monitor"'),
+                        (b"content-type", b"text/plain; charset=utf-8"),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b"Please login"})
+            return
+
+        args = parse_qs(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        started = time.perf_counter()
+        try:
+            await self.setup()
+            redis_instance_index = int(args.get("redis_instance_index", [0])[0])
+            if not 0 <= redis_instance_index < len(self.connections):
+                raise RQMonitorException(
+                    "Invalid redis instance index!", status_code=400
+                )
+            if path in self.streams:
+                stream = self.streams[path]
+            else:
+                view, cached = self.routes[path]
+                if cached:
+                    snapshot = await self.get_snapshot(
+                        snapshot_key(
+                            redis_instance_index,
+                            scope["path"],
+                            [(arg, value) for arg in args for value in args[arg]],
+                        ),
+                        partial(view, redis_instance_index, args),
+                    )
+                else:
+                    snapshot = Snapshot(await view(redis_instance_index, args))
+        except Exception as e:
+            # same as catch_global_exception
+            error = RQMonitorException(
+                **{
+                    key: getattr(e, key)
+                    for key in ("message", "status_code")
+                    if getattr(e, key, None) is not None
+                }
+            ).with_traceback(sys.exc_info()[2])
+            await self.send_json(
+                send, Snapshot(error.to_dict()), status=error.status_code
+            )
+            if path in self.routes:
+                self.observe_latency(path, started)
+            return
+
+        if path in self.streams:
+            await stream(redis_instance_index, receive, send)
+            return
+
+        etag = None
+        if cached:
+            # same as etag_conditional
+            etag = snapshot.fingerprint
+            if etag in parse_if_none_match(headers.get("if-none-match", "")):
+                await self.send_json(send, None, status=304, etag=etag)
+                self.observe_latency(path, started)
+                return
+        draw = None
+        if "draw" in snapshot.payload:
+            draw = int(args["draw"][0])
+        await self.send_json(
+            send,
+            snapshot,
+            etag=etag,
+            accept_encoding=headers.get("accept-encoding", ""),
+            draw=draw,
+        )
+        self.observe_latency(path, started)
+
+    async def get_snapshot(self, key, compute):
+        """
+        Same as SnapshotCache.get_or_compute for coroutines, the cache being
+        shared with Flask views. Requests asking for a snapshot being computed
+        on the loop await it instead of querying redis again
+
+        :param compute: coroutine function returning payload of snapshot
+        :return: cache.Snapshot
+        """
+        ttl = self.app.config.get("RQ_MONITOR_SNAPSHOT_TTL", RQ_MONITOR_SNAPSHOT_TTL)
+        if ttl <= 0:
+            return Snapshot(await compute())
+        snapshot = self.app.snapshot_cache.get(key, ttl)
+        if snapshot is not None:
+            return snapshot
+        computing = self._in_flight.get(key)
+        if computing is not None:
+            snapshot = await asyncio.shield(computing)
+            if snapshot is not None:
+                return snapshot
+            # computation failed, try on our own
+            return Snapshot(await compute())
+
+        computing = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        snapshot = None
+        try:
+            snapshot = Snapshot(await compute())
+            self.app.snapshot_cache.put(key, snapshot)
+            return snapshot
+        finally:
+            del self._in_flight[key]
+            computing.set_result(snapshot)
+
+    def observe_latency(self, path, started):
+        """
+        Same as bp.observe_request_latency, under endpoint of the Flask view
+        """
+        view = self.routes[path][0]
+        self.app.request_latencies.observe(
+            "{0}.{1}".format(monitor_blueprint.name, view.__name__),
+            "GET",
+            time.perf_counter() - started,
+        )
+
+    def is_authorized(self, authorization):
+        if not self.username:
+            return True
+        if authorization is None or not authorization.startswith("Basic "):
+            return False
+        try:
+            credentials = base64.b64decode(authorization[len("Basic ") :])
+            username, _, password = credentials.decode("utf-8").partition(":")
+        except (ValueError, UnicodeError):
+            return False
+        return credentials_match(username, password, self.username, self.password)
+
+    async def send_json(
+        self, send, snapshot, status=200, etag=None, accept_encoding="", draw=None
+    ):
+        """
+        :param snapshot: cache.Snapshot of payload, None for an empty body
+        :param accept_encoding: Accept-Encoding header of request, payload is
+                                compressed same as by bp.compress_response
+        :param draw: DataTables draw counter of the request, see Snapshot.render
+        """
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"cache-control", b"no-store"),
+            (b"vary", b"Accept-Encoding"),
+        ]
+        body = b"" if snapshot is None else snapshot.render(draw)
+        encoding = parse_accept_header(accept_encoding).best_match(
+            available_encodings()
+        )
+        min_size = self.app.config.get(
+            "RQ_MONITOR_COMPRESS_MIN_SIZE", RQ_MONITOR_COMPRESS_MIN_SIZE
+        )
+        compressed = encoding is not None and len(body) >= min_size
+        if compressed:
+            body = snapshot.encoded(encoding, draw)
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        if etag is not None:
+            # weakened once compressed, see bp.compress_response
+            etag = '{0}"{1}"'.format("W/" if compressed else "", etag)
+            headers.append((b"etag", etag.encode("latin-1")))
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def collect_rows(self, redis_instance_index, args, collect):
+        """
+        Same as bp.collect_rows, every instance being read concurrently on the
+        event loop when all_instances is requested
+        """
+        if args.get("all_instances", ["false"])[0].lower() != "true":
+            return {"data": await collect(self.connections[redis_instance_index])}
+
+        timeout = self.app.config.get(
+            "RQ_MONITOR_FANOUT_TIMEOUT", RQ_MONITOR_FANOUT_TIMEOUT
+        )
+        instance_results = await asyncio.gather(
+            *(
+                asyncio.wait_for(collect(connection), timeout)
+                for connection in self.connections
+            ),
+            return_exceptions=True
+        )
+        results = []
+        for index, result in enumerate(instance_results):
+            if isinstance(result, asyncio.TimeoutError):
+                results.append(
+                    (index, None, "Timed out after {0} secs".format(timeout))
+                )
+            elif isinstance(result, Exception):
+                results.append((index, None, str(result)))
+            else:
+                results.append((index, result, None))
+        return merge_instance_rows(self.app.config["RQ_MONITOR_REDIS_URL"], results)
+
+    async def list_queues_api(self, redis_instance_index, args):
+        return await self.collect_rows(
+            redis_instance_index,
+            args,
+            partial(list_queues_async, self.app.queue_directory),
+        )
+
+    async def list_workers_api(self, redis_instance_index, args):
+        async def list_worker_rows(connection):
+            workers = await list_workers_snapshot_async(connection)
+            return [
+                serialize_worker(worker, self.app.hostname_resolver)
+                for worker in workers
+            ]
+
+        return await self.collect_rows(redis_instance_index, args, list_worker_rows)
+
+    async def list_jobs_api(self, redis_instance_index, args):
+        connection = self.connections[redis_instance_index]
+        fields = parse_job_row_fields(args.get("fields", [None])[0])
+        start = int(args["start"][0])
+        length = int(args["length"][0])
+        draw = int(args["draw"][0])
+        requested_queues = args.get("queues[]", [])
+        requested_job_status = args.get("jobstatus[]", [])
+
+        if not requested_queues or not requested_job_status:
+            return {"draw": draw, "recordsTotal": 0, "recordsFiltered": 0, "data": []}
+
+        job_counts = await job_counts_in_queues_registries_async(
+            connection, requested_queues, requested_job_status
+        )
+        job_blocks = [
+            blocks(queue, job_status, job_counts[queue][job_status])
+            for queue in requested_queues
+            for job_status in requested_job_status
+        ]
+        total_job_count = sum(block.count for block in job_blocks)
+
+        filtered_job_count = total_job_count
+        search = args.get("search[value]", [""])[0]
+        if search.strip():
+            index = self.app.job_search_indexes[redis_instance_index]
+            index.start()
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                index.wait_ready,
+                self.app.config.get(
+                    "RQ_MONITOR_SEARCH_INDEX_WAIT", RQ_MONITOR_SEARCH_INDEX_WAIT
+                ),
+            )
+            matching_job_ids = index.search(
+                search, requested_queues, requested_job_status
+            )
+            filtered_job_count = len(matching_job_ids)
+            jobs = await load_job_rows_async(
+                connection, matching_job_ids[start : start + length], fields
+            )
+        else:
+            jobs = await resolve_jobs_async(
+                connection,
+                job_blocks,
+                start,
+                length,
+                self.app.config.get(
+                    "RQ_MONITOR_JOBS_OVERFETCH", RQ_MONITOR_JOBS_OVERFETCH
+                ),
+                fields,
+            )
+        return {
+            "draw": draw,
+            "recordsTotal": total_job_count,
+            "recordsFiltered": filtered_job_count,
+            "data": [reformat_job_row(job, fields) for job in jobs],
+        }
+
+    async def redis_memory_api(self, redis_instance_index, args):
+        # estimation keeps running in its background thread, serving is non blocking
+        estimator = self.app.redis_memory_estimators[redis_instance_index]
+        estimator.start()
+        if args.get("refresh", [None])[0] == "true":
+            estimator.request_refresh()
+        return estimator.to_dict()
+
+    async def stream_api(self, redis_instance_index, receive, send):
+        """
+        Same as bp.stream_api, deltas being awaited on the event loop instead
+        of holding a thread per open dashboard
+        """
+        sampler = self.app.dashboard_samplers[redis_instance_index]
+        keepalive = self.app.config.get(
+            "RQ_MONITOR_STREAM_KEEPALIVE", RQ_MONITOR_STREAM_KEEPALIVE
+        )
+        loop = asyncio.get_running_loop()
+        queued = asyncio.Event()
+        subscription = sampler.subscribe(partial(loop.call_soon_threadsafe, queued.set))
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream; charset=utf-8"),
+                        (b"cache-control", b"no-store"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            while not disconnected.done():
+                # cleared before reading, a delta queued meanwhile sets it again
+                queued.clear()
+                try:
+                    delta = subscription.get_nowait()
+                except Empty:
+                    waiting = asyncio.ensure_future(queued.wait())
+                    done, _ = await asyncio.wait(
+                        {waiting, disconnected},
+                        timeout=keepalive,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    waiting.cancel()
+                    if not done:
+                        # comment line keeps proxies from closing an idle stream
+                        await send(
+                            {
+                                "type": "http.response.body",
+                                "body": b": keepalive\n\n",
+                                "more_body": True,
+                            }
+                        )
+                    continue
+                event = "data: {0}\n\n".format(json.dumps(delta))
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": event.encode("utf-8"),
+                        "more_body": True,
+                    }
+                )
+        finally:
+            disconnected.cancel()
+            sampler.unsubscribe(subscription)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def call_wsgi(self, scope, receive, send):
+        """
+        Runs Flask app on a worker thread. Buffered responses are relayed at
+        once, streamed ones (without Content-Length, e.g. /jobs/export) chunk
+        by chunk from the bounded stream executor
+        """
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        await self.setup()
+        loop = asyncio.get_running_loop()
+        response_start = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response_start["status"] = int(status.split(" ", 1)[0])
+            response_start["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in response_headers
+            ]
+
+        async def send_response_start():
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response_start["status"],
+                    "headers": response_start["headers"],
+                }
+            )
+
+        response = await loop.run_in_executor(
+            None, self.app, build_wsgi_environ(scope, body), start_response
+        )
+        buffered = any(
+            name == b"content-length" for name, _ in response_start["headers"]
+        )
+
+        async def run(func, *args):
+            # buffered bodies are in memory already, nothing to wait for
+            if buffered:
+                return func(*args)
+            return await loop.run_in_executor(self._stream_executor, func, *args)
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        started = False
+        try:
+            chunks = iter(response)
+            while not disconnected.done():
+                chunk = await run(next, chunks, None)
+                if chunk is None:
+                    break
+                if not started:
+                    await send_response_start()
+                    started = True
+                if chunk:
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        finally:
+            disconnected.cancel()
+            if hasattr(response, "close"):
+                await run(response.close)
+
+        if not started:
+            await send_response_start()
+        await send({"type": "http.response.body", "body": b""})
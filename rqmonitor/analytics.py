@@ -0,0 +1,183 @@
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from rq.compat import as_text
+from rq.job import Job
+from rq.utils import current_timestamp, utcparse
+
+from rqmonitor.utils import REGISTRY_CLASSES
+
+
+# registries of jobs which ran, whose timestamps tell wait and run times
+ANALYTICS_REGISTRIES = ("finished", "failed")
+# job hash fields read per job, func_name is taken from description
+ANALYTICS_FIELDS = ("enqueued_at", "started_at", "ended_at", "description")
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def parse_timestamp(value):
+    """
+    :return: seconds since epoch of an RQ UTC timestamp, None if unset
+    """
+    if not value:
+        return None
+    try:
+        return utcparse(as_text(value)).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def read_job_latencies(values):
+    """
+    :param values: HMGET of ANALYTICS_FIELDS of a job
+    :return: (func_name, wait time, run time), times in seconds, None where
+             timestamps are missing
+    """
+    enqueued_at, started_at, ended_at = (parse_timestamp(v) for v in values[:3])
+    description = as_text(values[3]) or ""
+    # description is func_name(args) unless set when enqueueing
+    func_name = description.split("(", 1)[0] or None
+    wait_time = run_time = None
+    if enqueued_at is not None and started_at is not None:
+        wait_time = started_at - enqueued_at
+    if started_at is not None and ended_at is not None:
+        run_time = ended_at - started_at
+    return func_name, wait_time, run_time
+
+
+def latency_distribution(values):
+    """
+    :return: count, nearest-rank percentiles, mean and max of values, None
+             if there are none
+    """
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    distribution = {"count": len(values)}
+    for q in LATENCY_PERCENTILES:
+        rank = max(0, math.ceil(q / 100 * len(values)) - 1)
+        distribution["p{0}".format(q)] = round(values[rank], 3)
+    distribution["mean"] = round(sum(values) / len(values), 3)
+    distribution["max"] = round(values[-1], 3)
+    return distribution
+
+
+class LatencyAnalytics(object):
+    """
+    Wait time (enqueued_at to started_at) and run time (started_at to
+    ended_at) distributions of finished and failed jobs, per queue and per
+    function, of one redis instance. Computed on request and cached per queue
+    for ttl seconds, for at most max_queues queues. A refresh reads job ids of
+    registries, fetches timestamps of jobs not seen by the previous one alone
+    and forgets jobs which left registries
+    """
+
+    def __init__(self, connection, ttl, sample_size, max_queues=64, batch_size=500):
+        """
+        :param connection: redis connection of instance to analyse
+        :param ttl: seconds a queue's distributions are served from cache
+        :param sample_size: most recent jobs read per registry, 0 reads all
+        :param max_queues: queues kept, least recently used are evicted
+        :param batch_size: jobs fetched from redis per pipeline
+        """
+        self.connection = connection
+        self.ttl = ttl
+        self.sample_size = sample_size
+        self.max_queues = max_queues
+        self.batch_size = batch_size
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, queue):
+        """
+        :return: rows of distributions of queue, first for all its jobs then
+                 for every function, most frequent first
+        """
+        with self._lock:
+            entry = self._queues.get(queue)
+            if entry is None:
+                entry = self._queues[queue] = {
+                    "jobs": {},
+                    "rows": None,
+                    "refreshed_at": 0,
+                    "lock": threading.Lock(),
+                }
+                while len(self._queues) > self.max_queues:
+                    self._queues.popitem(last=False)
+            else:
+                self._queues.move_to_end(queue)
+        # concurrent requests for the same queue wait for a single refresh
+        with entry["lock"]:
+            if time.time() - entry["refreshed_at"] >= self.ttl:
+                self._refresh(queue, entry)
+            return entry["rows"]
+
+    def _refresh(self, queue, entry):
+        timestamp = current_timestamp()
+        with self.connection.pipeline(transaction=False) as pipeline:
+            for registry in ANALYTICS_REGISTRIES:
+                pipeline.zrevrangebyscore(
+                    REGISTRY_CLASSES[registry].key_template.format(queue),
+                    "+inf",
+                    "({0}".format(timestamp),
+                    start=0 if self.sample_size else None,
+                    num=self.sample_size or None,
+                )
+            results = pipeline.execute()
+
+        registries = {}
+        for registry, job_ids in zip(ANALYTICS_REGISTRIES, results):
+            for job_id in job_ids:
+                registries[sys.intern(as_text(job_id))] = registry
+
+        jobs = {
+            job_id: latencies
+            for job_id, latencies in entry["jobs"].items()
+            if job_id in registries
+        }
+        new_job_ids = [job_id for job_id in registries if job_id not in jobs]
+        for i in range(0, len(new_job_ids), self.batch_size):
+            batch = new_job_ids[i : i + self.batch_size]
+            with self.connection.pipeline(transaction=False) as pipeline:
+                for job_id in batch:
+                    pipeline.hmget(Job.key_for(job_id), *ANALYTICS_FIELDS)
+                results = pipeline.execute()
+            for job_id, values in zip(batch, results):
+                if any(values):
+                    # job hash may have expired after being listed
+                    jobs[job_id] = read_job_latencies(values)
+
+        entry["jobs"] = jobs
+        entry["rows"] = self._compute_rows(queue, jobs, registries)
+        entry["refreshed_at"] = time.time()
+
+    def _compute_rows(self, queue, jobs, registries):
+        groups = {None: []}
+        for job_id, latencies in jobs.items():
+            groups[None].append((job_id, latencies))
+            groups.setdefault(latencies[0] or "?", []).append((job_id, latencies))
+
+        rows = []
+        for func_name, group in groups.items():
+            rows.append(
+                {
+                    "queue_name": queue,
+                    "func_name": func_name,
+                    "jobs": len(group),
+                    "failed": sum(
+                        1 for job_id, _ in group if registries[job_id] == "failed"
+                    ),
+                    "wait_time": latency_distribution(
+                        latencies[1] for _, latencies in group
+                    ),
+                    "run_time": latency_distribution(
+                        latencies[2] for _, latencies in group
+                    ),
+                }
+            )
+        rows.sort(key=lambda row: (row["func_name"] is not None, -row["jobs"]))
+        return rows
@@ -1,11 +1,20 @@
-from flask import current_app, render_template, request, jsonify, url_for
+from flask import (
+    current_app,
+    render_template,
+    request,
+    jsonify,
+    url_for,
+    g,
+    Response,
+    send_from_directory,
+)
 from six import string_types
 from flask import Blueprint
 from rqmonitor.utils import (
-    list_all_queues_names,
     list_all_possible_job_status,
-    list_all_queues,
-    reformat_job_data,
+    reformat_job_row,
+    load_job_rows,
+    parse_job_row_fields,
     delete_workers,
     create_redis_connection,
     delete_queue,
@@ -13,23 +22,103 @@ from rqmonitor.utils import (
     delete_job,
     cancel_job,
     requeue_job,
-    get_redis_memory_used,
-    job_count_in_queue_registry,
+    job_counts_in_queues_registries,
     resolve_jobs,
+    iter_job_rows_in_queues_registries,
+    JOB_EXPORT_FORMATS,
     delete_all_jobs_in_queues_registries,
     requeue_all_jobs_in_failed_registry,
     cancel_all_queued_jobs,
+    list_workers_snapshot,
+    fetch_exc_info,
+    is_stopped,
+    describe_redis_url,
 )
 
-from rqmonitor.defaults import RQ_MONITOR_REFRESH_INTERVAL
+from rqmonitor.defaults import (
+    RQ_MONITOR_REFRESH_INTERVAL,
+    RQ_MONITOR_JOBS_OVERFETCH,
+    RQ_MONITOR_REDIS_MAX_CONNECTIONS,
+    RQ_MONITOR_REDIS_POOL_TIMEOUT,
+    RQ_MONITOR_REDIS_SOCKET_TIMEOUT,
+    RQ_MONITOR_REDIS_SOCKET_CONNECT_TIMEOUT,
+    RQ_MONITOR_REDIS_HEALTH_CHECK_INTERVAL,
+    RQ_MONITOR_REDIS_MEMORY_UPDATE,
+    RQ_MONITOR_REDIS_MEMORY_SCAN_COUNT,
+    RQ_MONITOR_REDIS_MEMORY_SCAN_PAUSE,
+    RQ_MONITOR_REDIS_MEMORY_SAMPLE_RATIO,
+    RQ_MONITOR_REDIS_MEMORY_SAMPLES,
+    RQ_MONITOR_HOSTNAME_CACHE_TTL,
+    RQ_MONITOR_SNAPSHOT_MAX_ENTRIES,
+    RQ_MONITOR_STREAM_KEEPALIVE,
+    RQ_MONITOR_SEARCH_INDEX_UPDATE,
+    RQ_MONITOR_SEARCH_INDEX_BATCH,
+    RQ_MONITOR_SEARCH_INDEX_PAUSE,
+    RQ_MONITOR_SEARCH_INDEX_WAIT,
+    RQ_MONITOR_BULK_CHUNK_SIZE,
+    RQ_MONITOR_BULK_TIME_SLICE,
+    RQ_MONITOR_BULK_PAUSE,
+    RQ_MONITOR_TASK_WORKERS,
+    RQ_MONITOR_TASK_QUEUE_SIZE,
+    RQ_MONITOR_TASK_RETENTION,
+    RQ_MONITOR_TASK_WAIT,
+    RQ_MONITOR_FANOUT_TIMEOUT,
+    RQ_MONITOR_FANOUT_WORKERS,
+    RQ_MONITOR_TIMESERIES_INTERVAL,
+    RQ_MONITOR_TIMESERIES_TIERS,
+    RQ_MONITOR_METRICS_TTL,
+    RQ_MONITOR_ANALYTICS_TTL,
+    RQ_MONITOR_ANALYTICS_SAMPLE,
+    RQ_MONITOR_ANALYTICS_MAX_QUEUES,
+    RQ_MONITOR_EXPORT_CHUNK_SIZE,
+    RQ_MONITOR_QUEUE_DIRECTORY_TTL,
+    RQ_MONITOR_COMPRESS_MIN_SIZE,
+)
+from rqmonitor.analytics import LatencyAnalytics
+from rqmonitor.cache import SnapshotCache
+from rqmonitor.compression import (
+    CONTENT_ENCODINGS,
+    COMPRESSED_MIMETYPES,
+    IMMUTABLE_MAX_AGE,
+    PRECOMPRESSED_EXTENSIONS,
+    available_encodings,
+    compress,
+    file_fingerprint,
+)
+from rqmonitor.directory import QueueDirectory
+from rqmonitor.fanout import InstanceFanout
+from rqmonitor.memory import RedisMemoryEstimator
+from rqmonitor.metrics import (
+    MetricsCollector,
+    RequestLatencies,
+    METRICS_CONTENT_TYPE,
+    render_instance_samples,
+    render_metrics,
+)
+from rqmonitor.resolver import HostnameResolver
+from rqmonitor.search import JobSearchIndex
+from rqmonitor.stream import DashboardSampler
+from rqmonitor.tasks import BulkTaskExecutor, TASK_FAILED
+from rqmonitor.timeseries import TimeSeriesSampler, TIMESERIES_STATUSES
 from rq.connections import pop_connection, push_connection, get_current_connection
-from rqmonitor.decorators import cache_control_no_store, catch_global_exception
+from rqmonitor.decorators import (
+    cache_control_no_store,
+    catch_global_exception,
+    snapshot_cached,
+    etag_conditional,
+)
 from rqmonitor.exceptions import RQMonitorException
 from rq.worker import Worker
+from rq.exceptions import NoSuchJobError
 from rq.suspension import suspend, resume, is_suspended
 from collections import namedtuple
+from functools import partial, lru_cache
+from queue import Empty
+import json
 import logging
-import socket
+import mimetypes
+import os
+import time
 
 
 logger = logging.getLogger(__name__)
@@ -39,11 +128,75 @@ logger.setLevel(logging.INFO)
 
 REDIS_RQ_HOST = "localhost:6379"
 
-monitor_blueprint = Blueprint(
+
+@lru_cache(maxsize=256)
+def get_static_fingerprint(path, mtime, size):
+    # keyed by mtime and size too, an edited asset gets a new fingerprint
+    return file_fingerprint(path)
+
+
+class MonitorBlueprint(Blueprint):
+    """
+    Blueprint whose static assets are served precompressed when a .br or .gz
+    sibling (see rqmonitor.compression) is there and accepted by client, and
+    cached for good when requested under their content fingerprint
+    """
+
+    def static_fingerprint(self, filename):
+        """
+        :return: content fingerprint of static asset, None if it is missing
+        """
+        path = os.path.join(self.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return get_static_fingerprint(path, stat.st_mtime, stat.st_size)
+
+    def send_static_file(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        response = None
+        for encoding, suffix in CONTENT_ENCODINGS:
+            if not request.accept_encodings[encoding]:
+                continue
+            try:
+                stale = os.stat(path + suffix).st_mtime < os.stat(path).st_mtime
+            except OSError:
+                continue
+            if not stale:
+                response = send_from_directory(
+                    self.static_folder,
+                    filename + suffix,
+                    mimetype=mimetypes.guess_type(filename)[0],
+                )
+                response.headers["Content-Encoding"] = encoding
+                break
+        if response is None:
+            response = super(MonitorBlueprint, self).send_static_file(filename)
+        if filename.endswith(PRECOMPRESSED_EXTENSIONS):
+            response.vary.add("Accept-Encoding")
+        version = request.args.get("v")
+        if version is not None and version == self.static_fingerprint(filename):
+            response.headers["Cache-Control"] = "public, max-age={0}, immutable".format(
+                IMMUTABLE_MAX_AGE
+            )
+        return response
+
+
+monitor_blueprint = MonitorBlueprint(
     "rqmonitor", __name__, template_folder="templates", static_folder="static"
 )
 
 
+@monitor_blueprint.url_defaults
+def add_static_fingerprint(endpoint, values):
+    # static URLs change along with content, so assets can be cached for good
+    if endpoint == "rqmonitor.static" and "v" not in values:
+        fingerprint = monitor_blueprint.static_fingerprint(values.get("filename", ""))
+        if fingerprint is not None:
+            values["v"] = fingerprint
+
+
 @monitor_blueprint.errorhandler(RQMonitorException)
 def handle_invalid_usage(error):
     response = jsonify(error.to_dict())
@@ -51,17 +204,168 @@ def handle_invalid_usage(error):
     return response
 
 
-@monitor_blueprint.before_app_first_request
-def setup_redis_connection():
+def get_redis_pool_options():
+    config = current_app.config
+    return dict(
+        max_connections=config.get(
+            "RQ_MONITOR_REDIS_MAX_CONNECTIONS", RQ_MONITOR_REDIS_MAX_CONNECTIONS
+        ),
+        timeout=config.get(
+            "RQ_MONITOR_REDIS_POOL_TIMEOUT", RQ_MONITOR_REDIS_POOL_TIMEOUT
+        ),
+        socket_timeout=config.get(
+            "RQ_MONITOR_REDIS_SOCKET_TIMEOUT", RQ_MONITOR_REDIS_SOCKET_TIMEOUT
+        ),
+        socket_connect_timeout=config.get(
+            "RQ_MONITOR_REDIS_SOCKET_CONNECT_TIMEOUT",
+            RQ_MONITOR_REDIS_SOCKET_CONNECT_TIMEOUT,
+        ),
+        health_check_interval=config.get(
+            "RQ_MONITOR_REDIS_HEALTH_CHECK_INTERVAL",
+            RQ_MONITOR_REDIS_HEALTH_CHECK_INTERVAL,
+        ),
+    )
+
+
+def get_redis_urls():
+    """
+    :return: configured redis URLs, normalised to a tuple in app config
+    """
     redis_url = current_app.config.get("RQ_MONITOR_REDIS_URL")
     if isinstance(redis_url, string_types):
         # update as tuple
-        current_app.config["RQ_MONITOR_REDIS_URL"] = (redis_url,)
-        current_app.redis_connection = create_redis_connection((redis_url,)[0])
-    elif isinstance(redis_url, (tuple, list)):
-        current_app.redis_connection = create_redis_connection(redis_url[0])
-    else:
+        redis_url = (redis_url,)
+        current_app.config["RQ_MONITOR_REDIS_URL"] = redis_url
+    elif not isinstance(redis_url, (tuple, list)):
         raise RuntimeError("No Redis configuration!")
+    return redis_url
+
+
+@monitor_blueprint.before_app_first_request
+def setup_redis_connection():
+    """
+    Creates one pooled connection per configured redis instance, shared by all
+    requests for the lifetime of the process and looked up by instance index
+    """
+    redis_url = get_redis_urls()
+    pool_options = get_redis_pool_options()
+    current_app.redis_connections = [
+        create_redis_connection(url, **pool_options) for url in redis_url
+    ]
+    current_app.redis_connection = current_app.redis_connections[0]
+
+    config = current_app.config
+    memory_update_interval = (
+        config.get("RQ_MONITOR_REDIS_MEMORY_UPDATE", RQ_MONITOR_REDIS_MEMORY_UPDATE)
+        / 1000
+    )
+    memory_scan_options = dict(
+        scan_count=config.get(
+            "RQ_MONITOR_REDIS_MEMORY_SCAN_COUNT", RQ_MONITOR_REDIS_MEMORY_SCAN_COUNT
+        ),
+        pause=config.get(
+            "RQ_MONITOR_REDIS_MEMORY_SCAN_PAUSE", RQ_MONITOR_REDIS_MEMORY_SCAN_PAUSE
+        ),
+        sample_ratio=config.get(
+            "RQ_MONITOR_REDIS_MEMORY_SAMPLE_RATIO", RQ_MONITOR_REDIS_MEMORY_SAMPLE_RATIO
+        ),
+        samples=config.get(
+            "RQ_MONITOR_REDIS_MEMORY_SAMPLES", RQ_MONITOR_REDIS_MEMORY_SAMPLES
+        ),
+    )
+    # estimators are started lazily, only for instances someone looks at
+    current_app.redis_memory_estimators = [
+        RedisMemoryEstimator(connection, memory_update_interval, **memory_scan_options)
+        for connection in current_app.redis_connections
+    ]
+    current_app.queue_directory = QueueDirectory(
+        config.get("RQ_MONITOR_QUEUE_DIRECTORY_TTL", RQ_MONITOR_QUEUE_DIRECTORY_TTL)
+    )
+    # search indexes too are started lazily, on first search on an instance
+    current_app.job_search_indexes = [
+        JobSearchIndex(
+            connection,
+            current_app.queue_directory,
+            config.get("RQ_MONITOR_SEARCH_INDEX_UPDATE", RQ_MONITOR_SEARCH_INDEX_UPDATE)
+            / 1000,
+            batch_size=config.get(
+                "RQ_MONITOR_SEARCH_INDEX_BATCH", RQ_MONITOR_SEARCH_INDEX_BATCH
+            ),
+            pause=config.get(
+                "RQ_MONITOR_SEARCH_INDEX_PAUSE", RQ_MONITOR_SEARCH_INDEX_PAUSE
+            ),
+        )
+        for connection in current_app.redis_connections
+    ]
+    current_app.hostname_resolver = HostnameResolver(
+        config.get("RQ_MONITOR_HOSTNAME_CACHE_TTL", RQ_MONITOR_HOSTNAME_CACHE_TTL)
+    )
+    current_app.snapshot_cache = SnapshotCache(
+        config.get("RQ_MONITOR_SNAPSHOT_MAX_ENTRIES", RQ_MONITOR_SNAPSHOT_MAX_ENTRIES)
+    )
+    sample_interval = (
+        config.get("RQ_MONITOR_REFRESH_INTERVAL", RQ_MONITOR_REFRESH_INTERVAL) / 1000
+    )
+    current_app.dashboard_samplers = [
+        DashboardSampler(
+            partial(
+                collect_dashboard_state,
+                connection,
+                current_app.hostname_resolver,
+                current_app.queue_directory,
+            ),
+            sample_interval,
+        )
+        for connection in current_app.redis_connections
+    ]
+    current_app.instance_fanout = InstanceFanout(
+        current_app.redis_connections,
+        config.get("RQ_MONITOR_FANOUT_TIMEOUT", RQ_MONITOR_FANOUT_TIMEOUT),
+        max_workers=config.get("RQ_MONITOR_FANOUT_WORKERS", RQ_MONITOR_FANOUT_WORKERS),
+    )
+    # unlike other samplers these run from start on, history can't be made up later
+    timeseries_interval = config.get(
+        "RQ_MONITOR_TIMESERIES_INTERVAL", RQ_MONITOR_TIMESERIES_INTERVAL
+    )
+    current_app.timeseries_samplers = [
+        TimeSeriesSampler(
+            connection,
+            current_app.queue_directory,
+            timeseries_interval,
+            config.get("RQ_MONITOR_TIMESERIES_TIERS", RQ_MONITOR_TIMESERIES_TIERS),
+        )
+        for connection in current_app.redis_connections
+    ]
+    if timeseries_interval > 0:
+        for sampler in current_app.timeseries_samplers:
+            sampler.start()
+    current_app.latency_analytics = [
+        LatencyAnalytics(
+            connection,
+            config.get("RQ_MONITOR_ANALYTICS_TTL", RQ_MONITOR_ANALYTICS_TTL),
+            config.get("RQ_MONITOR_ANALYTICS_SAMPLE", RQ_MONITOR_ANALYTICS_SAMPLE),
+            max_queues=config.get(
+                "RQ_MONITOR_ANALYTICS_MAX_QUEUES", RQ_MONITOR_ANALYTICS_MAX_QUEUES
+            ),
+        )
+        for connection in current_app.redis_connections
+    ]
+    current_app.metrics_collectors = [
+        MetricsCollector(connection, current_app.queue_directory)
+        for connection in current_app.redis_connections
+    ]
+    current_app.request_latencies = RequestLatencies()
+    # bulk actions of all instances share one bounded pool of threads
+    current_app.bulk_task_executor = BulkTaskExecutor(
+        config.get("RQ_MONITOR_TASK_WORKERS", RQ_MONITOR_TASK_WORKERS),
+        config.get("RQ_MONITOR_TASK_RETENTION", RQ_MONITOR_TASK_RETENTION),
+        config.get("RQ_MONITOR_TASK_QUEUE_SIZE", RQ_MONITOR_TASK_QUEUE_SIZE),
+    )
+
+
+@monitor_blueprint.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
 
 
 @monitor_blueprint.before_request
@@ -75,43 +379,351 @@ def push_rq_connection():
     if new_instance_index is None:
         new_instance_index = request.view_args.get("redis_instance_index")
 
-    # print(new_instance_index, type(new_instance_index))
     if new_instance_index is not None:
-        redis_url = current_app.config.get("RQ_MONITOR_REDIS_URL")
         new_instance_index = int(new_instance_index)
-        if int(new_instance_index) < len(redis_url):
-            new_instance = create_redis_connection(redis_url[new_instance_index])
+        if 0 <= new_instance_index < len(current_app.redis_connections):
+            new_instance = current_app.redis_connections[new_instance_index]
         else:
             raise RQMonitorException("Invalid redis instance index!", status_code=400)
     else:
+        new_instance_index = 0
         new_instance = current_app.redis_connection
     push_connection(new_instance)
-    current_app.redis_connection = new_instance
+    g.redis_instance_index = new_instance_index
+    g.rq_connection_pushed = True
+
+
+def get_redis_memory_estimator():
+    """
+    :return: running memory estimator of redis instance selected for this request
+    """
+    estimator = current_app.redis_memory_estimators[g.redis_instance_index]
+    estimator.start()
+    return estimator
+
+
+def get_job_search_index(wait=True):
+    """
+    :param wait: whether to wait (a bounded time) for index to be built first
+    :return: running job search index of redis instance selected for this request
+    """
+    index = current_app.job_search_indexes[g.redis_instance_index]
+    index.start()
+    if wait:
+        index.wait_ready(
+            current_app.config.get(
+                "RQ_MONITOR_SEARCH_INDEX_WAIT", RQ_MONITOR_SEARCH_INDEX_WAIT
+            )
+        )
+    return index
+
+
+def get_bulk_options():
+    """
+    :return: keyword arguments of chunked bulk actions from app config
+    """
+    return dict(
+        chunk_size=current_app.config.get(
+            "RQ_MONITOR_BULK_CHUNK_SIZE", RQ_MONITOR_BULK_CHUNK_SIZE
+        ),
+        time_slice=current_app.config.get(
+            "RQ_MONITOR_BULK_TIME_SLICE", RQ_MONITOR_BULK_TIME_SLICE
+        ),
+        pause=current_app.config.get("RQ_MONITOR_BULK_PAUSE", RQ_MONITOR_BULK_PAUSE),
+    )
+
+
+def count_jobs(queues, registries):
+    """
+    :return: count of jobs in all registries of all queues
+    """
+    job_counts = job_counts_in_queues_registries(queues, registries)
+    return sum(sum(counts.values()) for counts in job_counts.values())
+
+
+def bulk_queues_message(action, processed, queue_names, bulk_options, max_listed=20):
+    """
+    Result message of a bulk action run queue by queue, naming only the
+    queues it got through, as it may have been cancelled part-way
+
+    :param action: what was done to every queue, e.g. "deleted"
+    :param processed: names of queues action was completed on
+    :param queue_names: names of all queues action was requested on
+    :param bulk_options: options action was run with, see is_stopped
+    :param max_listed: count of queue names listed before the rest is counted
+    :return: message with count and (first) names of processed queues
+    """
+    listed = ", ".join(processed[:max_listed])
+    if len(processed) > max_listed:
+        listed += " and {0} more".format(len(processed) - max_listed)
+    if len(processed) < len(queue_names) and is_stopped(bulk_options):
+        message = "Cancelled part-way, {0} {1} of {2} queues".format(
+            action, len(processed), len(queue_names)
+        )
+    else:
+        message = "Successfully {0} {1} queues".format(action, len(processed))
+    return message + ": " + listed if processed else message
+
+
+def submit_bulk_task(name, action, total):
+    """
+    Runs bulk action in background, on the redis instance selected for this
+    request, then waits a bounded time for it so that small actions are still
+    answered with their result right away
+
+    :param name: human readable description of the action
+    :param action: callable of connection and options of run_script_in_chunks,
+                   returning result message
+    :param total: count of jobs action is expected to handle
+    :return: task as dict, with 202 status while it is still running
+    """
+    app = current_app._get_current_object()
+    instance_index = g.redis_instance_index
+    bulk_options = dict(
+        get_bulk_options(), connection=app.redis_connections[instance_index]
+    )
+
+    def run(progress, stop_event):
+        try:
+            return action(progress=progress, stop_event=stop_event, **bulk_options)
+        finally:
+            # listings are outdated by anything task did after request ended
+            app.snapshot_cache.invalidate(instance_index)
+            app.job_search_indexes[instance_index].request_refresh()
+
+    task = app.bulk_task_executor.submit(name, run, total)
+    if task is None:
+        raise RQMonitorException(
+            "Too many bulk actions waiting, try again later", status_code=503
+        )
+    task.wait(app.config.get("RQ_MONITOR_TASK_WAIT", RQ_MONITOR_TASK_WAIT))
+    if task.status == TASK_FAILED:
+        raise RQMonitorException(task.message, status_code=500)
+    return task.to_dict(), 200 if task.is_done() else 202
+
+
+def get_bulk_task(task_id):
+    task = current_app.bulk_task_executor.get_task(task_id)
+    if task is None:
+        raise RQMonitorException("Task {0} not found".format(task_id), status_code=404)
+    return task
+
+
+@monitor_blueprint.after_request
+def invalidate_snapshots(response):
+    # any action may change what listing APIs return for the instance
+    if request.method == "POST" and "redis_instance_index" in g:
+        current_app.snapshot_cache.invalidate(g.redis_instance_index)
+        # asyncio connections of instance have entries of their own, drop all
+        current_app.queue_directory.invalidate()
+        current_app.job_search_indexes[g.redis_instance_index].request_refresh()
+    return response
+
+
+@monitor_blueprint.after_request
+def observe_request_latency(response):
+    if "request_started" in g:
+        current_app.request_latencies.observe(
+            request.endpoint,
+            request.method,
+            time.perf_counter() - g.request_started,
+        )
+    return response
+
+
+@monitor_blueprint.after_request
+def compress_response(response):
+    """
+    Compresses JSON, HTML and text responses of at least
+    RQ_MONITOR_COMPRESS_MIN_SIZE bytes with the best encoding client accepts.
+    Streamed and file responses are left as they are
+    """
+    if (
+        response.status_code != 200
+        or response.is_streamed
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSED_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    min_size = current_app.config.get(
+        "RQ_MONITOR_COMPRESS_MIN_SIZE", RQ_MONITOR_COMPRESS_MIN_SIZE
+    )
+    encoding = request.accept_encodings.best_match(available_encodings())
+    body = response.get_data()
+    if encoding is None or len(body) < min_size:
+        return response
+    # snapshot served by etag_conditional keeps its compressed bodies
+    snapshot, draw = g.get("response_snapshot", (None, None))
+    if snapshot is not None:
+        response.set_data(snapshot.encoded(encoding, draw))
+    else:
+        response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # same payload whatever its encoding, but no longer byte for byte
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 
 
 @monitor_blueprint.teardown_request
 def pop_rq_connection(exception=None):
-    pop_connection()
+    # connection is not pushed if request failed before push_rq_connection completed
+    if g.pop("rq_connection_pushed", False):
+        pop_connection()
+
+
+def serialize_worker(worker, hostname_resolver):
+    """
+    :param worker: worker as returned by list_workers_snapshot
+    :return: worker row as consumed by workers DataTable
+    """
+    return {
+        "worker_name": worker["worker_name"],
+        "listening_on": ", ".join(worker["queues"]),
+        "status": worker["state"],
+        "host_ip": hostname_resolver.resolve(worker["hostname"]),
+        "current_job_id": worker["current_job_id"],
+        "failed_jobs": worker["failed_job_count"],
+    }
+
+
+def collect_dashboard_state(connection, hostname_resolver, queue_directory):
+    """
+    :return: queue rows, worker rows and registry counts of all queues of the
+             redis instance, as pushed on /stream
+    """
+    queue_names = queue_directory.queue_names(connection)
+    job_counts = job_counts_in_queues_registries(
+        queue_names, list_all_possible_job_status(), connection=connection
+    )
+    return {
+        "queues": {
+            queue_name: {
+                "queue_name": queue_name,
+                "job_count": job_counts[queue_name]["queued"],
+            }
+            for queue_name in queue_names
+        },
+        "workers": {
+            worker["worker_name"]: serialize_worker(worker, hostname_resolver)
+            for worker in list_workers_snapshot(connection)
+        },
+        "registries": job_counts,
+    }
+
+
+def collect_queue_rows(queue_directory, connection):
+    """
+    :return: rows of queues table for all queues of redis instance
+    """
+    queue_names = queue_directory.queue_names(connection)
+    job_counts = job_counts_in_queues_registries(
+        queue_names, ["queued"], connection=connection
+    )
+    return [
+        {"queue_name": queue_name, "job_count": job_counts[queue_name]["queued"]}
+        for queue_name in queue_names
+    ]
+
+
+def collect_worker_rows(hostname_resolver, connection):
+    """
+    :return: rows of workers table for all workers of redis instance
+    """
+    return [
+        serialize_worker(worker, hostname_resolver)
+        for worker in list_workers_snapshot(connection)
+    ]
+
+
+def collect_registry_rows(queue_directory, connection):
+    """
+    :return: one row of job counts per registry (job status) for every queue
+             of redis instance
+    """
+    queue_names = queue_directory.queue_names(connection)
+    job_counts = job_counts_in_queues_registries(
+        queue_names, list_all_possible_job_status(), connection=connection
+    )
+    return [
+        dict(job_counts[queue_name], queue_name=queue_name)
+        for queue_name in queue_names
+    ]
+
+
+def is_all_instances_requested():
+    return request.args.get("all_instances", "false").lower() == "true"
+
+
+def merge_instance_rows(redis_urls, results):
+    """
+    :param redis_urls: configured redis URLs, by instance index
+    :param results: list of (instance index, rows, error) tuples, as returned
+                    by InstanceFanout.map
+    :return: payload of rows of all instances, each tagged with the index and
+             host:port/db (no credentials) of the instance it comes from, with
+             errors of instances which failed or timed out
+    """
+    labels = [describe_redis_url(url) for url in redis_urls]
+    rows = []
+    errors = []
+    for index, instance_rows, error in results:
+        if error is not None:
+            errors.append(
+                {
+                    "redis_instance_index": index,
+                    "redis_instance": labels[index],
+                    "message": error,
+                }
+            )
+            continue
+        for row in instance_rows:
+            row.update(redis_instance_index=index, redis_instance=labels[index])
+            rows.append(row)
+    return {"data": rows, "errors": errors}
+
+
+def collect_rows(collect):
+    """
+    Collects rows of redis instance selected for this request, or of every
+    redis instance in parallel when all_instances is requested
+
+    :param collect: callable of redis connection returning list of rows
+    :return: payload of rows, see merge_instance_rows for all instances
+    """
+    if not is_all_instances_requested():
+        return {"data": collect(get_current_connection())}
+    return merge_instance_rows(
+        get_redis_urls(), current_app.instance_fanout.map(collect)
+    )
 
 
 @monitor_blueprint.route("/", defaults={"redis_instance_index": 0})
 @catch_global_exception
 @cache_control_no_store
 def home(redis_instance_index):
-    rq_queues_list = list_all_queues_names()
+    """
+    Shell page of the dashboard, rendered without any redis work so that it
+    shows up at once whatever the size of redis. Sidebar queues and memory
+    widget are filled in afterwards from /queues/sidebar and /redis/memory
+    """
     rq_possible_job_status = list_all_possible_job_status()
     site_map = {}
     for rule in current_app.url_map.iter_rules():
+        # urls needing arguments (like job id) are built on client side
+        if rule.arguments - set(rule.defaults or ()):
+            continue
         if rule.endpoint.startswith("rqmonitor"):
             if rule.endpoint != "rqmonitor.static":
                 site_map[rule.endpoint] = url_for(rule.endpoint)
 
     return render_template(
         "rqmonitor/index.html",
-        rq_queues_list=rq_queues_list,
         rq_possible_job_status=rq_possible_job_status,
-        redis_instance_list=current_app.config.get("RQ_MONITOR_REDIS_URL"),
-        redis_memory_used=get_redis_memory_used(),
+        redis_instance_list=[describe_redis_url(url) for url in get_redis_urls()],
         site_map=site_map,
     )
 
@@ -143,74 +755,75 @@ def get_queues_dashboard():
 @monitor_blueprint.route("/queues", methods=["GET"])
 @catch_global_exception
 @cache_control_no_store
+@etag_conditional
+@snapshot_cached
 def list_queues_api():
-    queue_list = list_all_queues()
-    rq_queues = []
-    for queue in queue_list:
-        rq_queues.append(
-            {
-                "queue_name": queue.name,
-                "job_count": queue.count,
-            }
-        )
-    return {
-        "data": rq_queues,
-    }
+    return collect_rows(partial(collect_queue_rows, current_app.queue_directory))
 
 
 @monitor_blueprint.route("/workers", methods=["GET"])
 @catch_global_exception
 @cache_control_no_store
+@etag_conditional
+@snapshot_cached
 def list_workers_api():
-    workers_list = Worker.all()
-    rq_workers = []
-    for worker in workers_list:
-        host_ip_using_name = "Unresolved"
-        try:
-            host_ip_using_name = socket.gethostbyname(worker.hostname)
-        except socket.gaierror as addr_error:
-            pass
-        except TypeError as e:
-            pass
-
-        rq_workers.append(
-            {
-                "worker_name": worker.name,
-                "listening_on": ", ".join(queue.name for queue in worker.queues),
-                "status": worker.get_state()
-                if not is_suspended(get_current_connection())
-                else "suspended",
-                "host_ip": host_ip_using_name,
-                "current_job_id": worker.get_current_job_id(),
-                "failed_jobs": worker.failed_job_count,
-            }
-        )
-    return {
-        "data": rq_workers,
-    }
+    return collect_rows(partial(collect_worker_rows, current_app.hostname_resolver))
+
+
+@monitor_blueprint.route("/registries", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+@etag_conditional
+@snapshot_cached
+def list_registries_api():
+    return collect_rows(partial(collect_registry_rows, current_app.queue_directory))
+
+
+@monitor_blueprint.route("/queues/analytics", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+@etag_conditional
+def queue_analytics_api():
+    """
+    Wait time and run time distributions of finished and failed jobs of
+    queues[], over all their jobs then per function. Queues which don't exist
+    are left out, so that analytics are only kept for actual queues
+    """
+    queue_names = set(current_app.queue_directory.queue_names(get_current_connection()))
+    requested_queues = [
+        queue for queue in request.args.getlist("queues[]") if queue in queue_names
+    ]
+    analytics = current_app.latency_analytics[g.redis_instance_index]
+    return {"data": [row for queue in requested_queues for row in analytics.get(queue)]}
 
 
 @monitor_blueprint.route("queues/sidebar", methods=["GET"])
 @catch_global_exception
 @cache_control_no_store
 def refresh_sidebar_queues():
+    rq_queues_list = current_app.queue_directory.queue_names(get_current_connection())
     return render_template(
-        "rqmonitor/sidebar_queues.html", rq_queues_list=list_all_queues_names()
+        "rqmonitor/sidebar_queues.html", rq_queues_list=rq_queues_list
     )
 
 
 @monitor_blueprint.route("/jobs", methods=["GET"])
 @catch_global_exception
 @cache_control_no_store
+@etag_conditional
+@snapshot_cached
 def list_jobs_api():
     """
     :param request: Flask GET request containing two parameters acting as filter for jobs
                     1) Jobs Status list (with these status)
                     2) queues list (to fetch queues)
     :return: rendered output
+
+    Optional fields parameter projects jobs to comma separated JOB_ROW_FIELDS
     """
     serialised_jobs = []
 
+    fields = parse_job_row_fields(request.args.get("fields"))
     start = int(request.args.get("start"))
     length = int(request.args.get("length"))
     draw = int(request.args.get("draw"))
@@ -231,25 +844,93 @@ def list_jobs_api():
 
     blocks = namedtuple("blocks", "queue registry count")
 
+    job_counts = job_counts_in_queues_registries(requested_queues, requested_job_status)
+
     for queue in requested_queues:
         for job_status in requested_job_status:
-            queue_registry_count = job_count_in_queue_registry(queue, job_status)
+            queue_registry_count = job_counts[queue][job_status]
             job_blocks.append(blocks(queue, job_status, queue_registry_count))
             total_job_count += queue_registry_count
 
-    jobs = resolve_jobs(job_blocks, start, length)
+    filtered_job_count = total_job_count
+    if search and search.strip():
+        matching_job_ids = get_job_search_index().search(
+            search, requested_queues, requested_job_status
+        )
+        filtered_job_count = len(matching_job_ids)
+        jobs = load_job_rows(matching_job_ids[start : start + length], fields)
+    else:
+        overfetch = current_app.config.get(
+            "RQ_MONITOR_JOBS_OVERFETCH", RQ_MONITOR_JOBS_OVERFETCH
+        )
+        jobs = resolve_jobs(
+            job_blocks, start, length, overfetch=overfetch, fields=fields
+        )
 
     for job in jobs:
-        serialised_jobs.append(reformat_job_data(job))
+        serialised_jobs.append(reformat_job_row(job, fields))
 
     return {
         "draw": draw,
         "recordsTotal": total_job_count,
-        "recordsFiltered": total_job_count,
+        "recordsFiltered": filtered_job_count,
         "data": serialised_jobs,
     }
 
 
+@monitor_blueprint.route("/jobs/export", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+def export_jobs_api():
+    """
+    Streams every job of requested queues and job statuses, same filters as
+    list_jobs_api, as NDJSON or as CSV with format=csv. Jobs are read and
+    sent chunk by chunk, so memory used doesn't grow with exported jobs
+
+    Optional fields parameter projects jobs to comma separated JOB_ROW_FIELDS
+    """
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in JOB_EXPORT_FORMATS:
+        raise RQMonitorException(
+            "Unknown export format {0}".format(export_format), status_code=400
+        )
+    mimetype, stream_jobs = JOB_EXPORT_FORMATS[export_format]
+    fields = parse_job_row_fields(request.args.get("fields"))
+    chunk_size = current_app.config.get(
+        "RQ_MONITOR_EXPORT_CHUNK_SIZE", RQ_MONITOR_EXPORT_CHUNK_SIZE
+    )
+    # response is generated after request is torn down, possibly on other
+    # threads, connection is passed along rather than resolved from rq stack
+    chunks = iter_job_rows_in_queues_registries(
+        request.args.getlist("queues[]"),
+        request.args.getlist("jobstatus[]"),
+        fields=fields,
+        chunk_size=chunk_size,
+        connection=get_current_connection(),
+    )
+    return Response(
+        stream_jobs(chunks, fields),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": 'attachment; filename="jobs.{0}"'.format(
+                export_format
+            ),
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@monitor_blueprint.route("/jobs/<job_id>/exc_info", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+def job_exc_info_api(job_id):
+    try:
+        exc_info = fetch_exc_info(job_id)
+    except NoSuchJobError:
+        raise RQMonitorException("Job {0} not found".format(job_id), status_code=404)
+    return {"job_id": job_id, "exc_info": exc_info}
+
+
 @monitor_blueprint.route("/workers/delete", methods=["POST"])
 @cache_control_no_store
 def delete_workers_api():
@@ -300,8 +981,18 @@ def delete_queue_api():
         queue_id = request.form.get("queue_id", None)
         if queue_id is None:
             raise RQMonitorException("Queue Name not received", status_code=400)
-        delete_queue(queue_id)
-        return {"message": "Successfully deleted {0}".format(queue_id)}
+
+        def delete(**bulk_options):
+            deleted_count = delete_queue(queue_id, **bulk_options)
+            return "Successfully deleted {0} with {1} jobs".format(
+                queue_id, deleted_count
+            )
+
+        return submit_bulk_task(
+            "Delete queue {0}".format(queue_id),
+            delete,
+            count_jobs([queue_id], ["queued"]),
+        )
 
 
 @monitor_blueprint.route("/queues/empty", methods=["POST"])
@@ -313,21 +1004,40 @@ def empty_queue_api():
         if queue_id is None:
             raise RQMonitorException("Queue Name not received", status_code=400)
 
-        empty_queue(queue_id)
+        def empty(**bulk_options):
+            deleted_count = empty_queue(queue_id, **bulk_options)
+            return "Successfully emptied {0}, {1} jobs deleted".format(
+                queue_id, deleted_count
+            )
 
-        return {"message": "Successfully emptied {0}".format(queue_id)}
+        return submit_bulk_task(
+            "Empty queue {0}".format(queue_id),
+            empty,
+            count_jobs([queue_id], ["queued"]),
+        )
 
 
 @monitor_blueprint.route("/queues/delete/all", methods=["POST"])
+@catch_global_exception
 @cache_control_no_store
 def delete_all_queues_api():
     if request.method == "POST":
-        queue_names = [queue.name for queue in list_all_queues()]
-        for queue in list_all_queues():
-            queue.delete(delete_jobs=True)
-        return {
-            "message": "Successfully deleted queues {0}".format(", ".join(queue_names))
-        }
+        queue_names = current_app.queue_directory.queue_names(get_current_connection())
+
+        def delete_all(**bulk_options):
+            processed = []
+            for queue_name in queue_names:
+                if is_stopped(bulk_options):
+                    break
+                delete_queue(queue_name, **bulk_options)
+                # a queue left part-way by cancellation is not reported
+                if not is_stopped(bulk_options):
+                    processed.append(queue_name)
+            return bulk_queues_message("deleted", processed, queue_names, bulk_options)
+
+        return submit_bulk_task(
+            "Delete all queues", delete_all, count_jobs(queue_names, ["queued"])
+        )
 
 
 @monitor_blueprint.route("/queues/empty/all", methods=["POST"])
@@ -335,12 +1045,22 @@ def delete_all_queues_api():
 @cache_control_no_store
 def empty_all_queues_api():
     if request.method == "POST":
-        queue_names = [queue.name for queue in list_all_queues()]
-        for queue in list_all_queues():
-            queue.empty()
-        return {
-            "message": "Successfully emptied queues {0}".format(", ".join(queue_names))
-        }
+        queue_names = current_app.queue_directory.queue_names(get_current_connection())
+
+        def empty_all(**bulk_options):
+            processed = []
+            for queue_name in queue_names:
+                if is_stopped(bulk_options):
+                    break
+                empty_queue(queue_name, **bulk_options)
+                # a queue left part-way by cancellation is not reported
+                if not is_stopped(bulk_options):
+                    processed.append(queue_name)
+            return bulk_queues_message("emptied", processed, queue_names, bulk_options)
+
+        return submit_bulk_task(
+            "Empty all queues", empty_all, count_jobs(queue_names, ["queued"])
+        )
 
 
 @monitor_blueprint.route("/workers/info", methods=["GET"])
@@ -442,13 +1162,28 @@ def delete_all_jobs_api():
         if requested_queues is None or requested_job_status is None:
             raise RQMonitorException("No queue/status selected", status_code=400)
 
-        delete_all_jobs_in_queues_registries(requested_queues, requested_job_status)
-
-        return {
-            "message": "Successfully deleted all jobs with status as {0} on queues {1}".format(
-                ", ".join(requested_job_status), ", ".join(requested_queues)
+        def delete_all(**bulk_options):
+            deleted_count = 0
+            processed = []
+            for queue_name in requested_queues:
+                deleted_count += delete_all_jobs_in_queues_registries(
+                    [queue_name], requested_job_status, **bulk_options
+                )
+                if is_stopped(bulk_options):
+                    break
+                processed.append(queue_name)
+            action = "deleted {0} jobs with status as {1} on".format(
+                deleted_count, ", ".join(requested_job_status)
             )
-        }
+            return bulk_queues_message(
+                action, processed, requested_queues, bulk_options
+            )
+
+        return submit_bulk_task(
+            "Delete all jobs on queues {0}".format(", ".join(requested_queues)),
+            delete_all,
+            count_jobs(requested_queues, requested_job_status),
+        )
 
 
 @monitor_blueprint.route("/jobs/requeue/all", methods=["POST"])
@@ -460,13 +1195,31 @@ def requeue_failed_jobs_api():
         if requested_queues is None:
             raise RQMonitorException("No queue/s selected", status_code=400)
 
-        fail_count = requeue_all_jobs_in_failed_registry(requested_queues)
-
-        return {
-            "message": "Successfully requeued all jobs on queues {0}".format(
-                ", ".join(requested_queues)
+        def requeue_all(**bulk_options):
+            requeued_count = fail_count = 0
+            processed = []
+            for queue_name in requested_queues:
+                requeued, failed = requeue_all_jobs_in_failed_registry(
+                    [queue_name], **bulk_options
+                )
+                requeued_count += requeued
+                fail_count += failed
+                if is_stopped(bulk_options):
+                    break
+                processed.append(queue_name)
+            action = "requeued {0} jobs on".format(requeued_count)
+            message = bulk_queues_message(
+                action, processed, requested_queues, bulk_options
             )
-        }
+            if fail_count:
+                message += ", {0} jobs no longer exist".format(fail_count)
+            return message
+
+        return submit_bulk_task(
+            "Requeue failed jobs on queues {0}".format(", ".join(requested_queues)),
+            requeue_all,
+            count_jobs(requested_queues, ["failed"]),
+        )
 
 
 @monitor_blueprint.route("/jobs/cancel/all", methods=["POST"])
@@ -478,16 +1231,163 @@ def cancel_queued_jobs_api():
         if requested_queues is None:
             raise RQMonitorException("No queue/s selected", status_code=400)
 
-        fail_count = cancel_all_queued_jobs(requested_queues)
+        def cancel_all(**bulk_options):
+            cancelled_count = fail_count = 0
+            processed = []
+            for queue_name in requested_queues:
+                cancelled, failed = cancel_all_queued_jobs([queue_name], **bulk_options)
+                cancelled_count += cancelled
+                fail_count += failed
+                if is_stopped(bulk_options):
+                    break
+                processed.append(queue_name)
+            action = "cancelled {0} jobs on".format(cancelled_count)
+            message = bulk_queues_message(
+                action, processed, requested_queues, bulk_options
+            )
+            if fail_count:
+                message += ", {0} jobs no longer exist".format(fail_count)
+            return message
+
+        return submit_bulk_task(
+            "Cancel queued jobs on queues {0}".format(", ".join(requested_queues)),
+            cancel_all,
+            count_jobs(requested_queues, ["queued"]),
+        )
+
+
+@monitor_blueprint.route("/tasks", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+def list_tasks_api():
+    if request.method == "GET":
+        return {
+            "data": [
+                task.to_dict() for task in current_app.bulk_task_executor.list_tasks()
+            ]
+        }
+
+
+@monitor_blueprint.route("/tasks/<task_id>", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+def task_api(task_id):
+    if request.method == "GET":
+        return get_bulk_task(task_id).to_dict()
+
+
+@monitor_blueprint.route("/tasks/<task_id>/cancel", methods=["POST"])
+@catch_global_exception
+@cache_control_no_store
+def cancel_task_api(task_id):
+    if request.method == "POST":
+        task = get_bulk_task(task_id)
+        task.cancel()
+        return task.to_dict()
+
+
+@monitor_blueprint.route("/metrics/timeseries", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+@etag_conditional
+def timeseries_api():
+    """
+    Job counts history of queues, optionally filtered by queues[] and
+    jobstatus[], over the last since seconds downsampled to at most points
+    values per series
+    """
+    requested_queues = request.args.getlist("queues[]") or None
+    requested_job_status = (
+        request.args.getlist("jobstatus[]") or TIMESERIES_STATUSES
+    )
+    unknown_job_status = set(requested_job_status) - set(TIMESERIES_STATUSES)
+    if unknown_job_status:
+        raise RQMonitorException(
+            "No history of job status {0}".format(", ".join(unknown_job_status)),
+            status_code=400,
+        )
+    try:
+        since = int(request.args.get("since", 3600))
+        points = int(request.args.get("points", 120))
+    except ValueError:
+        raise RQMonitorException("since and points must be integers", status_code=400)
+    sampler = current_app.timeseries_samplers[g.redis_instance_index]
+    return sampler.query(requested_queues, requested_job_status, since, points)
+
 
-        return {"message": "Successfully requeued all jobs"}
+@monitor_blueprint.route("/metrics", methods=["GET"])
+@catch_global_exception
+@cache_control_no_store
+def metrics_api():
+    """
+    Prometheus text exposition of job counts, worker states and suspension
+    state of every redis instance, along with latencies of rqmonitor requests.
+    Metrics of an instance are collected at most once per RQ_MONITOR_METRICS_TTL
+    whatever the number of scrapers
+    """
+    collectors = current_app.metrics_collectors
+    snapshot_cache = current_app.snapshot_cache
+    ttl = current_app.config.get("RQ_MONITOR_METRICS_TTL", RQ_MONITOR_METRICS_TTL)
+
+    def collect(index, connection):
+        return snapshot_cache.get_or_compute(
+            (index, "/metrics"),
+            lambda: render_instance_samples(index, collectors[index].collect()),
+            ttl,
+        )
+
+    instance_samples = [
+        render_instance_samples(index) if error is not None else samples
+        for index, samples, error in current_app.instance_fanout.map(
+            collect, with_index=True
+        )
+    ]
+    return Response(
+        render_metrics(instance_samples, current_app.request_latencies),
+        content_type=METRICS_CONTENT_TYPE,
+    )
+
+
+@monitor_blueprint.route("/stream")
+@catch_global_exception
+@cache_control_no_store
+def stream_api():
+    """
+    Server-Sent Events stream of dashboard changes, first event carries full
+    state (marked with reset) and later ones only changed/removed rows
+    """
+    sampler = current_app.dashboard_samplers[g.redis_instance_index]
+    keepalive = current_app.config.get(
+        "RQ_MONITOR_STREAM_KEEPALIVE", RQ_MONITOR_STREAM_KEEPALIVE
+    )
+    subscription = sampler.subscribe()
+
+    def events():
+        try:
+            while True:
+                try:
+                    delta = subscription.get(timeout=keepalive)
+                except Empty:
+                    # comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield "data: {0}\n\n".format(json.dumps(delta))
+        finally:
+            sampler.unsubscribe(subscription)
+
+    return Response(
+        events(), mimetype="text/event-stream", headers={"X-Accel-Buffering": "no"}
+    )
 
 
 @monitor_blueprint.route("/redis/memory")
 @catch_global_exception
 @cache_control_no_store
 def redis_memory_api():
-    return {"redis_memory_used": get_redis_memory_used()}
+    estimator = get_redis_memory_estimator()
+    if request.args.get("refresh") == "true":
+        estimator.request_refresh()
+    return estimator.to_dict()
 
 
 @monitor_blueprint.context_processor
@@ -498,6 +1398,14 @@ def inject_refresh_interval():
     return dict(refresh_interval=refresh_interval)
 
 
+@monitor_blueprint.context_processor
+def inject_redis_memory_update_interval():
+    redis_memory_update_interval = current_app.config.get(
+        "RQ_MONITOR_REDIS_MEMORY_UPDATE", RQ_MONITOR_REDIS_MEMORY_UPDATE
+    )
+    return dict(redis_memory_update_interval=redis_memory_update_interval)
+
+
 @monitor_blueprint.context_processor
 def inject_redis_instances_count():
     return dict(redis_instances_count=len(current_app.config["RQ_MONITOR_REDIS_URL"]))
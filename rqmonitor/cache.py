@@ -0,0 +1,164 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from rqmonitor.compression import compress
+
+# first item of keys of snapshots merging rows of all redis instances
+ALL_INSTANCES_KEY = "all"
+
+
+class Snapshot(object):
+    """
+    JSON payload of an API along with what every response of it needs, worked
+    out once per snapshot instead of once per request: its body, ETag
+    fingerprint and bodies compressed per content encoding. DataTables draw
+    counter changes on every request, it is left out of all of them and put
+    back in when rendering.
+    """
+
+    def __init__(self, payload):
+        """
+        :param payload: JSON serializable dict
+        """
+        self.payload = payload
+        self.body = json.dumps(
+            {key: value for key, value in payload.items() if key != "draw"},
+            sort_keys=True,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self.fingerprint = hashlib.sha1(self.body).hexdigest()
+        self._encoded = {}
+
+    def render(self, draw=None):
+        """
+        :param draw: DataTables draw counter of the request, None if payload has none
+        :return: JSON body
+        """
+        if draw is None:
+            return self.body
+        prefix = '{{"draw":{0}'.format(int(draw)).encode("utf-8")
+        return prefix + (b"," + self.body[1:] if len(self.body) > 2 else b"}")
+
+    def encoded(self, encoding, draw=None):
+        """
+        :param encoding: one of compression.available_encodings
+        :return: rendered body compressed with encoding, kept for next requests
+                 unless it carries a draw counter
+        """
+        if draw is not None:
+            return compress(self.render(draw), encoding)
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+
+class SnapshotCache(object):
+    """
+    Short lived, size capped LRU cache of computed API payloads shared by all
+    requests of the process. Concurrent requests for the same key wait for a
+    single computation instead of each querying redis.
+    """
+
+    def __init__(self, max_entries):
+        """
+        :param max_entries: number of snapshots kept, least recently used are evicted
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, ttl):
+        """
+        :param key: hashable key identifying the snapshot, first item should be
+                    redis instance index, or ALL_INSTANCES_KEY, for invalidate()
+                    to work
+        :param compute: callable returning value to cache
+        :param ttl: seconds for which computed value is served, 0 disables caching
+        :return: cached or freshly computed value
+        """
+        if ttl <= 0:
+            return compute()
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.time() - entry[1] < ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                computing = self._in_flight.get(key)
+                if computing is None:
+                    computing = self._in_flight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # some other request is computing same snapshot, reuse its result
+            computing.wait()
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self._entries[key][0]
+            # computation failed, try on our own
+
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            computing.set()
+
+    def get(self, key, ttl):
+        """
+        Non blocking lookup, for callers which can't wait on a computation
+        running in another thread, such as the asyncio serving mode
+
+        :return: cached value younger than ttl seconds, None if there is none
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] < ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Caches value computed for key, evicting least recently used entries
+        """
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, redis_instance_index=None):
+        """
+        :param redis_instance_index: drop snapshots of this instance, along with
+                                     those of all instances which include its
+                                     rows, all snapshots if None
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if redis_instance_index is None or key[0] in (
+                    redis_instance_index,
+                    ALL_INSTANCES_KEY,
+                ):
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
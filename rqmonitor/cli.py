@@ -20,6 +20,8 @@ from flask import Flask, Response, request
 from rqmonitor.defaults import RQ_MONITOR_REDIS_URL, RQ_MONITOR_REFRESH_INTERVAL
 from rqmonitor.version import VERSION
 from rqmonitor.bp import monitor_blueprint
+from rqmonitor.decorators import credentials_match
+from rqmonitor.aio import AsyncRQMonitor
 
 
 logger = logging.getLogger("werkzeug")
@@ -35,7 +37,9 @@ def add_basic_auth(blueprint, username, password, realm="RQ Monitor"):
     @blueprint.before_request
     def basic_http_auth(*args, **kwargs):
         auth = request.authorization
-        if auth is None or auth.password != password or auth.username != username:
+        if auth is None or not credentials_match(
+            auth.username, auth.password, username, password
+        ):
             return Response(
                 "Please login",
                 401,
@@ -51,7 +55,8 @@ def create_app_with_blueprint(
     blueprint=monitor_blueprint,
 ):
     """Return Flask app with default configuration and registered blueprint."""
-    app = Flask(__name__)
+    # static assets are left to the blueprint, which serves them precompressed
+    app = Flask(__name__, static_folder=None)
 
     # Override with any settings in config file, if given.
     if config:
@@ -70,6 +75,28 @@ def create_app_with_blueprint(
     return app
 
 
+def create_async_app(
+    config=None,
+    username=None,
+    password=None,
+    url_prefix="",
+    blueprint=monitor_blueprint,
+    redis_url=None,
+):
+    """Return ASGI app serving listing APIs with redis.asyncio, rest by Flask app.
+
+    Needs redis>=4.2.0 and an ASGI server, e.g.
+    uvicorn --factory rqmonitor.cli:create_async_app
+
+    """
+    app = create_app_with_blueprint(config, username, password, url_prefix, blueprint)
+    if redis_url:
+        app.config["RQ_MONITOR_REDIS_URL"] = redis_url
+    else:
+        app.config.setdefault("RQ_MONITOR_REDIS_URL", RQ_MONITOR_REDIS_URL)
+    return AsyncRQMonitor(app, url_prefix, username, password)
+
+
 def check_url(url, decode_components=False):
     """
     Taken from redis-py for basic check before passing URL to redis-py
@@ -0,0 +1,104 @@
+"""
+Response compression and precompression of static assets. Depends on the
+standard library alone (brotli being optional), so that setup.py can run it
+at build time without rqmonitor dependencies installed:
+
+    python -m rqmonitor.compression [static folder]
+"""
+
+import gzip
+import hashlib
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# content encodings in order of preference, with suffix of precompressed files
+CONTENT_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# text assets worth precompressing, images and woff fonts are compressed already
+PRECOMPRESSED_EXTENSIONS = (".css", ".js", ".html", ".svg", ".ttf", ".eot")
+# mimetypes of dynamic responses compressed on the fly
+COMPRESSED_MIMETYPES = ("application/json", "text/html", "text/plain")
+# dynamic responses trade ratio for speed, static assets are compressed once
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 5
+ASSET_GZIP_LEVEL = 9
+ASSET_BROTLI_QUALITY = 11
+# fingerprinted static assets never change under their URL
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def available_encodings():
+    """
+    :return: content encodings which can be produced, in order of preference
+    """
+    return [
+        encoding
+        for encoding, _ in CONTENT_ENCODINGS
+        if encoding != "br" or brotli is not None
+    ]
+
+
+def compress(body, encoding, asset=False):
+    """
+    :param body: bytes to compress
+    :param encoding: one of available_encodings
+    :param asset: whether body is a static asset, compressed once for good
+    :return: compressed bytes, gzip ones not depending on time of compression
+    """
+    if encoding == "br":
+        quality = ASSET_BROTLI_QUALITY if asset else RESPONSE_BROTLI_QUALITY
+        return brotli.compress(body, quality=quality)
+    level = ASSET_GZIP_LEVEL if asset else RESPONSE_GZIP_LEVEL
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def file_fingerprint(path):
+    """
+    :return: short hash of file content, to be put in its URL
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def precompress_static_folder(static_folder):
+    """
+    Writes .br (when brotli is installed) and .gz siblings of every text
+    asset under static_folder, left out where they wouldn't be smaller
+
+    :return: count of files written
+    """
+    written = 0
+    for root, _, filenames in os.walk(static_folder):
+        for filename in filenames:
+            if not filename.endswith(PRECOMPRESSED_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            with open(path, "rb") as f:
+                body = f.read()
+            for encoding, suffix in CONTENT_ENCODINGS:
+                if encoding not in available_encodings():
+                    continue
+                compressed = compress(body, encoding, asset=True)
+                if len(compressed) >= len(body):
+                    continue
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    folder = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    )
+    print("Precompressed {0} files".format(precompress_static_folder(folder)))
@@ -1,8 +1,54 @@
 import sys
+import hmac
 import traceback
 from functools import wraps
-from flask import make_response
+from flask import make_response, current_app, request, g
+from rqmonitor.cache import ALL_INSTANCES_KEY, Snapshot
 from rqmonitor.exceptions import RQMonitorException
+from rqmonitor.defaults import RQ_MONITOR_SNAPSHOT_TTL
+
+# request args which don't change the payload
+SNAPSHOT_IGNORED_ARGS = ("_", "draw")
+
+
+def credentials_match(username, password, expected_username, expected_password):
+    """
+    HTTP Basic Auth check shared by Flask and asyncio serving, compared in
+    constant time so response time doesn't reveal how much of them matched
+    """
+    username_match = hmac.compare_digest(
+        (username or "").encode("utf-8"), (expected_username or "").encode("utf-8")
+    )
+    password_match = hmac.compare_digest(
+        (password or "").encode("utf-8"), (expected_password or "").encode("utf-8")
+    )
+    return username_match and password_match
+
+
+def snapshot_key(redis_instance_index, path, args):
+    """
+    Key of a listing payload in the snapshot cache, shared by Flask views and
+    the asyncio serving mode so that both serve the same snapshots. Payloads
+    merging rows of all instances don't depend on the requested instance,
+    they get a key of their own which invalidation of any instance drops
+
+    :param args: (arg, value) pairs of request args, repeated args included
+    """
+    args = list(args)
+    if any(arg == "all_instances" and value.lower() == "true" for arg, value in args):
+        redis_instance_index = ALL_INSTANCES_KEY
+    return (
+        redis_instance_index,
+        path,
+        tuple(
+            sorted(
+                (arg, value)
+                for arg, value in args
+                # requested instance is first item of key, if it matters
+                if arg not in SNAPSHOT_IGNORED_ARGS and arg != "redis_instance_index"
+            )
+        ),
+    )
 
 
 def cache_control_no_store(func):
@@ -34,3 +80,56 @@ def catch_global_exception(func):
         return inner_response
 
     return _wrapper
+
+
+def snapshot_cached(func):
+    """
+    Serves payload of listing APIs from the process wide snapshot cache, keyed
+    by redis instance, path and normalized request args, so that every open
+    dashboard polling same view costs redis a single computation per TTL.
+    Returns the cache.Snapshot, to be rendered by etag_conditional.
+    """
+
+    @wraps(func)
+    def _wrapper(*args, **kwargs):
+        key = snapshot_key(
+            g.redis_instance_index, request.path, request.args.items(multi=True)
+        )
+        ttl = current_app.config.get("RQ_MONITOR_SNAPSHOT_TTL", RQ_MONITOR_SNAPSHOT_TTL)
+        return current_app.snapshot_cache.get_or_compute(
+            key, lambda: Snapshot(func(*args, **kwargs)), ttl
+        )
+
+    return _wrapper
+
+
+def etag_conditional(func):
+    """
+    Adds ETag fingerprint of JSON payload to response and answers with
+    304 Not Modified when client already has it (If-None-Match).
+    DataTables draw counter is left out of fingerprint as it changes on every
+    request, it is echoed back as per the current request.
+    Fingerprint and body come from the snapshot when view is snapshot_cached,
+    which is kept on g for compress_response to reuse its compressed bodies.
+    """
+
+    @wraps(func)
+    def _wrapper(*args, **kwargs):
+        snapshot = func(*args, **kwargs)
+        if not isinstance(snapshot, Snapshot):
+            snapshot = Snapshot(snapshot)
+        # weak comparison, ETag is weakened once payload is compressed
+        if request.if_none_match.contains_weak(snapshot.fingerprint):
+            _make_response = make_response("", 304)
+        else:
+            draw = None
+            if "draw" in snapshot.payload:
+                draw = request.args.get("draw", type=int)
+            _make_response = current_app.response_class(
+                snapshot.render(draw), mimetype="application/json"
+            )
+            g.response_snapshot = (snapshot, draw)
+        _make_response.set_etag(snapshot.fingerprint)
+        return _make_response
+
+    return _wrapper
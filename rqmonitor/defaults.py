@@ -1,3 +1,41 @@
 RQ_MONITOR_REDIS_URL = "redis://127.0.0.1:6379"
 RQ_MONITOR_REFRESH_INTERVAL = 2000  # 2 secs
-RQ_MONITOR_REDIS_MEMORY_UPDATE = 10000
+RQ_MONITOR_REDIS_MEMORY_UPDATE = 10000  # ms between two memory estimations
+RQ_MONITOR_JOBS_OVERFETCH = 10  # extra jobs fetched per block while paging
+RQ_MONITOR_REDIS_MAX_CONNECTIONS = 20  # per redis instance
+RQ_MONITOR_REDIS_POOL_TIMEOUT = 5  # secs to wait for a free pooled connection
+RQ_MONITOR_REDIS_SOCKET_TIMEOUT = 10  # secs
+RQ_MONITOR_REDIS_SOCKET_CONNECT_TIMEOUT = 5  # secs
+RQ_MONITOR_REDIS_HEALTH_CHECK_INTERVAL = 30  # secs
+RQ_MONITOR_REDIS_MEMORY_SCAN_COUNT = 500  # keys per SCAN batch
+RQ_MONITOR_REDIS_MEMORY_SCAN_PAUSE = 0.01  # secs between two SCAN batches
+RQ_MONITOR_REDIS_MEMORY_SAMPLE_RATIO = 0.1  # fraction of keys measured
+RQ_MONITOR_REDIS_MEMORY_SAMPLES = 5  # MEMORY USAGE SAMPLES for nested values
+RQ_MONITOR_HOSTNAME_CACHE_TTL = 300  # secs worker hostname lookups are reused
+RQ_MONITOR_SNAPSHOT_TTL = 1  # secs listing API payloads are shared, 0 disables
+RQ_MONITOR_SNAPSHOT_MAX_ENTRIES = 512
+RQ_MONITOR_STREAM_KEEPALIVE = 15  # secs between keepalive comments on /stream
+RQ_MONITOR_STREAM_WORKERS = 8  # streamed responses relayed at the same time by aio
+RQ_MONITOR_SEARCH_INDEX_UPDATE = 5000  # ms between two job search index updates
+RQ_MONITOR_SEARCH_INDEX_BATCH = 500  # new jobs fetched per pipeline while indexing
+RQ_MONITOR_SEARCH_INDEX_PAUSE = 0.01  # secs between two queues while indexing
+RQ_MONITOR_SEARCH_INDEX_WAIT = 2  # secs first search waits for index to be built
+RQ_MONITOR_BULK_CHUNK_SIZE = 1000  # jobs handled per script run in bulk actions
+RQ_MONITOR_BULK_TIME_SLICE = 0.05  # secs a single bulk action script run may take
+RQ_MONITOR_BULK_PAUSE = 0.01  # secs between two bulk action script runs
+RQ_MONITOR_TASK_WORKERS = 2  # bulk actions run at the same time
+RQ_MONITOR_TASK_QUEUE_SIZE = 20  # bulk actions waiting for their turn, others refused
+RQ_MONITOR_TASK_RETENTION = 600  # secs a done bulk action can still be polled
+RQ_MONITOR_TASK_WAIT = 1  # secs an action request waits for its bulk action
+RQ_MONITOR_FANOUT_TIMEOUT = 2  # secs to wait for each instance in all instances views
+RQ_MONITOR_FANOUT_WORKERS = 16  # redis instances queried at the same time
+RQ_MONITOR_TIMESERIES_INTERVAL = 60  # secs between two job count samples, 0 disables
+# (every Nth sample, samples kept) per history tier, 2h by minute and 24h by 10 mins
+RQ_MONITOR_TIMESERIES_TIERS = ((1, 120), (10, 144))
+RQ_MONITOR_METRICS_TTL = 5  # secs /metrics of an instance are reused between scrapes
+RQ_MONITOR_ANALYTICS_TTL = 30  # secs latency analytics of a queue are reused
+RQ_MONITOR_ANALYTICS_SAMPLE = 10000  # newest jobs analysed per registry, 0 for all
+RQ_MONITOR_ANALYTICS_MAX_QUEUES = 64  # queues whose analytics are kept in memory
+RQ_MONITOR_EXPORT_CHUNK_SIZE = 1000  # jobs read per pipeline while exporting jobs
+RQ_MONITOR_QUEUE_DIRECTORY_TTL = 30  # secs a queue list of unchanged size is reused
+RQ_MONITOR_COMPRESS_MIN_SIZE = 1024  # bytes, smaller responses are sent uncompressed
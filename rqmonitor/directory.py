@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import namedtuple
+
+from rq.compat import as_text
+from rq.queue import Queue
+
+
+# what views need of a queue, instead of a full rq Queue per listed queue
+QueueDescriptor = namedtuple("QueueDescriptor", "name key")
+
+
+def read_queue_descriptors(queue_keys):
+    """
+    :param queue_keys: members of rq:queues, possibly repeated (SSCAN)
+    :return: QueueDescriptor of every queue, sorted by name, keys not
+             prefixed as rq queues are skipped like Queue.from_queue_key does
+    """
+    prefix = Queue.redis_queue_namespace_prefix
+    queue_keys = {as_text(key) for key in queue_keys if key}
+    return [
+        QueueDescriptor(key[len(prefix) :], key)
+        for key in sorted(queue_keys)
+        if key.startswith(prefix)
+    ]
+
+
+class QueueDirectory(object):
+    """
+    Cached list of queues of every redis instance, shared by all views
+    listing queues. Every read checks SCARD of rq:queues alone, the set is
+    walked again with SSCAN only when its size changed, when the list is
+    older than ttl seconds (a queue deleted and another created in between
+    leave size unchanged) or after invalidate
+    """
+
+    def __init__(self, ttl, scan_count=1000):
+        """
+        :param ttl: seconds after which queue list is walked again even if
+                    its size didn't change
+        :param scan_count: members asked for in every SSCAN batch
+        """
+        self.ttl = ttl
+        self.scan_count = scan_count
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, connection):
+        with self._lock:
+            entry = self._entries.get(connection)
+            if entry is None:
+                entry = self._entries[connection] = {
+                    "size": None,
+                    "queues": [],
+                    "refreshed_at": 0,
+                    "lock": threading.Lock(),
+                }
+            return entry
+
+    def get_cached(self, connection, size):
+        """
+        :param size: current SCARD of rq:queues
+        :return: cached queues of instance, None if they need a walk
+        """
+        entry = self._entry(connection)
+        if entry["size"] != size or time.time() - entry["refreshed_at"] >= self.ttl:
+            return None
+        return entry["queues"]
+
+    def cached_queue_names(self, connection):
+        """
+        :return: names of queues of instance as last walked, without checking
+                 they are still current, empty if never walked
+        """
+        return [queue.name for queue in self._entry(connection)["queues"]]
+
+    def update(self, connection, size, queue_keys):
+        """
+        :param size: SCARD of rq:queues read before walking it
+        :param queue_keys: members of rq:queues walked
+        :return: queues of instance, now cached
+        """
+        entry = self._entry(connection)
+        entry["queues"] = read_queue_descriptors(queue_keys)
+        entry["size"] = size
+        entry["refreshed_at"] = time.time()
+        return entry["queues"]
+
+    def queues(self, connection):
+        """
+        :param connection: redis connection of instance
+        :return: list of QueueDescriptor of all queues, sorted by name
+        """
+        size = connection.scard(Queue.redis_queues_keys)
+        queues = self.get_cached(connection, size)
+        if queues is not None:
+            return queues
+        # concurrent reads of an instance wait for a single walk
+        with self._entry(connection)["lock"]:
+            queues = self.get_cached(connection, size)
+            if queues is None:
+                queue_keys = connection.sscan_iter(
+                    Queue.redis_queues_keys, count=self.scan_count
+                )
+                queues = self.update(connection, size, queue_keys)
+        return queues
+
+    def queue_names(self, connection):
+        """
+        :return: names of all queues of instance, sorted
+        """
+        return [queue.name for queue in self.queues(connection)]
+
+    def invalidate(self, connection=None):
+        """
+        Next read of instance walks rq:queues again, as after queues were
+        created or deleted
+
+        :param connection: redis connection of instance, None for all
+        """
+        with self._lock:
+            entries = (
+                list(self._entries.values())
+                if connection is None
+                else [self._entries.get(connection)]
+            )
+        for entry in entries:
+            if entry is not None:
+                entry["refreshed_at"] = 0
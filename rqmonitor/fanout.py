@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+
+class InstanceFanout(object):
+    """
+    Runs same collection on every configured redis instance in parallel, so
+    that a view across all instances costs the latency of the slowest one
+    instead of the sum of all. An instance which fails or doesn't answer in
+    time is reported as such without holding back the others. A collection
+    which timed out can't be interrupted, the instance is reported at once
+    until it finishes instead of piling more of them up, so that a hung
+    instance holds a single thread of the pool
+    """
+
+    def __init__(self, connections, timeout, max_workers=16):
+        """
+        :param connections: redis connections of all instances, by index
+        :param timeout: seconds to wait for any instance
+        :param max_workers: number of threads collecting at the same time
+        """
+        self.connections = connections
+        self.timeout = timeout
+        # instance index to its collection still running after timing out
+        self._timed_out = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rqmonitor-fanout"
+        )
+
+    def map(self, collect, with_index=False):
+        """
+        :param collect: callable of redis connection, run once per instance
+        :param with_index: whether instance index is passed to collect before
+                           its connection
+        :return: list of (instance index, result, error) tuples, error is None
+                 for instances which answered in time, result is None for others
+        """
+        futures = []
+        for index, connection in enumerate(self.connections):
+            with self._lock:
+                timed_out = self._timed_out.get(index)
+                if timed_out is not None and timed_out.done():
+                    del self._timed_out[index]
+                    timed_out = None
+            if timed_out is not None:
+                futures.append(None)
+                continue
+            args = (index, connection) if with_index else (connection,)
+            futures.append(self._executor.submit(collect, *args))
+        deadline = time.monotonic() + self.timeout
+        timed_out_error = "Timed out after {0} secs".format(self.timeout)
+        results = []
+        for index, future in enumerate(futures):
+            if future is None:
+                results.append((index, None, timed_out_error + ", still not answering"))
+                continue
+            try:
+                result = future.result(max(0, deadline - time.monotonic()))
+            except TimeoutError:
+                if not future.cancel():
+                    with self._lock:
+                        self._timed_out[index] = future
+                results.append((index, None, timed_out_error))
+            except Exception as e:
+                logger.warning(
+                    "Failed to collect from instance {0}: {1}".format(index, e)
+                )
+                results.append((index, None, str(e)))
+            else:
+                results.append((index, result, None))
+        return results
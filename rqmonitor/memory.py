@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+
+import humanize
+
+from rqmonitor.utils import estimate_redis_memory_used
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+
+class RedisMemoryEstimator(object):
+    """
+    Keeps estimating memory used by rq: namespace of one redis instance in a
+    background thread and caches the last estimate, so that dashboard can
+    serve it instantly without ever blocking redis
+    """
+
+    def __init__(self, connection, interval, **scan_options):
+        """
+        :param connection: redis connection of instance to estimate
+        :param interval: seconds to wait between two estimations
+        :param scan_options: passed as it is to estimate_redis_memory_used
+        """
+        self.connection = connection
+        self.interval = interval
+        self.scan_options = scan_options
+        self.memory_used = None
+        self.updated_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Starts background estimation if not already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="rqmonitor-memory-estimator", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._refresh_requested.set()
+
+    def join(self, timeout=None):
+        """Waits for background estimation to exit, once stopped"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def request_refresh(self):
+        """Starts next estimation right after the running one"""
+        self._refresh_requested.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._refresh_requested.clear()
+            try:
+                memory_used = estimate_redis_memory_used(
+                    self.connection, stop_event=self._stopped, **self.scan_options
+                )
+            except Exception:
+                logger.exception("Failed to estimate redis memory used")
+            else:
+                if memory_used is not None:
+                    self.memory_used = memory_used
+                    self.updated_at = time.time()
+            self._refresh_requested.wait(self.interval)
+
+    def to_dict(self):
+        if self.memory_used is None:
+            return {
+                "redis_memory_used": "Estimating...",
+                "redis_memory_updated_at": None,
+            }
+        return {
+            "redis_memory_used": humanize.naturalsize(self.memory_used),
+            "redis_memory_updated_at": self.updated_at,
+        }
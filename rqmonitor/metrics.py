@@ -0,0 +1,257 @@
+import threading
+import time
+from bisect import bisect_left
+
+from rq.compat import as_text
+from rq.queue import Queue
+from rq.suspension import WORKERS_SUSPENDED
+from rq.worker import Worker
+
+from rqmonitor.utils import (
+    WORKER_SNAPSHOT_FIELDS,
+    add_job_count_commands,
+    list_all_possible_job_status,
+    read_job_counts,
+    read_workers_snapshot,
+)
+
+# same as default buckets of Prometheus client libraries, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name, type and help of every exported metric family, in exposition order
+METRIC_FAMILIES = (
+    ("rq_up", "gauge", "Whether redis instance answered last collection"),
+    (
+        "rq_jobs",
+        "gauge",
+        "Jobs of queue by registry (job status), queued ones being queue depth",
+    ),
+    ("rq_workers", "gauge", "Alive workers by state"),
+    ("rq_workers_suspended", "gauge", "Whether workers are suspended"),
+    (
+        "rqmonitor_collect_duration_seconds",
+        "gauge",
+        "Time spent collecting metrics of redis instance",
+    ),
+    (
+        "rqmonitor_request_duration_seconds",
+        "histogram",
+        "Time spent answering rqmonitor requests",
+    ),
+)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_sample(name, labels, value):
+    """
+    :param labels: tuple of (label name, label value) pairs
+    :return: sample line of Prometheus text exposition format
+    """
+    return "{0}{{{1}}} {2}".format(
+        name,
+        ",".join(
+            '{0}="{1}"'.format(label, escape_label_value(label_value))
+            for label, label_value in labels
+        ),
+        value,
+    )
+
+
+class MetricsCollector(object):
+    """
+    Collects job counts of every queue and registry, worker states and
+    suspension state of one redis instance in two non transactional
+    pipelines. First one checks size of the queue directory (SCARD), counts
+    jobs of queues known to the shared queue directory and reads worker set
+    and suspension flag. Worker hashes can only be read once worker set is
+    known, second one reads them, along with job counts of queues when the
+    directory had to be walked again and queues changed. Neither of them
+    blocks redis for the whole collection, whatever the number of queues
+    """
+
+    def __init__(self, connection, queue_directory):
+        """
+        :param connection: redis connection of instance to collect
+        :param queue_directory: directory.QueueDirectory shared by views
+        """
+        self.connection = connection
+        self.queue_directory = queue_directory
+        self.statuses = list_all_possible_job_status()
+
+    def collect(self):
+        """
+        :return: dict of job counts (queue name to status to count), worker
+                 states (state to count of workers), suspended flag and
+                 duration of collection in seconds
+        """
+        started = time.perf_counter()
+        counted_queues = self.queue_directory.cached_queue_names(self.connection)
+        with self.connection.pipeline(transaction=False) as pipeline:
+            pipeline.scard(Queue.redis_queues_keys)
+            counts, lookups = add_job_count_commands(
+                pipeline, counted_queues, self.statuses
+            )
+            pipeline.smembers(Worker.redis_workers_keys)
+            pipeline.exists(WORKERS_SUSPENDED)
+            results = pipeline.execute()
+        size = results[0]
+        job_counts = read_job_counts(counts, lookups, results[1:-2])
+        worker_keys = sorted(as_text(key) for key in results[-2])
+        suspended = bool(results[-1])
+
+        queues = self.queue_directory.get_cached(self.connection, size)
+        if queues is None:
+            queue_names = self.queue_directory.queue_names(self.connection)
+        else:
+            queue_names = [queue.name for queue in queues]
+        recount = queue_names != counted_queues
+
+        if worker_keys or recount:
+            with self.connection.pipeline(transaction=False) as pipeline:
+                for worker_key in worker_keys:
+                    pipeline.hmget(worker_key, *WORKER_SNAPSHOT_FIELDS)
+                if recount:
+                    counts, lookups = add_job_count_commands(
+                        pipeline, queue_names, self.statuses
+                    )
+                results = pipeline.execute()
+            if recount:
+                job_counts = read_job_counts(
+                    counts, lookups, results[len(worker_keys) :]
+                )
+            workers = read_workers_snapshot(
+                worker_keys, results[: len(worker_keys)], False
+            )
+        else:
+            workers = []
+
+        worker_states = {}
+        for worker in workers:
+            worker_states[worker["state"]] = worker_states.get(worker["state"], 0) + 1
+        return {
+            "job_counts": job_counts,
+            "worker_states": worker_states,
+            "suspended": suspended,
+            "duration": time.perf_counter() - started,
+        }
+
+
+def render_instance_samples(redis_instance_index, metrics=None):
+    """
+    :param metrics: as returned by MetricsCollector.collect, None for an
+                    instance which couldn't be collected
+    :return: dict of metric family name to sample lines of instance
+    """
+    instance = (("redis_instance", redis_instance_index),)
+    samples = {"rq_up": [format_sample("rq_up", instance, 0 if metrics is None else 1)]}
+    if metrics is None:
+        return samples
+    samples["rq_jobs"] = []
+    for queue, counts in sorted(metrics["job_counts"].items()):
+        # label prefix is shared by all statuses of queue, build it once
+        prefix = 'rq_jobs{{redis_instance="{0}",queue="{1}"'.format(
+            redis_instance_index, escape_label_value(queue)
+        )
+        samples["rq_jobs"].extend(
+            '{0},status="{1}"}} {2}'.format(prefix, status, count)
+            for status, count in counts.items()
+        )
+    samples["rq_workers"] = [
+        format_sample("rq_workers", instance + (("state", state),), count)
+        for state, count in sorted(metrics["worker_states"].items())
+    ]
+    samples["rq_workers_suspended"] = [
+        format_sample("rq_workers_suspended", instance, int(metrics["suspended"]))
+    ]
+    samples["rqmonitor_collect_duration_seconds"] = [
+        format_sample(
+            "rqmonitor_collect_duration_seconds",
+            instance,
+            round(metrics["duration"], 6),
+        )
+    ]
+    return samples
+
+
+def render_metrics(instance_samples, request_latencies):
+    """
+    :param instance_samples: list of dicts as returned by render_instance_samples
+    :param request_latencies: RequestLatencies to export along
+    :return: Prometheus text exposition of all metric families
+    """
+    samples = {}
+    for instance in instance_samples:
+        for name, lines in instance.items():
+            samples.setdefault(name, []).extend(lines)
+    samples["rqmonitor_request_duration_seconds"] = request_latencies.samples()
+
+    lines = []
+    for name, metric_type, description in METRIC_FAMILIES:
+        lines.append("# HELP {0} {1}".format(name, description))
+        lines.append("# TYPE {0} {1}".format(name, metric_type))
+        lines.extend(samples.get(name, ()))
+    return "\n".join(lines) + "\n"
+
+
+class RequestLatencies(object):
+    """
+    Histograms of time spent answering requests, by endpoint and method,
+    exported as rqmonitor_request_duration_seconds
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        :param buckets: sorted upper bounds of histogram buckets, in seconds
+        """
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, method, duration):
+        """
+        :param duration: seconds spent answering request
+        """
+        with self._lock:
+            histogram = self._histograms.get((endpoint, method))
+            if histogram is None:
+                histogram = self._histograms[(endpoint, method)] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            bucket = bisect_left(self.buckets, duration)
+            if bucket < len(self.buckets):
+                histogram["buckets"][bucket] += 1
+            histogram["sum"] += duration
+            histogram["count"] += 1
+
+    def samples(self):
+        """
+        :return: sample lines of all histograms, buckets being cumulative
+        """
+        name = "rqmonitor_request_duration_seconds"
+        lines = []
+        with self._lock:
+            for (endpoint, method), histogram in sorted(self._histograms.items()):
+                labels = (("endpoint", endpoint), ("method", method))
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(
+                        format_sample(
+                            name + "_bucket", labels + (("le", bound),), cumulative
+                        )
+                    )
+                lines.append(
+                    format_sample(
+                        name + "_bucket", labels + (("le", "+Inf"),), histogram["count"]
+                    )
+                )
+                lines.append(format_sample(name + "_sum", labels, histogram["sum"]))
+                lines.append(format_sample(name + "_count", labels, histogram["count"]))
+        return lines
@@ -0,0 +1,60 @@
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+UNRESOLVED = "Unresolved"
+
+
+class HostnameResolver(object):
+    """
+    TTL cache of hostname to IP lookups. Lookups run on a small thread pool,
+    a request never waits on DNS and gets the cached (possibly stale) IP or
+    "Unresolved" until the lookup completes
+    """
+
+    def __init__(self, ttl, max_workers=2):
+        """
+        :param ttl: seconds for which a lookup result (even failed) is reused
+        :param max_workers: number of threads doing lookups
+        """
+        self.ttl = ttl
+        self._cache = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def resolve(self, hostname):
+        """
+        :param hostname: hostname to resolve
+        :return: cached IP of hostname, "Unresolved" if not yet known
+        """
+        if not hostname:
+            return UNRESOLVED
+
+        with self._lock:
+            cached = self._cache.get(hostname)
+            expired = cached is None or time.time() - cached[1] > self.ttl
+            if expired and hostname not in self._pending:
+                self._pending.add(hostname)
+                self._executor.submit(self._lookup, hostname)
+
+        return cached[0] if cached is not None else UNRESOLVED
+
+    def _lookup(self, hostname):
+        try:
+            host_ip = socket.gethostbyname(hostname)
+        except (socket.error, UnicodeError) as e:
+            logger.debug("Could not resolve hostname {0}: {1}".format(hostname, e))
+            host_ip = UNRESOLVED
+
+        with self._lock:
+            self._cache[hostname] = (host_ip, time.time())
+            self._pending.discard(hostname)
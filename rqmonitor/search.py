@@ -0,0 +1,399 @@
+import logging
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from rq.compat import as_text
+from rq.job import Job
+from rq.utils import current_timestamp
+
+from rqmonitor.utils import (
+    EXPIRING_REGISTRIES,
+    REGISTRY_CLASSES,
+    add_job_ids_command,
+    add_job_ids_signature_commands,
+    attach_rq_queue_prefix,
+    list_all_possible_job_status,
+)
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z_]+")
+
+
+def tokenize(text):
+    """
+    :return: set of lowercase word tokens in text, dotted paths split in parts
+    """
+    return set(TOKEN_PATTERN.findall(text.lower())) if text else set()
+
+
+def iter_prefixed(sorted_values, prefix):
+    """
+    :return: values of sorted list starting with prefix
+    """
+    position = bisect_left(sorted_values, prefix)
+    while position < len(sorted_values) and sorted_values[position].startswith(prefix):
+        yield sorted_values[position]
+        position += 1
+
+
+class JobSearchIndex(object):
+    """
+    In memory inverted index of jobs of one redis instance, kept up to date in
+    a background thread. Every cycle reads size and first and last ids of each
+    queue and registry, see add_job_ids_signature_commands, and reads what
+    changed in those whose signature changed alone: ids pushed after the last
+    known one of a queue, entries scored from the last known score on of a
+    registry. A block is read whole again only when its size doesn't add up.
+    Description of new jobs is fetched and jobs which are gone are evicted.
+    Jobs are then searched by job id prefix and by prefixes of description
+    tokens, description starting with func_name unless set when enqueueing
+    """
+
+    def __init__(
+        self, connection, queue_directory, interval, batch_size=500, pause=0.01
+    ):
+        """
+        :param connection: redis connection of instance to index
+        :param queue_directory: directory.QueueDirectory shared by views
+        :param interval: seconds to wait between two index updates
+        :param batch_size: new jobs fetched from redis per pipeline
+        :param pause: seconds to sleep between two queues while updating
+        """
+        self.connection = connection
+        self.queue_directory = queue_directory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._block_job_ids = {}
+        self._block_signatures = {}
+        # scores of job ids of registry blocks, ascending as ids are
+        self._block_scores = {}
+        self._job_tokens = {}
+        self._postings = {}
+        self._sorted_job_ids = []
+        self._sorted_tokens = []
+        self._dirty = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._refresh_requested = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Starts background indexing if not already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="rqmonitor-job-search-index", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._refresh_requested.set()
+
+    def request_refresh(self):
+        """Starts next update right after the running one"""
+        self._refresh_requested.set()
+
+    def wait_ready(self, timeout):
+        """
+        :param timeout: seconds to wait for first complete update
+        :return: whether index has been completely built once
+        """
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._refresh_requested.clear()
+            try:
+                self.update()
+            except Exception:
+                logger.exception("Failed to update job search index")
+            else:
+                self._ready.set()
+            self._refresh_requested.wait(self.interval)
+
+    def update(self):
+        """
+        Brings index in line with redis, one queue at a time
+        """
+        registries = list_all_possible_job_status()
+        queue_names = self.queue_directory.queue_names(self.connection)
+        changed_any = False
+
+        for queue in queue_names:
+            with self.connection.pipeline(transaction=False) as pipeline:
+                command_counts = [
+                    add_job_ids_signature_commands(pipeline, queue, registry)
+                    for registry in registries
+                ]
+                results = pipeline.execute()
+
+            signatures = {}
+            position = 0
+            for registry, command_count in zip(registries, command_counts):
+                signatures[(queue, registry)] = results[
+                    position : position + command_count
+                ]
+                position += command_count
+            changed = [
+                registry
+                for registry in registries
+                if self._block_signatures.get((queue, registry))
+                != signatures[(queue, registry)]
+            ]
+
+            if changed:
+                changed_any = True
+                blocks = self._read_blocks(queue, changed, signatures)
+                new_job_ids = [
+                    job_id
+                    for job_id in set().union(*(ids for ids, _ in blocks.values()))
+                    if job_id not in self._job_tokens
+                ]
+                for i in range(0, len(new_job_ids), self.batch_size):
+                    self._add_jobs(new_job_ids[i : i + self.batch_size])
+                with self._lock:
+                    for block, (job_ids, scores) in blocks.items():
+                        self._block_job_ids[block] = job_ids
+                        self._block_scores[block] = scores
+            # read before job ids, a change in between is walked next cycle
+            self._block_signatures.update(signatures)
+
+            if self._stopped.wait(self.pause):
+                return
+
+        with self._lock:
+            for block in list(self._block_job_ids):
+                if block[0] not in queue_names:
+                    del self._block_job_ids[block]
+                    self._block_signatures.pop(block, None)
+                    self._block_scores.pop(block, None)
+                    changed_any = True
+            if not changed_any:
+                return
+            alive_job_ids = set().union(*self._block_job_ids.values())
+            for job_id in list(self._job_tokens):
+                if job_id not in alive_job_ids:
+                    self._remove_job(job_id)
+
+    def _read_blocks(self, queue, registries, signatures):
+        """
+        Reads what changed in blocks of queue, in one transaction, then reads
+        whole in a second round trip the blocks whose change couldn't be read
+        as a delta
+
+        :return: dict of (queue, registry) to job ids and their scores, None
+                 for queue blocks
+        """
+        now = current_timestamp()
+        deltas = []
+        full_reads = []
+        with self.connection.pipeline() as pipeline:
+            for registry in registries:
+                block = (queue, registry)
+                if registry == "queued":
+                    delta = self._add_queue_delta_commands(
+                        pipeline, block, signatures[block]
+                    )
+                else:
+                    delta = self._add_registry_delta_commands(pipeline, block, now)
+                if delta is None:
+                    full_reads.append(registry)
+                else:
+                    deltas.append((registry, delta))
+            results = pipeline.execute() if deltas else []
+
+        blocks = {}
+        position = 0
+        for registry, (command_count, merge) in deltas:
+            merged = merge(results[position : position + command_count])
+            position += command_count
+            if merged is None:
+                full_reads.append(registry)
+            else:
+                blocks[(queue, registry)] = merged
+
+        if full_reads:
+            with self.connection.pipeline(transaction=False) as pipeline:
+                for registry in full_reads:
+                    add_job_ids_command(pipeline, queue, registry, withscores=True)
+                results = pipeline.execute()
+            for registry, entries in zip(full_reads, results):
+                if registry == "queued":
+                    job_ids = [sys.intern(as_text(job_id)) for job_id in entries]
+                    blocks[(queue, registry)] = (job_ids, None)
+                else:
+                    blocks[(queue, registry)] = (
+                        [sys.intern(as_text(job_id)) for job_id, _ in entries],
+                        array("d", [score for _, score in entries]),
+                    )
+        return blocks
+
+    def _add_queue_delta_commands(self, pipeline, block, signature):
+        """
+        Jobs are popped from head of queues and pushed at their tail, known
+        ids from the current head on are kept and as many ids as the queue
+        grew by are read from its tail, along with the last known id
+
+        :return: count of commands buffered and callable merging their
+                 results with known ids, None if queue needs a full read
+        """
+        job_ids = self._block_job_ids.get(block)
+        length, head, tail = signature
+        if job_ids is None:
+            return None
+        if not length:
+            return 0, lambda results: ([], None)
+        try:
+            kept = job_ids[job_ids.index(as_text(head)) :]
+        except ValueError:
+            return None
+        pushed_count = length - len(kept)
+        if pushed_count < 0:
+            return None
+        if pushed_count == 0:
+            if as_text(tail) != kept[-1]:
+                return None
+            return 0, lambda results: (kept, None)
+        pipeline.lrange(attach_rq_queue_prefix(block[0]), -pushed_count - 1, -1)
+
+        def merge(results):
+            read_ids = [as_text(job_id) for job_id in results[0]]
+            if len(read_ids) != pushed_count + 1 or read_ids[0] != kept[-1]:
+                return None
+            return kept + [sys.intern(job_id) for job_id in read_ids[1:]], None
+
+        return 1, merge
+
+    def _add_registry_delta_commands(self, pipeline, block, now):
+        """
+        Entries expired since last read are dropped from known ones, entries
+        scored from the last known score on are read along with the count of
+        live entries. Entries added below that score or removed before
+        expiring leave the count not adding up
+
+        :return: count of commands buffered and callable merging their
+                 results with known entries, None if registry needs a full read
+        """
+        job_ids = self._block_job_ids.get(block)
+        scores = self._block_scores.get(block)
+        if job_ids is None or scores is None:
+            return None
+        queue, registry = block
+        registry_key = REGISTRY_CLASSES[registry].key_template.format(queue)
+        expiring = registry in EXPIRING_REGISTRIES
+        if expiring:
+            expired_count = bisect_right(scores, now)
+            job_ids, scores = job_ids[expired_count:], scores[expired_count:]
+        if scores:
+            min_score = scores[-1]
+        else:
+            min_score = "({0}".format(now) if expiring else "-inf"
+        pipeline.zrangebyscore(registry_key, min_score, "+inf", withscores=True)
+        if expiring:
+            pipeline.zcount(registry_key, "({0}".format(now), "+inf")
+        else:
+            pipeline.zcard(registry_key)
+
+        def merge(results):
+            entries, count = results
+            # entries scored as the last known one are read again
+            last_ids = set(job_ids[bisect_left(scores, min_score) :]) if scores else ()
+            known_ids = None
+            added = []
+            for job_id, score in entries:
+                job_id = as_text(job_id)
+                if job_id in last_ids:
+                    continue
+                if known_ids is None:
+                    known_ids = set(job_ids)
+                if job_id in known_ids:
+                    # scored again, its known position is outdated
+                    return None
+                added.append((sys.intern(job_id), score))
+            if len(job_ids) + len(added) != count:
+                return None
+            return (
+                job_ids + [job_id for job_id, _ in added],
+                scores + array("d", [score for _, score in added]),
+            )
+
+        return 2, merge
+
+    def _add_jobs(self, job_ids):
+        with self.connection.pipeline(transaction=False) as pipeline:
+            for job_id in job_ids:
+                pipeline.hget(Job.key_for(job_id), "description")
+            results = pipeline.execute()
+
+        with self._lock:
+            for job_id, description in zip(job_ids, results):
+                tokens = tokenize(as_text(description))
+                self._job_tokens[job_id] = tuple(sys.intern(token) for token in tokens)
+                for token in self._job_tokens[job_id]:
+                    self._postings.setdefault(token, set()).add(job_id)
+            self._dirty = True
+
+    def _remove_job(self, job_id):
+        for token in self._job_tokens.pop(job_id):
+            postings = self._postings[token]
+            postings.discard(job_id)
+            if not postings:
+                del self._postings[token]
+        self._dirty = True
+
+    def _match_term(self, term):
+        """
+        :return: ids of jobs whose id starts with term, or which have tokens
+                 starting with every word of term
+        """
+        matches = set(iter_prefixed(self._sorted_job_ids, term))
+        token_matches = None
+        for word in TOKEN_PATTERN.findall(term.lower()):
+            word_matches = set()
+            for token in iter_prefixed(self._sorted_tokens, word):
+                word_matches |= self._postings[token]
+            if token_matches is None:
+                token_matches = word_matches
+            else:
+                token_matches &= word_matches
+        return matches | (token_matches or set())
+
+    def search(self, query, queues, registries):
+        """
+        :param query: whitespace separated terms which all need to match
+        :param queues: queue names to search in
+        :param registries: registry names (job status) to search in
+        :return: ids of matching jobs, ordered as jobs listing orders them
+        """
+        terms = query.split()
+        with self._lock:
+            if self._dirty:
+                self._sorted_job_ids = sorted(self._job_tokens)
+                self._sorted_tokens = sorted(self._postings)
+                self._dirty = False
+
+            matches = None
+            for term in terms:
+                term_matches = self._match_term(term)
+                matches = term_matches if matches is None else matches & term_matches
+                if not matches:
+                    return []
+            return [
+                job_id
+                for queue in queues
+                for registry in registries
+                for job_id in self._block_job_ids.get((queue, registry), ())
+                if matches is None or job_id in matches
+            ]
@@ -1,6 +1,10 @@
 var workers_table = null;
 var queues_table = null;
 var jobs_table = null;
+var queue_analytics_table = null;
+var dashboard_stream = null;
+var task_poll_timer = null;
+var all_instances_selected = false;
 
 var worker_status = {
     'idle': 'warning',
@@ -35,7 +39,19 @@ function modal_error(modal, response) {
     modal.find('.modal-footer').hide();
 }
 
+function is_stream_open() {
+    return dashboard_stream !== null && dashboard_stream.readyState === EventSource.OPEN;
+}
+
 function refresh_dashboard() {
+    if ($('#main_dashboard').has('#queue_analytics_table').length > 0 && queue_analytics_table != null) {
+        // not pushed on stream, cached server side and revalidated with ETag
+        queue_analytics_table.ajax.reload(null, false);
+    }
+    if (is_stream_open() && !is_all_instances_selected()) {
+        // tables are kept up to date by changes pushed on stream
+        return;
+    }
     if ($('#main_dashboard').has('#workers_table').length > 0 && workers_table != null) {
         workers_table.ajax.reload(null, false); // user paging is not reset on reload
     } else if ($('#main_dashboard').has($('#queues_table')).length > 0 && queues_table != null) {
@@ -45,6 +61,72 @@ function refresh_dashboard() {
     }
 }
 
+function apply_rows_delta(table, table_id, row_key, delta) {
+    // update rows in place instead of reloading whole table
+    if (table == null || delta === undefined || $('#main_dashboard').has(table_id).length == 0) {
+        return;
+    }
+    if (is_all_instances_selected()) {
+        // stream carries changes of selected instance only, table is polled instead
+        return;
+    }
+    if (delta.reset) {
+        table.clear();
+        table.rows.add(Object.values(delta.changed));
+    } else {
+        $.each(delta.changed, function (row_id, row_data) {
+            var row = table.row(function (idx, data) { return data[row_key] === row_id; });
+            if (row.any()) {
+                row.data(row_data);
+            } else {
+                table.row.add(row_data);
+            }
+        });
+        table.rows(function (idx, data) { return delta.removed.indexOf(data[row_key]) !== -1; }).remove();
+    }
+    table.draw(false);
+}
+
+function apply_registries_delta(delta) {
+    // jobs table is paged on server, reload it only if counts of selected jobs changed
+    if (jobs_table == null || delta === undefined || $('#main_dashboard').has('#jobs_table').length == 0) {
+        return;
+    }
+    var selected_queues = get_checked_queues();
+    var selected_status = get_checked_job_status();
+    var changed_queues = Object.keys(delta.changed).concat(delta.removed);
+    var selection_changed = changed_queues.some(function (queue) {
+        return selected_queues.indexOf(queue) !== -1;
+    }) && selected_status.length > 0;
+    if (delta.reset || selection_changed) {
+        jobs_table.ajax.reload(null, false);
+    }
+}
+
+function open_dashboard_stream(site_map) {
+    if (typeof EventSource === 'undefined') {
+        // fallback to polling through refresh_dashboard
+        return;
+    }
+    if (dashboard_stream !== null) {
+        dashboard_stream.close();
+    }
+    dashboard_stream = new EventSource(
+        site_map['rqmonitor.stream_api'] + '?' + $.param(inject_globals())
+    );
+    dashboard_stream.onmessage = function (event) {
+        var delta = JSON.parse(event.data);
+        if (delta.reset) {
+            $.each(['queues', 'workers', 'registries'], function (i, section) {
+                delta[section].reset = true;
+            });
+        }
+        apply_rows_delta(queues_table, '#queues_table', 'queue_name', delta.queues);
+        apply_rows_delta(workers_table, '#workers_table', 'worker_name', delta.workers);
+        apply_registries_delta(delta.registries);
+    };
+}
+
 function post_worker_suspend_resume(){
     current = $('#suspendresume').data('action')
     if(current == 'suspendall'){
@@ -56,21 +138,82 @@ function post_worker_suspend_resume(){
     }
 }
 
+function modal_task_progress(modal, task) {
+    var percent = task.total > 0 ? Math.min(100, Math.floor(task.processed * 100 / task.total)) : 0;
+    var details = task.processed + ' of ' + task.total + ' jobs';
+    if (task.rate !== null) {
+        details += ', ' + Math.round(task.rate) + ' jobs/s';
+    }
+    if (task.eta !== null) {
+        details += ', about ' + Math.ceil(task.eta) + 's left';
+    }
+    modal.find('.modal-title').text(task.name);
+    modal.find('.modal-body').html(
+        `<div class="progress mb-2">
+            <div class="progress-bar" role="progressbar" style="width: ` + percent + `%"></div>
+        </div>
+        <span class="task-progress-details"></span>
+        <a href="#" class="btn btn-sm btn-danger float-right task-cancel" data-task="` + task.task_id + `">Cancel Task</a>`
+    );
+    modal.find('.task-progress-details').text(details + ' (' + task.status + ')');
+    modal.find('.modal-footer').hide();
+}
+
+function poll_task(task, table, modal, on_done) {
+    // bulk actions outliving their request run in background, poll until done
+    if (task.status === 'queued' || task.status === 'running') {
+        modal_task_progress(modal, task);
+        task_poll_timer = setTimeout(function () {
+            $.get({
+                url: site_map['rqmonitor.list_tasks_api'] + '/' + encodeURIComponent(task.task_id),
+                dataType: "json",
+                cache: false
+            }).then(function (task) {
+                poll_task(task, table, modal, on_done);
+            }, function (jqXHR) {
+                modal_error(modal, jqXHR);
+            });
+        }, 1000);
+        return;
+    }
+    task_poll_timer = null;
+    if (task.status === 'finished') {
+        on_done(task);
+        return;
+    }
+    if (task.status === 'failed') {
+        modal.find('.modal-title').html('<a href="#" class="btn btn-rounded btn-danger">Error</a>');
+    } else {
+        modal.find('.modal-title').html('<a href="#" class="btn btn-rounded btn-warning">Cancelled</a>');
+    }
+    modal.find('.modal-body').text(task.message);
+    modal.find('.modal-footer').hide();
+    table.ajax.reload(null, false);
+}
+
 function ajax_action(request_type, action_url, _data, table, modal, post_success = undefined) {
+    function on_success(response) {
+        modal_success(modal, response)
+        // force refresh to update
+        table.ajax.reload(null, false);
+        setTimeout(function () {
+            $('#confirmation').modal('hide');
+        }, 2000);
+        if (post_success !== undefined){
+            post_success();
+        }
+    }
+
     $.ajax({
         type: request_type,
         url: action_url,
         data: inject_globals(_data),
         dataType: "json",
         success: function (response) {
-            modal_success(modal, response)
-            // force refresh to update
-            table.ajax.reload(null, false);
-            setTimeout(function () {
-                $('#confirmation').modal('hide');
-            }, 2000);
-            if (post_success !== undefined){
-                post_success();
+            if (response.task_id !== undefined && response.status !== 'finished') {
+                poll_task(response, table, modal, on_success);
+            } else {
+                on_success(response);
             }
         },
         error: function (jqXHR, textStatus, errorThrown) {
@@ -82,6 +225,11 @@ function ajax_action(request_type, action_url, _data, table, modal, post_success
 function modal_restore() {
     // restore modal state on closing
     $("#confirmation").on("hidden.bs.modal", function () {
+        // task keeps running on server, only stop showing its progress
+        if (task_poll_timer !== null) {
+            clearTimeout(task_poll_timer);
+            task_poll_timer = null;
+        }
         $(this).find('modal-title').trigger('reset');
         $(this).find('name').trigger('reset');
         $(this).find('.modal-footer').show();
@@ -95,6 +243,8 @@ function action_modal_onshow() {
         var target_id = button.data('id')               // Extract job id/ queue id/ worker id   
         var action = button.data('action')              // extract action like delete, cancel, requeueall 
         var modal = $(this)
+        var instance = button.data('instance')          // instance of row, if listing all instances
+        modal.data('instance', instance !== undefined ? instance : '')
         if (target_class === 'queue') {
             if (action === 'empty') {
                 update_modal_info(modal, 'Confirm to empty ' + target_id, target_class, target_id, action, 'All valid jobs currently on queue will be removed from queue as well as from redis job namespace!')
@@ -160,6 +310,111 @@ function get_currently_selected_redis_index() {
     return $('#redis_instances').prop('selectedIndex');
 }
 
+function is_all_instances_selected() {
+    return all_instances_selected && $('#main_dashboard').find('.all_instances').length > 0;
+}
+
+function all_instances_data() {
+    // rows of every redis instance at once, each tagged with its instance
+    return is_all_instances_selected() ? { 'all_instances': 'true' } : {};
+}
+
+function instance_data(instance) {
+    // actions on a row target the instance the row comes from
+    return instance !== undefined && instance !== '' ? { 'redis_instance_index': instance } : {};
+}
+
+function show_instance_errors(errors) {
+    var alert = $('#main_dashboard').find('.instance_errors');
+    if (errors === undefined || errors.length == 0) {
+        alert.hide();
+        return;
+    }
+    alert.text($.map(errors, function (error) {
+        return error.redis_instance + ': ' + error.message;
+    }).join('\n')).css('white-space', 'pre-wrap').show();
+}
+
+function setup_all_instances_toggle(table) {
+    var toggle = $('#main_dashboard').find('.all_instances');
+    toggle.prop('checked', all_instances_selected);
+    table.column('redis_instance:name').visible(is_all_instances_selected());
+    toggle.on('change', function () {
+        all_instances_selected = $(this).prop('checked');
+        table.column('redis_instance:name').visible(all_instances_selected);
+        table.ajax.reload(null, false);
+    });
+}
+
+var instance_column = {
+    data: "redis_instance",
+    name: "redis_instance",
+    defaultContent: "",
+    visible: false,
+};
+
+// last payload and its ETag per url and redis instance (or all of them), to be
+// reused when server says 304 Not Modified
+var etag_cache = {};
+
+function etag_cache_key(url, data) {
+    return JSON.stringify([url, data['redis_instance_index'], data['all_instances'] === 'true']);
+}
+
+function conditional_get(url, data) {
+    var key = etag_cache_key(url, data);
+    var cached = etag_cache[key];
+    return $.ajax({
+        url: url,
+        type: "GET",
+        data: data,
+        dataType: "json",
+        headers: cached !== undefined ? { 'If-None-Match': cached.etag } : {},
+    }).then(function (json, textStatus, jqXHR) {
+        if (jqXHR.status === 304) {
+            return cached.json;
+        }
+        var etag = jqXHR.getResponseHeader('ETag');
+        if (etag !== null) {
+            etag_cache[key] = { 'etag': etag, 'json': json };
+        }
+        return json;
+    });
+}
+
+function show_datatable_error(nunjucks_urls, jqXHR, textStatus, errorThrown) {
+    $.get({
+        url: nunjucks_urls['error'],
+        cache: false
+    }).then(function(error_template){
+        rendered_template = nunjucks.renderString(
+                error_template, 
+                { 
+                    'error_info': JSON.parse(jqXHR.responseText),
+                    'textStatus': textStatus,
+                    'errorThrown': errorThrown,
+                }
+            );
+        $('#main_content').html(rendered_template);
+    })
+}
+
+function conditional_datatable_ajax(nunjucks_urls, url, extra_data) {
+    // DataTables ajax function revalidating with ETag instead of downloading unchanged data
+    return function (data, callback, settings) {
+        conditional_get(url, $.extend({}, data, inject_globals(), extra_data())).then(
+            function (json) {
+                show_instance_errors(json.errors);
+                // server side tables drop responses whose draw doesn't match the request
+                callback($.extend({}, json, { 'draw': data.draw }));
+            },
+            function (jqXHR, textStatus, errorThrown) {
+                show_datatable_error(nunjucks_urls, jqXHR, textStatus, errorThrown);
+            }
+        );
+    }
+}
+
 
 function setup_queues_datatable(nunjucks_urls, site_map) {
 
@@ -169,34 +424,11 @@ function setup_queues_datatable(nunjucks_urls, site_map) {
             "loadingRecords": "&nbsp;",
             "processing": "Loading...",
         },
-        "ajax": {
-            "url": site_map['rqmonitor.list_queues_api'],
-            "type": "GET",
-            "data": function (d) {
-                return $.extend(
-                    {}, d, inject_globals(),
-                )
-            },
-            "dataSrc": "data",
-            "dataType": "json",
-            "error": function (jqXHR, textStatus, errorThrown) {
-                $.get({
-                    url: nunjucks_urls['error'],
-                    cache: false
-                }).then(function(error_template){
-                    rendered_template = nunjucks.renderString(
-                            error_template, 
-                            { 
-                                'error_info': JSON.parse(jqXHR.responseText),
-                                'textStatus': textStatus,
-                                'errorThrown': errorThrown,
-                            }
-                        );
-                    $('#main_content').html(rendered_template);
-                })
-            }
-        },
+        "ajax": conditional_datatable_ajax(
+            nunjucks_urls, site_map['rqmonitor.list_queues_api'], all_instances_data
+        ),
         "columns": [
+            instance_column,
             {
                 data: "queue_name",
                 render: function (data, type, row, meta) {
@@ -215,9 +447,9 @@ function setup_queues_datatable(nunjucks_urls, site_map) {
                     if (type == 'display') {
                         data =
                             `
-                        <a href="#" class="btn btn-warning btn-block" data-action="empty"
+                        <a href="#" class="btn btn-warning btn-block" data-action="empty" data-instance="` + (row.redis_instance_index !== undefined ? row.redis_instance_index : '') + `"
                         data-toggle="modal" data-target="#confirmation" data-targetclass="queue" data-id="`+ row.queue_name + `">Empty</a>
-                        <a href="#" class="btn btn-danger btn-block" data-action="delete"
+                        <a href="#" class="btn btn-danger btn-block" data-action="delete" data-instance="` + (row.redis_instance_index !== undefined ? row.redis_instance_index : '') + `"
                         data-toggle="modal" data-target="#confirmation" data-targetclass="queue" data-id="`+ row.queue_name + `">Delete</a>
                         `
                     }
@@ -234,8 +466,62 @@ function setup_queues_datatable(nunjucks_urls, site_map) {
 
         ]
     });
+    setup_all_instances_toggle(queues_table);
+}
+
+function format_latency(distribution, percentile) {
+    if (distribution === null) {
+        return '-';
+    }
+    var seconds = distribution[percentile];
+    return seconds < 1 ? (seconds * 1000).toFixed(0) + 'ms' : seconds.toFixed(2) + 's';
+}
 
+function setup_queue_analytics_datatable(nunjucks_urls, site_map) {
 
+    function latency_column(field, percentile) {
+        return {
+            data: field,
+            render: function (data, type, row, meta) {
+                if (type === 'display') {
+                    return format_latency(data, percentile);
+                }
+                return data === null ? -1 : data[percentile];
+            }
+        };
+    }
+
+    queue_analytics_table = $('#queue_analytics_table').DataTable({
+        "processing": "True",
+        "order": [],
+        "language": {
+            "loadingRecords": "&nbsp;",
+            "processing": "Loading...",
+            "emptyTable": "Select queues in the sidebar",
+        },
+        "ajax": conditional_datatable_ajax(
+            nunjucks_urls, site_map['rqmonitor.queue_analytics_api'], function () {
+                return { 'queues[]': get_checked_queues() };
+            }
+        ),
+        "columns": [
+            { data: "queue_name" },
+            {
+                data: "func_name",
+                render: function (data, type, row, meta) {
+                    return data === null ? '<strong>All functions</strong>' : data;
+                }
+            },
+            { data: "jobs" },
+            { data: "failed" },
+            latency_column("wait_time", "p50"),
+            latency_column("wait_time", "p95"),
+            latency_column("wait_time", "p99"),
+            latency_column("run_time", "p50"),
+            latency_column("run_time", "p95"),
+            latency_column("run_time", "p99"),
+        ]
+    });
 }
 
 function reload_sidebar_queues(site_map) {
@@ -245,6 +531,13 @@ function reload_sidebar_queues(site_map) {
         data: inject_globals(),
         success: function (response) {
             $('#sidebar_queues').html(response);
+            // tables filtered on checked queues follow the new queue list
+            if (queue_analytics_table != null) {
+                queue_analytics_table.ajax.reload(null, false);
+            }
+            if (jobs_table != null) {
+                jobs_table.ajax.reload(null, false);
+            }
         },
         error: function (rs, e) {
             $('#sidebar_queues').html(`<strong>` + JSON.stringify(rs) + `</strong>`);
@@ -252,14 +545,19 @@ function reload_sidebar_queues(site_map) {
     });
 }
 
-function refresh_redis_memory(url) {
-    $('#redis_memory_value').html('');
+function refresh_redis_memory(url, rescan = false) {
+    // memory is estimated in background on server, this only reads the last estimate
+    // unless rescan is asked for
+    var _data = rescan ? { 'refresh': 'true' } : {}
     $.get({
         url: url,
-        data: inject_globals(),
+        data: inject_globals(_data),
         cache: false
     }).then(function (data) {
         $('#redis_memory_value').text(data.redis_memory_used)
+        if (data.redis_memory_updated_at !== null) {
+            $('#redis_memory_value').attr('title', 'Estimated at ' + new Date(data.redis_memory_updated_at * 1000).toLocaleString())
+        }
     });
 }
 
@@ -267,15 +565,18 @@ function inject_globals(data) {
     if (data === undefined) {
         data = {}
     }
-    return Object.assign(data,
+    // instance of an action on a row of all instances wins over selected one
+    return Object.assign(
         {
             'redis_instance_index': get_currently_selected_redis_index(),
-        }
+        },
+        data
     );
 }
 
 function on_redis_instance_change(site_map) {
     $('#redis_instances').on('change', function () {
+        open_dashboard_stream(site_map);
         refresh_dashboard();
         refresh_redis_memory(site_map['rqmonitor.redis_memory_api']);
         reload_sidebar_queues(site_map);
@@ -284,7 +585,7 @@ function on_redis_instance_change(site_map) {
 
 function on_redis_memory_refresh(site_map){
     $('#redis_memory_refresh').on('click', function () {
-        refresh_redis_memory(site_map['rqmonitor.redis_memory_api']);
+        refresh_redis_memory(site_map['rqmonitor.redis_memory_api'], true);
     });
 }
 
@@ -295,40 +596,18 @@ function setup_worker_datatable(nunjucks_urls, site_map) {
             "loadingRecords": "&nbsp;",
             "processing": "Loading...",
         },
-        "ajax": {
-            "url": site_map['rqmonitor.list_workers_api'],
-            "type": "GET",
-            "data": function (d) {
-                return $.extend(
-                    {}, d, inject_globals(),
-                )
-            },
-            "dataSrc": "data",
-            "dataType": "json",
-            "error": function (jqXHR, textStatus, errorThrown) {
-                $.get({
-                    url: nunjucks_urls['error'],
-                    cache: false
-                }).then(function(error_template){
-                    rendered_template = nunjucks.renderString(
-                            error_template, 
-                            { 
-                                'error_info': JSON.parse(jqXHR.responseText),
-                                'textStatus': textStatus,
-                                'errorThrown': errorThrown,
-                            }
-                        );
-                    $('#main_content').html(rendered_template);
-                })
-            }
-        },
+        "ajax": conditional_datatable_ajax(
+            nunjucks_urls, site_map['rqmonitor.list_workers_api'], all_instances_data
+        ),
         "columns": [
+            instance_column,
             {
                 data: "worker_name",
                 render: function (data, type, row, meta) {
                     if (type === 'display') {
                         data = `
                                 <a href="#" data-toggle="modal" data-target="#infomodal"
+                                data-instance="` + (row.redis_instance_index !== undefined ? row.redis_instance_index : '') + `"
                                 data-worker="`+ data + `">` + data + `</a>
                                 `;
                     }
@@ -356,6 +635,7 @@ function setup_worker_datatable(nunjucks_urls, site_map) {
                     if (type === 'display') {
                         data = `
                             <a href="#" class="btn btn-danger" data-toggle="modal" data-action="delete"
+                            data-instance="` + (row.redis_instance_index !== undefined ? row.redis_instance_index : '') + `"
                             data-target="#confirmation" data-targetclass="worker" data-id="`+ row.worker_name + `"> Delete </a>
                             `;
                     }
@@ -378,7 +658,7 @@ function setup_worker_datatable(nunjucks_urls, site_map) {
     
             $.ajax({
                 url: site_map['rqmonitor.worker_info_api'],
-                data: { 'worker_id': worker_id},
+                data: inject_globals($.extend({ 'worker_id': worker_id }, instance_data(button.data('instance')))),
                 success: function (data) {
                     modal.find('.modal-title').text('Showing Info for ' + worker_id)
                     modal.attr('name', worker_id)
@@ -402,6 +682,7 @@ function setup_worker_datatable(nunjucks_urls, site_map) {
     }
 
     show_worker_modal(site_map);
+    setup_all_instances_toggle(workers_table);
 
     /*
     $('#workers_table tbody').on('click', '.worker_info_modal', function () {
@@ -411,6 +692,9 @@ function setup_worker_datatable(nunjucks_urls, site_map) {
     */
 }
 
+// job id to traceback of job cards whose traceback is expanded
+var expanded_exc_infos = {};
+
 function setup_jobs_datatable(nunjucks_urls, site_map) {
     var job_result_ttl = "specifies how long (in seconds) successful jobs and their results are kept. Expired jobs will be automatically deleted. Defaults to 500 seconds.";
     var job_timeout = "specifies the maximum runtime of the job before it’s interrupted and marked as failed. Its default unit is seconds and it can be an integer or a string representing an integer(e.g. 2, '2'). Furthermore, it can be a string with specify unit including hour, minute, second (e.g. '1h', '3m', '5s').";
@@ -435,46 +719,27 @@ function setup_jobs_datatable(nunjucks_urls, site_map) {
                 "loadingRecords": "&nbsp;",
                 "processing": "Loading...",
             },
-            "ajax": {
-                "url": site_map['rqmonitor.list_jobs_api'],
-                "type": "GET",
-                // in case of reload if data is initialised as static object then will not
-                //be evaluated only once. If you want to read new data on each reload, you'd need to use it as a
-                //function. check @ comment at https://datatables.net/reference/api/ajax.reload()
-                "data": function (d) {
-                    return $.extend(
-                        {}, d, inject_globals(), {
+            // in case of reload if data is initialised as static object then will not
+            //be evaluated only once. If you want to read new data on each reload, you'd need to use it as a
+            //function. check @ comment at https://datatables.net/reference/api/ajax.reload()
+            "ajax": conditional_datatable_ajax(
+                nunjucks_urls, site_map['rqmonitor.list_jobs_api'], function () {
+                    return {
                         'queues': get_checked_queues(),
                         'jobstatus': get_checked_job_status(),
-                    },
-                    )
-                },
-                "dataSrc": "data",
-                "dataType": "json",
-                "error": function (jqXHR, textStatus, errorThrown) {
-                    $.get({
-                        url: nunjucks_urls['error'],
-                        cache: false
-                    }).then(function(error_template){
-                        rendered_template = nunjucks.renderString(
-                                error_template, 
-                                { 
-                                    'error_info': JSON.parse(jqXHR.responseText),
-                                    'textStatus': textStatus,
-                                    'errorThrown': errorThrown,
-                                }
-                            );
-                        $('#main_content').html(rendered_template);
-                    })
+                    };
                 }
-            },
+            ),
             "columns": [
                 {
                     data: "job_info",
                     render: function (data, type, row, meta) {
                         if (type === 'display') {
                             //data = nunjucks.render("{{ url_for('static', filename='nunjucks/job_info.html') }}", data)
-                            data = nunjucks.renderString(job_info_template, { 'job_data': data });
+                            data = nunjucks.renderString(
+                                job_info_template,
+                                { 'job_data': data, 'exc_info': expanded_exc_infos[data.job_id] }
+                            );
                         }
                         return data;
                     },
@@ -515,24 +780,70 @@ function setup_jobs_datatable(nunjucks_urls, site_map) {
             ]
         });
 
+        // tracebacks are fetched only when expanded and stay expanded across refreshes
+        $('#jobs_table').off('click', '.job-exc-info-toggle').on('click', '.job-exc-info-toggle', function (e) {
+            e.preventDefault();
+            var job_id = $(this).attr('data-id');
+            var exc_info = $(this).closest('.alert').find('.job-exc-info');
+            if (expanded_exc_infos[job_id] !== undefined) {
+                delete expanded_exc_infos[job_id];
+                exc_info.hide();
+                return;
+            }
+            exc_info.text('Loading...').show();
+            $.get({
+                url: site_map['rqmonitor.list_jobs_api'] + '/' + encodeURIComponent(job_id) + '/exc_info',
+                data: inject_globals(),
+                dataType: 'json',
+                cache: false,
+            }).then(function (json) {
+                expanded_exc_infos[job_id] = json['exc_info'];
+                exc_info.text(json['exc_info']);
+            }, function () {
+                exc_info.text('Could not load traceback');
+            });
+        });
     });
 
 }     
 
+function on_task_cancel(site_map) {
+    $('#confirmation').on('click', '.task-cancel', function (event) {
+        event.preventDefault();
+        $(this).addClass('disabled').text('Cancelling...');
+        $.post({
+            url: site_map['rqmonitor.list_tasks_api'] + '/' + encodeURIComponent($(this).data('task')) + '/cancel',
+            dataType: "json"
+        });
+    });
+}
+
+function on_jobs_export(site_map) {
+    // export link is pointed at checked filters right before download starts
+    $('#main_dashboard').on('click', '.jobs-export', function () {
+        $(this).attr('href', site_map['rqmonitor.export_jobs_api'] + '?' + $.param(inject_globals({
+            'queues': get_checked_queues(),
+            'jobstatus': get_checked_job_status(),
+            'format': $(this).data('format'),
+        })));
+    });
+}
+
 function action_modal_onconfirm(site_map) {
     $('#confirmation').on('click', '.confirm', function (event) {
         var target_class = $(this).closest('.modal').attr('targetclass');
         var target_id = $(this).closest('.modal').attr('name');
         var task = $(this).closest('.modal').attr('task');
         var modal = $(this).closest('.modal');
+        var instance = instance_data(modal.data('instance'));
 
         modal.find('.modal-body').html('<span class="dashboard-spinner spinner-sm"></span>')
 
         if (target_class === 'queue') {
             if (task === 'empty') {
-                ajax_action("POST", site_map['rqmonitor.empty_queue_api'], { 'queue_id': target_id}, queues_table, modal);           
+                ajax_action("POST", site_map['rqmonitor.empty_queue_api'], $.extend({ 'queue_id': target_id }, instance), queues_table, modal);
             } else if (task === 'delete') {
-                ajax_action("POST", site_map['rqmonitor.delete_queue_api'], { 'queue_id': target_id}, queues_table, modal);
+                ajax_action("POST", site_map['rqmonitor.delete_queue_api'], $.extend({ 'queue_id': target_id }, instance), queues_table, modal);
                 reload_sidebar_queues(site_map);
             } else if (task === 'deleteall') {
                 ajax_action("POST", site_map['rqmonitor.delete_all_queues_api'],{}, queues_table, modal);
@@ -567,9 +878,9 @@ function action_modal_onconfirm(site_map) {
             }
         } else if (target_class === 'worker') {
             if (task === "delete") {
-                ajax_action("POST", site_map['rqmonitor.delete_workers_api'], {
+                ajax_action("POST", site_map['rqmonitor.delete_workers_api'], $.extend({
                     'worker_id': target_id,
-                }, workers_table, modal);
+                }, instance), workers_table, modal);
             } else if (task === "deleteall") {
                 ajax_action("POST", site_map['rqmonitor.delete_workers_api'], {
                     'delete_all': "true",
@@ -591,6 +902,9 @@ function on_job_status_selection_change(){
         if (jobs_table != null) {
             jobs_table.ajax.reload(null, false);
         }
+        if ($('#main_dashboard').has('#queue_analytics_table').length > 0 && queue_analytics_table != null) {
+            queue_analytics_table.ajax.reload(null, false);
+        }
     });
 }
 
@@ -647,6 +961,7 @@ function on_click_queues_dashboard(nunjucks_urls, site_map){
             success: function (response) {
                 $('#main_dashboard').html(response);
                 setup_queues_datatable(nunjucks_urls, site_map);
+                setup_queue_analytics_datatable(nunjucks_urls, site_map);
             },
             error: function (rs, e) {
                 $('#main_dashboard').html(`<strong>` + JSON.stringify(rs) + `</strong>`);
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from queue import Queue, Full
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+# sections of dashboard state, each a dict of row id to row
+STATE_SECTIONS = ("queues", "workers", "registries")
+
+
+def diff_state(old_state, new_state):
+    """
+    :return: delta per section with changed (or new) rows and removed row ids,
+             None if nothing changed
+    """
+    delta = {}
+    for section in STATE_SECTIONS:
+        old_rows = old_state.get(section, {})
+        new_rows = new_state.get(section, {})
+        changed = {
+            row_id: row
+            for row_id, row in new_rows.items()
+            if old_rows.get(row_id) != row
+        }
+        removed = [row_id for row_id in old_rows if row_id not in new_rows]
+        if changed or removed:
+            delta[section] = {"changed": changed, "removed": removed}
+    return delta or None
+
+
+class DashboardSampler(object):
+    """
+    Samples dashboard state of one redis instance in a background thread and
+    pushes only the changes to every subscriber, so redis reads and payload
+    size do not grow with the number of open dashboards. Sampling runs only
+    while someone is subscribed.
+    """
+
+    def __init__(self, collect, interval, max_pending=100):
+        """
+        :param collect: callable returning dict of STATE_SECTIONS to rows
+        :param interval: seconds between two samples
+        :param max_pending: deltas buffered per subscriber before it is resynced
+        """
+        self.collect = collect
+        self.interval = interval
+        self.max_pending = max_pending
+        self.state = None
+        self._subscribers = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, notify=None):
+        """
+        :param notify: callable run from the sampler thread after a delta was
+                       queued, lets subscribers wait without holding a thread
+        :return: queue on which deltas are received, first one being the full state
+        """
+        subscription = Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers[subscription] = notify
+            if self.state is not None:
+                subscription.put(self._full_state_delta())
+                if notify is not None:
+                    notify()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="rqmonitor-dashboard-sampler", daemon=True
+                )
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+
+    def _full_state_delta(self):
+        delta = {
+            section: {"changed": self.state.get(section, {}), "removed": []}
+            for section in STATE_SECTIONS
+        }
+        delta["reset"] = True
+        return delta
+
+    def _publish(self, delta):
+        for subscription, notify in self._subscribers.items():
+            try:
+                subscription.put_nowait(delta)
+            except Full:
+                # subscriber fell behind, drop its backlog and send everything again
+                while not subscription.empty():
+                    subscription.get_nowait()
+                subscription.put_nowait(self._full_state_delta())
+            if notify is not None:
+                notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self.state = None
+                    return
+            try:
+                new_state = self.collect()
+            except Exception:
+                logger.exception("Failed to sample dashboard state")
+            else:
+                with self._lock:
+                    if self.state is None:
+                        self.state = new_state
+                        self._publish(self._full_state_delta())
+                    else:
+                        delta = diff_state(self.state, new_state)
+                        self.state = new_state
+                        if delta is not None:
+                            self._publish(delta)
+            time.sleep(self.interval)
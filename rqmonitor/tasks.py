@@ -0,0 +1,194 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+TASK_QUEUED = "queued"
+TASK_RUNNING = "running"
+TASK_FINISHED = "finished"
+TASK_FAILED = "failed"
+TASK_CANCELLED = "cancelled"
+
+TASK_DONE_STATUSES = (TASK_FINISHED, TASK_FAILED, TASK_CANCELLED)
+
+
+class BulkTask(object):
+    """
+    One bulk action running in background, tracks how many of the jobs it
+    acts on have been handled so far and can be cancelled at any time
+    """
+
+    def __init__(self, name, func, total):
+        """
+        :param name: human readable description of the action
+        :param func: callable of progress callback and stop event, handling
+                     jobs chunk by chunk and returning a result message
+        :param total: count of jobs expected to be handled
+        """
+        self.task_id = uuid.uuid4().hex
+        self.name = name
+        self.func = func
+        self.total = total
+        self.processed = 0
+        self.status = TASK_QUEUED
+        self.message = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stop_event = threading.Event()
+        self._done = threading.Event()
+
+    def progress(self, count):
+        self.processed += count
+
+    def cancel(self):
+        """Stops task after the chunk being handled, or before it starts"""
+        self.stop_event.set()
+
+    def wait(self, timeout):
+        """
+        :return: whether task is done
+        """
+        return self._done.wait(timeout)
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def run(self):
+        if self.stop_event.is_set():
+            self.status = TASK_CANCELLED
+            self.message = "Cancelled before starting"
+        else:
+            self.status = TASK_RUNNING
+            self.started_at = time.time()
+            try:
+                self.message = self.func(self.progress, self.stop_event)
+            except Exception as e:
+                logger.exception("Bulk task {0} failed".format(self.name))
+                self.status = TASK_FAILED
+                self.message = getattr(e, "message", None) or str(e)
+            else:
+                if self.stop_event.is_set():
+                    self.status = TASK_CANCELLED
+                else:
+                    self.status = TASK_FINISHED
+        self.finished_at = time.time()
+        self._done.set()
+
+    def to_dict(self):
+        rate = None
+        eta = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0:
+                rate = self.processed / elapsed
+            if self.status == TASK_RUNNING and rate:
+                eta = max(0, self.total - self.processed) / rate
+        return {
+            "task_id": self.task_id,
+            "name": self.name,
+            "status": self.status,
+            "message": self.message,
+            "processed": self.processed,
+            "total": self.total,
+            "rate": rate,
+            "eta": eta,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class BulkTaskExecutor(object):
+    """
+    Runs bulk actions on a bounded pool of background threads, so that they
+    outlive the HTTP request which submitted them. Tasks are kept for
+    retention seconds after they are done, for their result to be polled.
+    At most max_pending tasks wait for their turn, further ones are refused
+    """
+
+    def __init__(self, max_workers, retention, max_pending=20):
+        """
+        :param max_workers: count of tasks run at the same time
+        :param retention: seconds a done task can still be looked up
+        :param max_pending: count of tasks waiting for a thread at the same time
+        """
+        self.max_workers = max_workers
+        self.retention = retention
+        self.max_pending = max_pending
+        self._tasks = {}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts worker threads if not already running"""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._run, name="rqmonitor-bulk-task", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        for task in self.list_tasks():
+            task.cancel()
+        with self._lock:
+            for thread in self._threads:
+                self._queue.put(None)
+            self._threads = []
+
+    def submit(self, name, func, total):
+        """
+        :return: BulkTask queued for func, see BulkTask, None if max_pending
+                 tasks are already waiting for their turn
+        """
+        task = BulkTask(name, func, total)
+        self.start()
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            return None
+        with self._lock:
+            self._prune()
+            self._tasks[task.task_id] = task
+        return task
+
+    def get_task(self, task_id):
+        """
+        :return: task of task_id, None if unknown or pruned
+        """
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def list_tasks(self):
+        """
+        :return: known tasks, most recently submitted first
+        """
+        with self._lock:
+            self._prune()
+            return sorted(
+                self._tasks.values(), key=lambda task: task.submitted_at, reverse=True
+            )
+
+    def _prune(self):
+        expired_before = time.time() - self.retention
+        for task_id, task in list(self._tasks.items()):
+            if task.is_done() and task.finished_at < expired_before:
+                del self._tasks[task_id]
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            task.run()
@@ -0,0 +1,220 @@
+import logging
+import math
+import threading
+import time
+from array import array
+
+from rqmonitor.utils import job_counts_in_queues_registries
+
+
+logger = logging.getLogger(__name__)
+stream_handler = logging.StreamHandler()
+logger.addHandler(stream_handler)
+logger.setLevel(logging.INFO)
+
+# job counts recorded for every queue, in order of values of a sample
+TIMESERIES_STATUSES = (
+    "queued",
+    "started",
+    "failed",
+    "finished",
+    "scheduled",
+    "deferred",
+)
+
+# stored in place of counts of queues which didn't exist at sample time
+MISSING = 0xFFFFFFFF
+
+
+class TimeSeriesTier(object):
+    """
+    Fixed size ring of samples shared by all queues, taken every few ticks of
+    the sampler. Counts of a queue are packed in one flat unsigned int array,
+    sample after sample, so memory is bounded by capacity whatever happens
+    """
+
+    def __init__(self, every, capacity):
+        """
+        :param every: sampler ticks between two samples of this tier
+        :param capacity: samples kept, older ones are overwritten
+        """
+        self.every = every
+        self.capacity = capacity
+        self.timestamps = array("d", [0.0]) * capacity
+        self.series = {}
+        self.head = 0
+        self.size = 0
+
+    def append(self, timestamp, counts):
+        """
+        :param counts: dict of queue name to tuple of TIMESERIES_STATUSES counts
+        """
+        width = len(TIMESERIES_STATUSES)
+        for queue in counts:
+            if queue not in self.series:
+                self.series[queue] = array("I", [MISSING]) * (self.capacity * width)
+        offset = self.head * width
+        missing = (MISSING,) * width
+        for queue, values in self.series.items():
+            values[offset : offset + width] = array("I", counts.get(queue, missing))
+        self.timestamps[self.head] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def slots_since(self, since):
+        """
+        :return: slots of samples taken at or after since, oldest first
+        """
+        first = (self.head - self.size) % self.capacity
+        slots = ((first + i) % self.capacity for i in range(self.size))
+        return [slot for slot in slots if self.timestamps[slot] >= since]
+
+    def nbytes(self):
+        return sum(
+            values.itemsize * len(values) for values in self.series.values()
+        ) + self.timestamps.itemsize * len(self.timestamps)
+
+
+def downsample(values, group_size):
+    """
+    :param values: counts, None where missing
+    :return: average of every group_size consecutive values, missing ones left
+             out, None for groups with nothing but missing values
+    """
+    averages = []
+    for i in range(0, len(values), group_size):
+        group = [value for value in values[i : i + group_size] if value is not None]
+        averages.append(round(sum(group) / len(group), 2) if group else None)
+    return averages
+
+
+class TimeSeriesSampler(object):
+    """
+    Records job counts of every queue of one redis instance in a background
+    thread, one pipelined round trip per sample, into tiers of fixed size
+    ring buffers: first tier keeps every sample for a short span and next
+    ones keep every Nth sample for longer spans, like an RRD
+    """
+
+    def __init__(self, connection, queue_directory, interval, tiers):
+        """
+        :param connection: redis connection of instance to sample
+        :param queue_directory: directory.QueueDirectory shared by views
+        :param interval: seconds between two samples
+        :param tiers: (every, capacity) of each tier, finest first, see
+                      TimeSeriesTier
+        """
+        self.connection = connection
+        self.queue_directory = queue_directory
+        self.interval = interval
+        self.tiers = [TimeSeriesTier(every, capacity) for every, capacity in tiers]
+        self._ticks = 0
+        self._last_seen = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Starts background sampling if not already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="rqmonitor-timeseries-sampler", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Failed to sample job counts")
+            self._stopped.wait(self.interval)
+
+    def sample(self, timestamp=None):
+        """
+        Records current job counts of all queues
+        """
+        queue_names = self.queue_directory.queue_names(self.connection)
+        job_counts = job_counts_in_queues_registries(
+            queue_names, TIMESERIES_STATUSES, connection=self.connection
+        )
+        counts = {
+            queue: tuple(job_counts[queue][status] for status in TIMESERIES_STATUSES)
+            for queue in queue_names
+        }
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            for tier in self.tiers:
+                if self._ticks % tier.every == 0:
+                    tier.append(timestamp, counts)
+            for queue in counts:
+                self._last_seen[queue] = self._ticks
+            # queues gone for longer than the longest tier span have no data left
+            retention = max(tier.every * tier.capacity for tier in self.tiers)
+            for queue, last_seen in list(self._last_seen.items()):
+                if self._ticks - last_seen >= retention:
+                    del self._last_seen[queue]
+                    for tier in self.tiers:
+                        tier.series.pop(queue, None)
+            self._ticks += 1
+
+    def query(self, queues=None, statuses=TIMESERIES_STATUSES, since=3600, points=120):
+        """
+        :param queues: queue names, all recorded queues if None
+        :param statuses: some of TIMESERIES_STATUSES
+        :param since: seconds of history to return
+        :param points: largest count of points returned per series, samples
+                       are averaged in groups down to it
+        :return: dict of step (seconds between two points), timestamps and
+                 series of queue name to status to counts
+        """
+        columns = [TIMESERIES_STATUSES.index(status) for status in statuses]
+        width = len(TIMESERIES_STATUSES)
+        with self._lock:
+            # finest tier covering the requested span
+            tier = self.tiers[-1]
+            for candidate in self.tiers:
+                if candidate.every * candidate.capacity * self.interval >= since:
+                    tier = candidate
+                    break
+            slots = tier.slots_since(time.time() - since)
+            group_size = max(1, math.ceil(len(slots) / max(1, points)))
+            if queues is None:
+                queues = sorted(tier.series)
+            series = {}
+            for queue in queues:
+                values = tier.series.get(queue)
+                series[queue] = {}
+                for status, column in zip(statuses, columns):
+                    counts = [
+                        (
+                            None
+                            if values is None
+                            or values[slot * width + column] == MISSING
+                            else values[slot * width + column]
+                        )
+                        for slot in slots
+                    ]
+                    series[queue][status] = downsample(counts, group_size)
+            timestamps = [
+                tier.timestamps[slots[min(i + group_size, len(slots)) - 1]]
+                for i in range(0, len(slots), group_size)
+            ]
+        return {
+            "step": tier.every * self.interval * group_size,
+            "timestamps": timestamps,
+            "series": series,
+        }
+
+    def nbytes(self):
+        """
+        :return: bytes used by ring buffers of all tiers
+        """
+        with self._lock:
+            return sum(tier.nbytes() for tier in self.tiers)
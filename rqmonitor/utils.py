@@ -4,6 +4,11 @@ import os
 import signal
 import logging
 import socket
+import time
+import hashlib
+import csv
+import io
+import json
 import zlib
 from rq.registry import (
     StartedJobRegistry,
@@ -14,16 +19,30 @@ from rq.registry import (
 )
 from rq.exceptions import NoSuchJobError
 from rq.connections import resolve_connection
-from rq.utils import utcparse
-from rq.exceptions import InvalidJobOperationError
+from rq.utils import utcparse, utcformat, utcnow, current_timestamp
+from rq.compat import as_text
+from rq.suspension import WORKERS_SUSPENDED
 from rqmonitor.exceptions import RQMonitorException
+from redis.exceptions import NoScriptError
 from datetime import datetime
+from functools import partial, lru_cache
+from urllib.parse import urlparse, parse_qs
 from rq.worker import Worker
 from rq.queue import Queue
 from rq.job import Job
 from fabric import Connection, Config
 from invoke import UnexpectedExit
 from rqmonitor.constants import RQ_REDIS_NAMESPACE
+from rqmonitor.defaults import (
+    RQ_MONITOR_BULK_CHUNK_SIZE,
+    RQ_MONITOR_BULK_TIME_SLICE,
+    RQ_MONITOR_BULK_PAUSE,
+    RQ_MONITOR_EXPORT_CHUNK_SIZE,
+    RQ_MONITOR_JOBS_OVERFETCH,
+    RQ_MONITOR_REDIS_MEMORY_SCAN_COUNT,
+    RQ_MONITOR_REDIS_MEMORY_SAMPLE_RATIO,
+    RQ_MONITOR_REDIS_MEMORY_SAMPLES,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -42,9 +61,77 @@ REGISTRIES = [
 
 JobStatus = ["queued", "finished", "failed", "started", "deferred", "scheduled"]
 
+REGISTRY_CLASSES = {
+    "started": StartedJobRegistry,
+    "finished": FinishedJobRegistry,
+    "failed": FailedJobRegistry,
+    "deferred": DeferredJobRegistry,
+    "scheduled": ScheduledJobRegistry,
+}
+
+WORKER_SNAPSHOT_FIELDS = (
+    "queues",
+    "state",
+    "current_job",
+    "hostname",
+    "failed_job_count",
+)
+
+# registries whose cleanup() drops entries scored between 0 and now
+EXPIRING_REGISTRIES = ("started", "finished", "failed")
+
+# decompressed tracebacks kept in memory
+EXC_INFO_CACHE_SIZE = 128
+# characters of traceback last line shown in jobs table
+EXC_INFO_SUMMARY_LENGTH = 200
+
+# job hash fields displayed in jobs table, all that a job row is loaded with
+JOB_ROW_FIELDS = (
+    "description",
+    "exc_info",
+    "status",
+    "origin",
+    "created_at",
+    "enqueued_at",
+    "ttl",
+    "timeout",
+    "result_ttl",
+    "failure_ttl",
+)
+
+
+def create_redis_connection(redis_url, **pool_options):
+    """
+    :param redis_url: Redis URL to connect to
+    :param pool_options: connection pool options like max_connections, timeout,
+                         socket_timeout, socket_connect_timeout, health_check_interval
+    :return: Redis client backed by its own connection pool
 
-def create_redis_connection(redis_url):
-    return redis.Redis.from_url(redis_url)
+    With pool options a blocking pool is used, so requests wait for a free
+    connection instead of failing once max_connections are checked out
+    """
+    if not pool_options:
+        return redis.Redis.from_url(redis_url)
+    connection_pool = redis.BlockingConnectionPool.from_url(redis_url, **pool_options)
+    return redis.Redis(connection_pool=connection_pool)
+
+
+def describe_redis_url(redis_url):
+    """
+    :return: host:port/db of Redis URL (socket path/db for unix ones), safe to
+             show as credentials are left out
+    """
+    parsed = urlparse(redis_url)
+    # querystring db wins over path, same as redis-py
+    db = parse_qs(parsed.query).get("db", [None])[0]
+    if parsed.scheme == "unix":
+        return "{0}/{1}".format(parsed.path, db or 0)
+    host = parsed.hostname or "localhost"
+    if ":" in host:
+        host = "[{0}]".format(host)
+    return "{0}:{1}/{2}".format(
+        host, parsed.port or 6379, db or parsed.path.lstrip("/") or 0
+    )
 
 
 def send_signal_worker(worker_id):
@@ -58,28 +145,42 @@ def attach_rq_queue_prefix(queue_id):
     return Queue.redis_queue_namespace_prefix + queue_id
 
 
-def delete_queue(queue_id):
+def delete_queue(queue_id, connection=None, **bulk_options):
     """
     :param queue_id: Queue ID/name to delete
-    :return: None
+    :param bulk_options: passed to run_script_in_chunks while emptying queue
+    :return: count of deleted jobs
 
     As no specific exception is raised for below method
     we are using general Exception class for now
     """
-    queue_instance = Queue.from_queue_key(attach_rq_queue_prefix(queue_id))
-    queue_instance.delete()
-
-
-def empty_queue(queue_id):
+    redis_connection = resolve_connection(connection)
+    deleted_count = empty_queue(queue_id, connection=redis_connection, **bulk_options)
+    if is_stopped(bulk_options):
+        return deleted_count
+    queue_key = attach_rq_queue_prefix(queue_id)
+    with redis_connection.pipeline() as pipeline:
+        pipeline.srem(Queue.redis_queues_keys, queue_key)
+        pipeline.delete(queue_key)
+        pipeline.execute()
+    return deleted_count
+
+
+def empty_queue(queue_id, connection=None, **bulk_options):
     """
-    :param queue_id: Queue ID/name to delete
-    :return: None
+    Same as Queue.empty but jobs are deleted chunk by chunk, see empty_registry
 
-    As no specific exception is raised for below method
-    we are using general Exception class for now
+    :param queue_id: Queue ID/name to empty
+    :param bulk_options: passed to run_script_in_chunks
+    :return: count of deleted jobs
     """
-    queue_instance = Queue.from_queue_key(attach_rq_queue_prefix(queue_id))
-    queue_instance.empty()
+    return run_script_in_chunks(
+        purge_queue_script,
+        resolve_connection(connection),
+        (attach_rq_queue_prefix(queue_id),),
+        (Job.redis_job_namespace_prefix,),
+        **bulk_options
+    )[0]
 
 
 def delete_workers(worker_ids, signal_to_pass=signal.SIGINT):
@@ -166,11 +267,75 @@ def delete_workers(worker_ids, signal_to_pass=signal.SIGINT):
                     return
 
 
-def list_all_queues():
+def list_all_queues(connection=None):
     """
     :return: Iterable for all available queue instances
     """
-    return Queue.all()
+    return Queue.all(connection=connection)
+
+
+def list_workers_snapshot(connection=None):
+    """
+    Reads all worker hashes in a single pipeline along with suspension state,
+    instead of one Worker.find_by_key and a few more round trips per worker
+
+    :param connection:
+    :return: list of dicts with worker_name, queues, state, current_job_id,
+             hostname and failed_job_count of every alive worker
+    """
+    workers, suspended = fetch_workers_snapshot(connection)
+    if suspended:
+        for worker in workers:
+            worker["state"] = "suspended"
+    return workers
+
+
+def fetch_workers_snapshot(connection=None):
+    """
+    Same pipeline as list_workers_snapshot, states left as stored by workers
+
+    :param connection:
+    :return: tuple of worker dicts and whether workers are suspended
+    """
+    redis_connection = resolve_connection(connection)
+    worker_keys = sorted(
+        as_text(key) for key in redis_connection.smembers(Worker.redis_workers_keys)
+    )
+    with redis_connection.pipeline(transaction=False) as pipeline:
+        for worker_key in worker_keys:
+            pipeline.hmget(worker_key, *WORKER_SNAPSHOT_FIELDS)
+        pipeline.exists(WORKERS_SUSPENDED)
+        results = pipeline.execute()
+
+    suspended = bool(results.pop())
+    return read_workers_snapshot(worker_keys, results, False), suspended
+
+
+def read_workers_snapshot(worker_keys, worker_values, suspended):
+    """
+    :param worker_keys: sorted worker keys
+    :param worker_values: HMGET of WORKER_SNAPSHOT_FIELDS for every worker key
+    :param suspended: whether workers are suspended
+    :return: worker dicts as returned by list_workers_snapshot
+    """
+    workers = []
+    for worker_key, values in zip(worker_keys, worker_values):
+        worker_hash = dict(zip(WORKER_SNAPSHOT_FIELDS, (as_text(v) for v in values)))
+        if not any(worker_hash.values()):
+            # worker key expired after being listed
+            continue
+        queues = worker_hash["queues"]
+        workers.append(
+            {
+                "worker_name": worker_key[len(Worker.redis_worker_namespace_prefix) :],
+                "queues": queues.split(",") if queues else [],
+                "state": "suspended" if suspended else (worker_hash["state"] or "?"),
+                "current_job_id": worker_hash["current_job"],
+                "hostname": worker_hash["hostname"],
+                "failed_job_count": int(worker_hash["failed_job_count"] or 0),
+            }
+        )
+    return workers
 
 
 def list_all_possible_job_status():
@@ -180,11 +345,11 @@ def list_all_possible_job_status():
     return JobStatus
 
 
-def list_all_queues_names():
+def list_all_queues_names(connection=None):
     """
     :return: Iterable of all queue names
     """
-    return [queue.name for queue in list_all_queues()]
+    return [queue.name for queue in list_all_queues(connection)]
 
 
 # a bit hacky for now
@@ -211,6 +376,270 @@ def validate_job_data(
             return humanize_func(val)
 
 
+class JobRow(object):
+    """
+    Job as displayed in jobs table, just job id and text of JOB_ROW_FIELDS
+    (exc_info kept as stored), fields left out of projection are None
+    """
+
+    __slots__ = ("job_id",) + JOB_ROW_FIELDS
+
+    def __init__(self, job_id, **fields):
+        self.job_id = job_id
+        for field in JOB_ROW_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    def get_id(self):
+        return self.job_id
+
+
+def parse_job_row_fields(fields):
+    """
+    :param fields: comma separated JOB_ROW_FIELDS as received on /jobs,
+                   None or empty for all of them
+    :return: tuple of fields
+    :raises RQMonitorException if some field is unknown
+    """
+    if not fields:
+        return JOB_ROW_FIELDS
+    fields = tuple(field.strip() for field in fields.split(","))
+    unknown_fields = [field for field in fields if field not in JOB_ROW_FIELDS]
+    if unknown_fields:
+        raise RQMonitorException(
+            "Unknown job fields {0}".format(", ".join(unknown_fields)),
+            status_code=400,
+        )
+    return fields
+
+
+def add_job_row_commands(pipeline, job_ids, fields=JOB_ROW_FIELDS):
+    """
+    Buffers HMGET of projected fields of every job on a pipeline, works with
+    sync as well as asyncio redis pipelines. Job payload (data) is never read
+
+    :return: fields to pass to read_job_rows
+    """
+    # created_at is always set by rq, tells whether job still exists
+    fields = tuple(fields) + ("created_at",)
+    for job_id in job_ids:
+        pipeline.hmget(Job.key_for(job_id), *fields)
+    return fields
+
+
+def read_job_rows(job_ids, fields, results):
+    """
+    :param fields: as returned by add_job_row_commands
+    :param results: pipeline results of commands added by add_job_row_commands
+    :return: JobRow of every job which still exists
+    """
+    rows = []
+    for job_id, values in zip(job_ids, results):
+        if values[-1] is None:
+            continue
+        row = JobRow(job_id)
+        for field, value in zip(fields, values):
+            setattr(row, field, value if field == "exc_info" else as_text(value))
+        rows.append(row)
+    return rows
+
+
+def load_job_rows(job_ids, fields=JOB_ROW_FIELDS, connection=None):
+    """
+    Lightweight alternative of Job.fetch_many for listing jobs, reads only
+    projected fields of all jobs in a single pipelined round trip
+
+    :param job_ids: ids of jobs to load
+    :param fields: JOB_ROW_FIELDS to load
+    :param connection:
+    :return: JobRow of every job which still exists, in order of job_ids
+    """
+    redis_connection = resolve_connection(connection)
+    with redis_connection.pipeline(transaction=False) as pipeline:
+        row_fields = add_job_row_commands(pipeline, job_ids, fields)
+        results = pipeline.execute()
+    return read_job_rows(job_ids, row_fields, results)
+
+
+@lru_cache(maxsize=EXC_INFO_CACHE_SIZE)
+def read_exc_info(exc_info):
+    """
+    Decompressed tracebacks are cached, as the same failed jobs are listed on
+    every refresh of jobs table
+
+    :param exc_info: exc_info as stored in job hash, compressed or not
+    :return: exc_info text
+    """
+    if exc_info is None:
+        return None
+    try:
+        return zlib.decompress(exc_info).decode("utf-8")
+    except (zlib.error, TypeError):
+        # Fallback to uncompressed string, same as rq
+        return as_text(exc_info)
+
+
+def summarize_exc_info(exc_info):
+    """
+    :param exc_info: exc_info as stored in job hash
+    :return: last line of traceback, usually exception type and message
+    """
+    exc_info = read_exc_info(exc_info)
+    if not exc_info:
+        return None
+    lines = [line for line in exc_info.splitlines() if line.strip()]
+    summary = lines[-1].strip() if lines else exc_info.strip()
+    if len(summary) > EXC_INFO_SUMMARY_LENGTH:
+        summary = summary[: EXC_INFO_SUMMARY_LENGTH - 3] + "..."
+    return summary
+
+
+def get_exc_info_size(exc_info):
+    """
+    :param exc_info: exc_info as stored in job hash
+    :return: humanized size of traceback text, None if there is none
+    """
+    exc_info = read_exc_info(exc_info)
+    if not exc_info:
+        return None
+    return humanize.naturalsize(len(exc_info.encode("utf-8")))
+
+
+def fetch_exc_info(job_id, connection=None):
+    """
+    :param job_id: job whose traceback is needed
+    :return: traceback text, None if job did not fail with one
+    :raises NoSuchJobError if job is not found
+    """
+    redis_connection = resolve_connection(connection)
+    job_key = Job.key_for(job_id)
+    with redis_connection.pipeline(transaction=False) as pipeline:
+        pipeline.exists(job_key)
+        pipeline.hget(job_key, "exc_info")
+        exists, exc_info = pipeline.execute()
+    if not exists:
+        raise NoSuchJobError("No such job: {0}".format(job_key))
+    return read_exc_info(exc_info)
+
+
+# job_info key of every JOB_ROW_FIELDS and how its value is displayed
+JOB_ROW_COLUMNS = (
+    ("description", "job_description", validate_job_data),
+    # full traceback is served lazily by /jobs/<job_id>/exc_info
+    (
+        "exc_info",
+        "job_exc_summary",
+        lambda val: validate_job_data(summarize_exc_info(val)),
+    ),
+    ("exc_info", "job_exc_info_size", get_exc_info_size),
+    ("status", "job_status", validate_job_data),
+    ("origin", "job_queue", validate_job_data),
+    (
+        "created_at",
+        "job_created_time_humanize",
+        partial(
+            validate_job_data,
+            humanize_func=humanize.naturaltime,
+            with_utcparse=True,
+            relative_to_now=True,
+        ),
+    ),
+    (
+        "enqueued_at",
+        "job_enqueued_time_humanize",
+        partial(
+            validate_job_data,
+            humanize_func=humanize.naturaltime,
+            with_utcparse=True,
+            relative_to_now=True,
+        ),
+    ),
+    ("ttl", "job_ttl", partial(validate_job_data, default="Infinite", append_s=True)),
+    (
+        "timeout",
+        "job_timeout",
+        partial(validate_job_data, default="180s", append_s=True),
+    ),
+    (
+        "result_ttl",
+        "job_result_ttl",
+        partial(validate_job_data, default="500s", append_s=True),
+    ),
+    (
+        "failure_ttl",
+        "job_fail_ttl",
+        partial(validate_job_data, default="1yr", append_s=True),
+    ),
+)
+
+
+def reformat_job_row(row, fields=JOB_ROW_FIELDS):
+    """
+    Create serialized version of job row which can be consumed by DataTable
+
+    :param row: JobRow to be serialized
+    :param fields: JOB_ROW_FIELDS to include, job id is always included
+    :return: serialized job
+    """
+    job_info = {"job_id": validate_job_data(row.job_id)}
+    for field, key, display in JOB_ROW_COLUMNS:
+        if field in fields:
+            job_info[key] = display(getattr(row, field))
+    return {"job_info": job_info}
+
+
+def export_job_row(row, registry, fields=JOB_ROW_FIELDS):
+    """
+    :param row: JobRow to be exported
+    :param registry: registry (job status) row was listed in
+    :return: dict of job id, registry and raw text of fields, full traceback
+             included
+    """
+    job = {"job_id": row.job_id, "registry": registry}
+    for field in fields:
+        value = getattr(row, field)
+        job[field] = read_exc_info(value) if field == "exc_info" else value
+    return job
+
+
+def stream_jobs_ndjson(chunks, fields=JOB_ROW_FIELDS):
+    """
+    :param chunks: as generated by iter_job_rows_in_queues_registries
+    :return: generator of NDJSON text, one JSON object per job and per line,
+             one piece per chunk
+    """
+    for queue, registry, rows in chunks:
+        if rows:
+            yield "".join(
+                json.dumps(export_job_row(row, registry, fields)) + "\n" for row in rows
+            )
+
+
+def stream_jobs_csv(chunks, fields=JOB_ROW_FIELDS):
+    """
+    :param chunks: as generated by iter_job_rows_in_queues_registries
+    :return: generator of CSV text, header first then one piece per chunk
+    """
+    columns = ("job_id", "registry") + tuple(fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for queue, registry, rows in chunks:
+        if not rows:
+            continue
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(export_job_row(row, registry, fields) for row in rows)
+        yield buffer.getvalue()
+
+
+# format parameter of jobs export to mimetype and serializer of jobs
+JOB_EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", stream_jobs_ndjson),
+    "csv": ("text/csv", stream_jobs_csv),
+}
+
+
 def reformat_job_data(job: Job):
     """
     Create serialized version of Job which can be consumed by DataTable
@@ -222,43 +651,12 @@ def reformat_job_data(job: Job):
     :return: serialized job
     """
     serialized_job = job.to_dict()
-    return {
-        "job_info": {
-            "job_id": validate_job_data(job.get_id()),
-            "job_description": validate_job_data(serialized_job.get("description")),
-            "job_exc_info": validate_job_data(
-                zlib.decompress(serialized_job.get("exc_info")).decode("utf-8")
-                if serialized_job.get("exc_info") is not None
-                else None
-            ),
-            "job_status": validate_job_data(serialized_job.get("status")),
-            "job_queue": validate_job_data(serialized_job.get("origin")),
-            "job_created_time_humanize": validate_job_data(
-                serialized_job.get("created_at"),
-                humanize_func=humanize.naturaltime,
-                with_utcparse=True,
-                relative_to_now=True,
-            ),
-            "job_enqueued_time_humanize": validate_job_data(
-                serialized_job.get("enqueued_at"),
-                humanize_func=humanize.naturaltime,
-                with_utcparse=True,
-                relative_to_now=True,
-            ),
-            "job_ttl": validate_job_data(
-                serialized_job.get("ttl"), default="Infinite", append_s=True
-            ),
-            "job_timeout": validate_job_data(
-                serialized_job.get("timeout"), default="180s", append_s=True
-            ),
-            "job_result_ttl": validate_job_data(
-                serialized_job.get("result_ttl"), default="500s", append_s=True
-            ),
-            "job_fail_ttl": validate_job_data(
-                serialized_job.get("failure_ttl"), default="1yr", append_s=True
-            ),
-        },
-    }
+    return reformat_job_row(
+        JobRow(
+            job.get_id(),
+            **{field: serialized_job.get(field) for field in JOB_ROW_FIELDS}
+        )
+    )
 
 
 def get_queue(queue):
@@ -371,84 +769,258 @@ def list_jobs_in_queue_registry(queue, registry, start=0, end=-1):
     return []
 
 
-def empty_registry(registry_name, queue_name, connection=None):
-    """Empties a specific registry for a specific queue, Not in RQ, implemented
-    here for performance reasons
+class LuaScript(object):
+    """
+    Lua script run with EVALSHA on any connection, its source is sent to
+    redis only when redis doesn't know it yet
     """
-    redis_connection = resolve_connection(connection)
-    queue_instance = Queue.from_queue_key(
-        Queue.redis_queue_namespace_prefix + queue_name
-    )
 
-    registry_instance = None
-    if registry_name == "failed":
-        registry_instance = queue_instance.failed_job_registry
-    elif registry_name == "started":
-        registry_instance = queue_instance.started_job_registry
-    elif registry_name == "scheduled":
-        registry_instance = queue_instance.scheduled_job_registry
-    elif registry_name == "deferred":
-        registry_instance = queue_instance.deferred_job_registry
-    elif registry_name == "finished":
-        registry_instance = queue_instance.finished_job_registry
-
-    script = """
-        local prefix = "{0}"
-        local q = KEYS[1]
-        local count = 0
-        while true do
-            local job_id, score = unpack(redis.call("zpopmin", q))
-            if job_id == nil or score == nil then
-                break
-            end
+    def __init__(self, script):
+        self.script = script
+        self.sha = hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+    def __call__(self, connection, keys=(), args=()):
+        keys_and_args = tuple(keys) + tuple(args)
+        try:
+            return connection.evalsha(self.sha, len(keys), *keys_and_args)
+        except NoScriptError:
+            connection.script_load(self.script)
+            return connection.evalsha(self.sha, len(keys), *keys_and_args)
+
+
+def run_script_in_chunks(
+    script,
+    connection,
+    keys,
+    args,
+    chunk_size=RQ_MONITOR_BULK_CHUNK_SIZE,
+    time_slice=RQ_MONITOR_BULK_TIME_SLICE,
+    pause=RQ_MONITOR_BULK_PAUSE,
+    progress=None,
+    stop_event=None,
+):
+    """
+    Runs a script handling up to chunk size items per run, passed as its last
+    argument, until a run handles less than that. Chunk size is shrunk when a
+    run keeps redis busy for longer than time_slice and grown back otherwise
+
+    :param script: LuaScript returning count of items handled first, then
+                   any other counts
+    :param chunk_size: largest count of items handled by a single run
+    :param time_slice: seconds a single run should not exceed, 0 disables
+    :param pause: seconds to sleep between two runs
+    :param progress: callable called with count of items handled by every run
+    :param stop_event: threading.Event which stops runs when set
+    :return: list of counts returned by script, summed over all runs
+    """
+    totals = None
+    size = chunk_size
+    while True:
+        started_at = time.perf_counter()
+        counts = script(connection, keys, tuple(args) + (size,))
+        elapsed = time.perf_counter() - started_at
+        if totals is None:
+            totals = counts
+        else:
+            totals = [total + count for total, count in zip(totals, counts)]
+        if progress is not None:
+            progress(counts[0])
+        if counts[0] < size:
+            return totals
+        if time_slice and elapsed > time_slice:
+            size = max(1, int(size * time_slice / elapsed))
+        elif elapsed < time_slice / 2:
+            size = min(chunk_size, size * 2)
+        if stop_event is not None and stop_event.wait(pause):
+            return totals
+        elif stop_event is None and pause:
+            time.sleep(pause)
+
+
+def is_stopped(bulk_options):
+    """
+    :return: whether stop_event of bulk options passed to run_script_in_chunks
+             is set
+    """
+    stop_event = bulk_options.get("stop_event")
+    return stop_event is not None and stop_event.is_set()
 
-            -- Delete the relevant keys
-            redis.call("del", prefix..job_id)
-            redis.call("del", prefix..job_id..":dependents")
-            count = count + 1
-        end
-        return count
-    """.format(
-        registry_instance.job_class.redis_job_namespace_prefix
-    ).encode(
-        "utf-8"
-    )
-    script = redis_connection.register_script(script)
-    return script(keys=[registry_instance.key])
+
+# deletes up to chunk_size jobs of a registry, oldest first
+purge_registry_script = LuaScript(
+    """
+    local registry, job_prefix, chunk_size = KEYS[1], ARGV[1], tonumber(ARGV[2])
+    local job_ids = redis.call("zrange", registry, 0, chunk_size - 1)
+    if #job_ids > 0 then
+        redis.call("zremrangebyrank", registry, 0, #job_ids - 1)
+    end
+    for _, job_id in ipairs(job_ids) do
+        redis.call("del", job_prefix .. job_id, job_prefix .. job_id .. ":dependents")
+    end
+    return {#job_ids}
+"""
+)
+
+# deletes up to chunk_size jobs from head of a queue, as Queue.empty does
+purge_queue_script = LuaScript(
+    """
+    local queue_key, job_prefix, chunk_size = KEYS[1], ARGV[1], tonumber(ARGV[2])
+    local job_ids = redis.call("lrange", queue_key, 0, chunk_size - 1)
+    redis.call("ltrim", queue_key, #job_ids, -1)
+    for _, job_id in ipairs(job_ids) do
+        redis.call("del", job_prefix .. job_id, job_prefix .. job_id .. ":dependents")
+    end
+    return {#job_ids}
+"""
+)
+
+
+def empty_registry(registry_name, queue_name, connection=None, **bulk_options):
+    """Empties a specific registry for a specific queue, Not in RQ, implemented
+    here for performance reasons. Jobs are deleted chunk by chunk so redis
+    keeps serving other clients, workers included, while large registries
+    are purged
+
+    :param bulk_options: passed to run_script_in_chunks
+    :return: count of deleted jobs
+    """
+    return run_script_in_chunks(
+        purge_registry_script,
+        resolve_connection(connection),
+        (REGISTRY_CLASSES[registry_name].key_template.format(queue_name),),
+        (Job.redis_job_namespace_prefix,),
+        **bulk_options
+    )[0]
 
 
-def delete_all_jobs_in_queues_registries(queues, registries):
+def delete_all_jobs_in_queues_registries(queues, registries, **bulk_options):
+    """
+    :param bulk_options: connection and options of run_script_in_chunks
+    :return: count of deleted jobs
+    """
+    deleted_count = 0
     for queue in queues:
         for registry in registries:
+            if is_stopped(bulk_options):
+                return deleted_count
             if registry == "queued":
                 # removes all jobs from queue and from job namespace
-                get_queue(queue).empty()
+                deleted_count += empty_queue(queue, **bulk_options)
             else:
-                empty_registry(registry, queue)
+                deleted_count += empty_registry(registry, queue, **bulk_options)
+    return deleted_count
 
 
-def requeue_all_jobs_in_failed_registry(queues):
+# requeues up to chunk_size jobs of a failed registry, the same way
+# FailedJobRegistry.requeue does for a single job
+requeue_failed_jobs_script = LuaScript(
+    """
+    local registry, queues_key = KEYS[1], KEYS[2]
+    local job_prefix, queue_prefix, queue_name = ARGV[1], ARGV[2], ARGV[3]
+    local enqueued_at, chunk_size = ARGV[5], tonumber(ARGV[6])
+    -- expired entries are dropped as registry cleanup would do
+    redis.call("zremrangebyscore", registry, 0, ARGV[4])
+    local job_ids = redis.call("zrange", registry, 0, chunk_size - 1)
+    local requeued = 0
+    for _, job_id in ipairs(job_ids) do
+        redis.call("zrem", registry, job_id)
+        local job_key = job_prefix .. job_id
+        if redis.call("exists", job_key) == 1 then
+            local origin = redis.call("hget", job_key, "origin") or queue_name
+            local queue_key = queue_prefix .. origin
+            redis.call("sadd", queues_key, queue_key)
+            redis.call("hmset", job_key, "status", "queued", "origin", origin,
+                       "enqueued_at", enqueued_at, "started_at", "",
+                       "ended_at", "")
+            local ttl = tonumber(redis.call("hget", job_key, "ttl"))
+            if ttl and ttl > 0 then
+                redis.call("expire", job_key, ttl)
+            end
+            redis.call("rpush", queue_key, job_id)
+            requeued = requeued + 1
+        end
+    end
+    return {#job_ids, requeued}
+"""
+)
+
+
+def requeue_all_jobs_in_failed_registry(queues, connection=None, **bulk_options):
+    """
+    Requeues failed jobs chunk by chunk, every chunk is moved from failed
+    registry to the origin queue of its jobs in a single atomic script run.
+    Registry entries whose job hash is gone are dropped and counted as failed
+
+    :param queues: list of queues whose failed jobs need to be requeued
+    :param connection:
+    :param bulk_options: passed to run_script_in_chunks
+    :return: tuple of requeued and failed job counts
+    """
+    redis_connection = resolve_connection(connection)
+    requeued_count = 0
     fail_count = 0
     for queue in queues:
-        failed_job_registry = get_queue(queue).failed_job_registry
-        job_ids = failed_job_registry.get_job_ids()
-        for job_id in job_ids:
-            try:
-                failed_job_registry.requeue(job_id)
-            except InvalidJobOperationError:
-                fail_count += 1
-    return fail_count
+        if is_stopped(bulk_options):
+            break
+        keys = (FailedJobRegistry.key_template.format(queue), Queue.redis_queues_keys)
+        args = (
+            Job.redis_job_namespace_prefix,
+            Queue.redis_queue_namespace_prefix,
+            queue,
+            current_timestamp(),
+            utcformat(utcnow()),
+        )
+        handled, requeued = run_script_in_chunks(
+            requeue_failed_jobs_script, redis_connection, keys, args, **bulk_options
+        )
+        requeued_count += requeued
+        fail_count += handled - requeued
+    return requeued_count, fail_count
 
 
-def cancel_all_queued_jobs(queues):
+# removes up to chunk_size jobs from head of a queue, the same way Job.cancel
+# does for a single job, counting those whose job hash still exists
+cancel_queued_jobs_script = LuaScript(
     """
+    local queue_key, job_prefix, chunk_size = KEYS[1], ARGV[1], tonumber(ARGV[2])
+    local job_ids = redis.call("lrange", queue_key, 0, chunk_size - 1)
+    redis.call("ltrim", queue_key, #job_ids, -1)
+    local cancelled = 0
+    for _, job_id in ipairs(job_ids) do
+        cancelled = cancelled + redis.call("exists", job_prefix .. job_id)
+    end
+    return {#job_ids, cancelled}
+"""
+)
+
+
+def cancel_all_queued_jobs(queues, connection=None, **bulk_options):
+    """
+    Cancels queued jobs chunk by chunk without fetching them, like Job.cancel
+    jobs are only removed from their queue. Queue entries whose job hash is
+    gone are dropped as well and counted as failed
+
     :param queues: list of queues from which to cancel the jobs
-    :return: None
+    :param connection:
+    :param bulk_options: passed to run_script_in_chunks
+    :return: tuple of cancelled and failed job counts
     """
+    redis_connection = resolve_connection(connection)
+    cancelled_count = 0
+    fail_count = 0
     for queue in queues:
-        job_ids = get_queue(queue).get_job_ids()
-        for job_id in job_ids:
-            cancel_job(job_id)
+        if is_stopped(bulk_options):
+            break
+        handled, cancelled = run_script_in_chunks(
+            cancel_queued_jobs_script,
+            redis_connection,
+            (attach_rq_queue_prefix(queue),),
+            (Job.redis_job_namespace_prefix,),
+            **bulk_options
+        )
+        cancelled_count += cancelled
+        fail_count += handled - cancelled
+    return cancelled_count, fail_count
 
 
 def job_count_in_queue_registry(queue, registry):
@@ -475,34 +1047,170 @@ def job_count_in_queue_registry(queue, registry):
         return 0
 
 
-def get_redis_memory_used(connection=None):
+def job_counts_in_queues_registries(queues, registries, connection=None):
     """
-    All memory used in redis rq: namespace
+    Counts jobs of every queue and registry combination in a single
+    pipelined round trip. Expired entries which RQ would clean up on
+    access are left out, so counts match what listing returns.
+
+    :param queues: list of queue names
+    :param registries: list of registry names (job status) including "queued"
     :param connection:
-    :return:
+    :return: dict of queue name to dict of registry name to count of jobs
     """
     redis_connection = resolve_connection(connection)
-    script = """
-        local sum = 0;
-        local keys = {};
-        local done = false;
-        local cursor = "0"
-        repeat
-            local result = redis.call("SCAN", cursor, "match", ARGV[1])
-            cursor = result[1];
-            keys = result[2];
-            for i, key in ipairs(keys) do
-                local mem = redis.call("MEMORY", "USAGE", key);
-                sum = sum + mem;
-            end
-            if cursor == "0" then
-                done = true;
-            end
-        until done
-        return sum;
+    with redis_connection.pipeline(transaction=False) as pipeline:
+        counts, lookups = add_job_count_commands(pipeline, queues, registries)
+        results = pipeline.execute()
+    return read_job_counts(counts, lookups, results)
+
+
+def add_job_count_commands(pipeline, queues, registries):
     """
-    script = redis_connection.register_script(script)
-    return humanize.naturalsize(script(args=[RQ_REDIS_NAMESPACE]))
+    Buffers count commands of job_counts_in_queues_registries on a pipeline,
+    works with sync as well as asyncio redis pipelines
+
+    :return: counts known without redis and lookups to pass to read_job_counts
+    """
+    timestamp = current_timestamp()
+    counts = {queue: {} for queue in queues}
+    lookups = []
+    for queue in queues:
+        for registry in registries:
+            if registry == "queued":
+                pipeline.llen(attach_rq_queue_prefix(queue))
+            elif registry in REGISTRY_CLASSES:
+                registry_key = REGISTRY_CLASSES[registry].key_template.format(queue)
+                pipeline.zcard(registry_key)
+                if registry in EXPIRING_REGISTRIES:
+                    pipeline.zcount(registry_key, 0, timestamp)
+            else:
+                # same as job_count_in_queue_registry for unknown registries
+                counts[queue][registry] = 0
+                continue
+            lookups.append((queue, registry))
+    return counts, lookups
+
+
+def read_job_counts(counts, lookups, results):
+    """
+    :param results: pipeline results of commands added by add_job_count_commands
+    :return: dict of queue name to dict of registry name to count of jobs
+    """
+    results = iter(results)
+    for queue, registry in lookups:
+        count = next(results)
+        if registry in EXPIRING_REGISTRIES:
+            count -= next(results)
+        counts[queue][registry] = count
+    return counts
+
+
+def add_job_ids_command(pipeline, queue, registry, start=0, end=-1, withscores=False):
+    """
+    Buffers read of job ids in [start, end] of a queue or known registry on a
+    pipeline, works with sync as well as asyncio redis pipelines. Read only,
+    expired entries of registries are skipped instead of being cleaned up
+
+    :param queue: queue name
+    :param registry: "queued" or one of REGISTRY_CLASSES
+    :param withscores: whether registry entries are read as (job id, score),
+                       queue entries are always read as job ids
+    """
+    if registry == "queued":
+        pipeline.lrange(attach_rq_queue_prefix(queue), start, end)
+        return
+    registry_key = REGISTRY_CLASSES[registry].key_template.format(queue)
+    if registry in EXPIRING_REGISTRIES:
+        pipeline.zrangebyscore(
+            registry_key,
+            "({0}".format(current_timestamp()),
+            "+inf",
+            start=start,
+            num=end - start + 1 if end >= 0 else -1,
+            withscores=withscores,
+        )
+    else:
+        pipeline.zrange(registry_key, start, end, withscores=withscores)
+
+
+def add_job_ids_signature_commands(pipeline, queue, registry):
+    """
+    Buffers cheap reads telling whether job ids of a queue or known registry
+    changed since last read, without reading them: size, first and last ids
+    (with their scores for registries) and for expiring registries the count
+    of expired entries, which grows as time passes
+
+    :param queue: queue name
+    :param registry: "queued" or one of REGISTRY_CLASSES
+    :return: number of commands buffered
+    """
+    if registry == "queued":
+        queue_key = attach_rq_queue_prefix(queue)
+        pipeline.llen(queue_key)
+        pipeline.lindex(queue_key, 0)
+        pipeline.lindex(queue_key, -1)
+        return 3
+    registry_key = REGISTRY_CLASSES[registry].key_template.format(queue)
+    pipeline.zcard(registry_key)
+    pipeline.zrange(registry_key, 0, 0, withscores=True)
+    pipeline.zrange(registry_key, -1, -1, withscores=True)
+    if registry in EXPIRING_REGISTRIES:
+        pipeline.zcount(registry_key, 0, current_timestamp())
+        return 4
+    return 3
+
+
+def estimate_redis_memory_used(
+    connection=None,
+    scan_count=RQ_MONITOR_REDIS_MEMORY_SCAN_COUNT,
+    sample_ratio=RQ_MONITOR_REDIS_MEMORY_SAMPLE_RATIO,
+    samples=RQ_MONITOR_REDIS_MEMORY_SAMPLES,
+    pause=0,
+    stop_event=None,
+):
+    """
+    Estimates memory used in redis rq: namespace without blocking redis.
+    Keyspace is walked client side in small SCAN batches and MEMORY USAGE is
+    asked only for a sample of keys of each batch, the total is extrapolated
+    from the average usage of sampled keys
+
+    :param connection:
+    :param scan_count: COUNT hint passed to every SCAN call
+    :param sample_ratio: fraction of scanned keys whose memory usage is measured
+    :param samples: SAMPLES passed to MEMORY USAGE for nested values
+    :param pause: seconds to sleep between two SCAN batches
+    :param stop_event: threading.Event which aborts the walk when set
+    :return: estimated bytes used, None if walk was aborted
+    """
+    redis_connection = resolve_connection(connection)
+    total_keys = 0
+    sampled_keys = 0
+    sampled_bytes = 0
+    cursor = 0
+    while True:
+        cursor, keys = redis_connection.scan(
+            cursor, match=RQ_REDIS_NAMESPACE, count=scan_count
+        )
+        total_keys += len(keys)
+        if keys:
+            sample = keys[: max(1, int(len(keys) * sample_ratio))]
+            with redis_connection.pipeline(transaction=False) as pipeline:
+                for key in sample:
+                    pipeline.execute_command("MEMORY", "USAGE", key, "SAMPLES", samples)
+                usages = [usage for usage in pipeline.execute() if usage is not None]
+            sampled_keys += len(usages)
+            sampled_bytes += sum(usages)
+        if int(cursor) == 0:
+            break
+        if stop_event is not None and stop_event.wait(pause):
+            return None
+        elif stop_event is None and pause:
+            time.sleep(pause)
+
+    if sampled_keys == 0:
+        return 0
+    return int(sampled_bytes / sampled_keys * total_keys)
 
 
 def fetch_job(job_id):
@@ -562,6 +1270,74 @@ def cancel_job(job_id):
         logger.error("Job not found in redis, cancel failed for job id : {}".format(e))
 
 
+def add_job_ids_by_rank_command(pipeline, queue, registry, start=0, end=-1):
+    """
+    Buffers read of job ids ranked in [start, end] of a queue or known
+    registry on a pipeline. Unlike add_job_ids_command expired entries are not
+    skipped, but a rank deep into a large registry is reached in logarithmic
+    time, where ZRANGEBYSCORE with an offset walks every entry before it
+    """
+    if registry == "queued":
+        pipeline.lrange(attach_rq_queue_prefix(queue), start, end)
+    else:
+        registry_key = REGISTRY_CLASSES[registry].key_template.format(queue)
+        pipeline.zrange(registry_key, start, end)
+
+
+def iter_job_rows_in_queues_registries(
+    queues,
+    registries,
+    fields=JOB_ROW_FIELDS,
+    chunk_size=RQ_MONITOR_EXPORT_CHUNK_SIZE,
+    connection=None,
+):
+    """
+    Walks jobs of every queue and registry combination in the order of jobs
+    table, chunk_size jobs at a time. Ids of next chunk are read in the same
+    pipelined round trip as fields of current chunk, so memory is bounded by
+    chunk_size whatever the number of jobs.
+    Ids are read by rank, jobs moving around registries while walking may be
+    skipped or met twice
+
+    :param queues: list of queue names
+    :param registries: list of registry names (job status) including "queued"
+    :param fields: JOB_ROW_FIELDS jobs are loaded with
+    :return: generator of (queue, registry, list of JobRow) of every chunk
+    """
+    redis_connection = resolve_connection(connection)
+    for queue in queues:
+        for registry in registries:
+            if registry != "queued" and registry not in REGISTRY_CLASSES:
+                continue
+            start = 0
+            if registry in EXPIRING_REGISTRIES:
+                # expired entries are ranked first, they are skipped at once
+                start = redis_connection.zcount(
+                    REGISTRY_CLASSES[registry].key_template.format(queue),
+                    "-inf",
+                    current_timestamp(),
+                )
+            with redis_connection.pipeline(transaction=False) as pipeline:
+                add_job_ids_by_rank_command(
+                    pipeline, queue, registry, start, start + chunk_size - 1
+                )
+                (job_ids,) = pipeline.execute()
+
+            while job_ids:
+                job_ids = [as_text(job_id) for job_id in job_ids]
+                start += len(job_ids)
+                with redis_connection.pipeline(transaction=False) as pipeline:
+                    row_fields = add_job_row_commands(pipeline, job_ids, fields)
+                    if len(job_ids) == chunk_size:
+                        add_job_ids_by_rank_command(
+                            pipeline, queue, registry, start, start + chunk_size - 1
+                        )
+                    results = pipeline.execute()
+                rows = read_job_rows(job_ids, row_fields, results[: len(job_ids)])
+                yield queue, registry, rows
+                job_ids = results[len(job_ids)] if len(results) > len(job_ids) else []
+
+
 def find_start_block(job_counts, start):
     """
     :return: index of block from where job picking will start from,
@@ -576,32 +1352,90 @@ def find_start_block(job_counts, start):
     return -1, -1
 
 
-def resolve_jobs(job_counts, start, length):
+def page_job_ids(job_counts, start, length, overfetch):
     """
-    :param job_counts: list of blocks(queue, registry, job_count)
-    :param start: job start index for datatables
-    :param length: number of jobs to be returned for datatables
-    :return: list of jobs of len <= "length"
+    Pages job ids of the [start, start + length) window out of blocks without
+    doing any I/O itself, so that sync and asyncio listings share it. Yields
+    lists of (block, start, end) windows of job ids to read, expecting job ids
+    read for them (see add_job_ids_command) to be sent back. Windows of all
+    blocks which as per their counts cover the page are yielded at once, a
+    few extra jobs being picked per block, following blocks are only read if
+    some jobs moved out of their registry meanwhile.
 
-    It may happen during processing some jobs move around registries
-    so jobs may extend from the desired counted blocks
+    :param job_counts: list of blocks(queue, registry, job_count)
+    :param overfetch: extra jobs picked per block beyond the requested window
+    :return: job ids of the page, as StopIteration value
     """
-    jobs = []
     start_block, cursor = find_start_block(job_counts, start)
-
     if start_block == -1:
-        return jobs
-
-    for i, block in enumerate(job_counts[start_block:]):
-        # below list does not contain any None, but might give some less jobs
-        # as some might have been moved out from that registry, in such case we try to
-        # fill our length by capturing the ones from other selected registries
-        current_block_jobs = list_jobs_in_queue_registry(
-            block.queue, block.registry, start=cursor
+        return []
+
+    job_ids = []
+    pending_blocks = job_counts[start_block:]
+    while pending_blocks and len(job_ids) < length:
+        remaining = length - len(job_ids)
+        windows = []
+        covered = 0
+        for block in pending_blocks:
+            if remaining <= 0:
+                break
+            covered += 1
+            take = min(max(block.count - cursor, 0), remaining)
+            known = block.registry == "queued" or block.registry in REGISTRY_CLASSES
+            if known and take + overfetch > 0:
+                windows.append((block, cursor, cursor + take + overfetch - 1))
+            remaining -= take
+            cursor = 0
+        pending_blocks = pending_blocks[covered:]
+        if windows:
+            for block_job_ids in (yield windows):
+                job_ids.extend(as_text(job_id) for job_id in block_job_ids)
+    return job_ids[:length]
+
+
+def add_job_id_window_commands(pipeline, windows):
+    """
+    Buffers reads of windows yielded by page_job_ids on a pipeline, works with
+    sync as well as asyncio redis pipelines
+    """
+    for block, window_start, window_end in windows:
+        add_job_ids_command(
+            pipeline, block.queue, block.registry, window_start, window_end
         )
-        jobs.extend(current_block_jobs)
-        cursor = 0
-        if len(jobs) >= length:
-            return jobs[:length]
+
+
+def resolve_jobs(
+    job_counts,
+    start,
+    length,
+    overfetch=RQ_MONITOR_JOBS_OVERFETCH,
+    fields=JOB_ROW_FIELDS,
+    connection=None,
+):
+    """
+    :param job_counts: list of blocks(queue, registry, job_count)
+    :param start: job start index for datatables
+    :param length: number of jobs to be returned for datatables
+    :param overfetch: extra jobs picked per block beyond the requested window
+    :param fields: JOB_ROW_FIELDS jobs are loaded with
+    :param connection:
+    :return: list of JobRow of len <= "length"
+
+    Only the [start, start + length) window is fetched from redis, see
+    page_job_ids, so page latency does not depend on registry sizes.
+    Registries are read without being cleaned up, expired entries being
+    skipped as job_counts_in_queues_registries leaves them out of counts
+    """
+    redis_connection = resolve_connection(connection)
+    pager = page_job_ids(job_counts, start, length, overfetch)
+    try:
+        windows = next(pager)
+        while True:
+            with redis_connection.pipeline(transaction=False) as pipeline:
+                add_job_id_window_commands(pipeline, windows)
+                windows = pager.send(pipeline.execute())
+    except StopIteration as stop:
+        job_ids = stop.value
+    return load_job_rows(job_ids, fields, connection=redis_connection)
 
     return jobs[:length]
@@ -1,6 +1,7 @@
 import os
 
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
 
 
 def get_version():
@@ -11,6 +12,24 @@ def get_version():
         return locals["VERSION"]
 
 
+def precompress_static(static_folder):
+    # run from its file, rqmonitor dependencies may not be installed yet
+    basedir = os.path.dirname(__file__)
+    with open(os.path.join(basedir, "rqmonitor/compression.py")) as f:
+        namespace = {"__name__": "rqmonitor_compression"}
+        exec(f.read(), namespace)
+        return namespace["precompress_static_folder"](static_folder)
+
+
+class BuildPyWithPrecompressedStatic(build_py):
+    """Ships .br/.gz siblings of static assets, served as they are"""
+
+    def run(self):
+        build_py.run(self)
+        if not self.dry_run:
+            precompress_static(os.path.join(self.build_lib, "rqmonitor", "static"))
+
+
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
@@ -28,7 +47,7 @@ setup(
         get_version()
     ),
     license="Apache Software License",
-    packages=find_packages(exclude=("tests",)),
+    packages=find_packages(exclude=("tests", "benchmarks")),
     include_package_data=True,
     zip_safe=False,
     platforms="any",
@@ -43,6 +62,8 @@ setup(
         "fabric>=2.5.0",
         "invoke>=1.4.1",
     ],
+    extras_require={"async": ["redis>=4.2.0"], "brotli": ["brotli>=1.0.0"]},
+    cmdclass={"build_py": BuildPyWithPrecompressedStatic},
     entry_points={"console_scripts": ["rqmonitor = rqmonitor.cli:main"]},
     classifiers=[
         "Intended Audience :: Developers",
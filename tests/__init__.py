@@ -4,8 +4,11 @@ Taken as reference from RQ's testing module
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import logging
+import threading
+from collections import Counter
 
 from redis import Redis
+from redis.client import Pipeline
 from rq import pop_connection, push_connection
 import unittest
 from rqmonitor.cli import create_app_with_blueprint
@@ -23,6 +26,47 @@ def find_empty_redis_database():
     assert False, "No empty Redis database found to run tests in."
 
 
+class CommandCounter(object):
+    """
+    Counts redis commands, pipelined ones included, sent by the thread which
+    entered the counter, by wrapping redis-py while entered. Commands of
+    background samplers running meanwhile in other threads are left out
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self._thread = None
+        self._execute_command = None
+        self._execute_pipeline = None
+
+    def __enter__(self):
+        counter = self
+        self._thread = threading.current_thread()
+        self._execute_command = execute_command = Redis.execute_command
+        self._execute_pipeline = execute_pipeline = Pipeline.execute
+
+        def counting_execute_command(client, *args, **options):
+            counter.add([args])
+            return execute_command(client, *args, **options)
+
+        def counting_execute_pipeline(pipeline, *args, **kwargs):
+            counter.add([command_args for command_args, _ in pipeline.command_stack])
+            return execute_pipeline(pipeline, *args, **kwargs)
+
+        Redis.execute_command = counting_execute_command
+        Pipeline.execute = counting_execute_pipeline
+        return self
+
+    def __exit__(self, *exc_info):
+        Redis.execute_command = self._execute_command
+        Pipeline.execute = self._execute_pipeline
+
+    def add(self, commands):
+        if threading.current_thread() is self._thread:
+            for command_args in commands:
+                self.counts[str(command_args[0]).upper()] += 1
+
+
 class RQMonitorTestCase(unittest.TestCase):
     """Base class to inherit test cases from for RQ Monitor.
 
@@ -49,6 +93,11 @@ class RQMonitorTestCase(unittest.TestCase):
         cls.app.config["RQ_MONITOR_REDIS_URL"] = "redis://127.0.0.1:6379/{0}".format(
             dbnum
         )
+        # every test changes redis underneath, never serve a snapshot across tests
+        cls.app.config["RQ_MONITOR_SNAPSHOT_TTL"] = 0
+        cls.app.config["RQ_MONITOR_QUEUE_DIRECTORY_TTL"] = 0
+        # answer bulk actions once done, as tests check their effect right after
+        cls.app.config["RQ_MONITOR_TASK_WAIT"] = 10
         cls.client = cls.app.test_client()
 
     def setUp(self):
@@ -0,0 +1,306 @@
+import sys
+import os
+import json
+import gzip
+import base64
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.getcwd(), "../"))
+
+from tests import RQMonitorTestCase
+from tests import fixtures
+from rq.job import Job
+from rq.queue import Queue
+from rq.worker import Worker
+from rqmonitor.aio import AsyncRQMonitor, aioredis
+
+HTTP_OK = 200
+HTTP_NOT_MODIFIED = 304
+HTTP_BAD_REQUEST = 400
+
+
+@unittest.skipIf(aioredis is None, "redis.asyncio is not available")
+class TestAsyncRQMonitor(RQMonitorTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestAsyncRQMonitor, cls).setUpClass()
+        cls.loop = asyncio.new_event_loop()
+        cls.asgi_app = AsyncRQMonitor(cls.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.run_until_complete(cls.asgi_app.close())
+        cls.loop.close()
+        super(TestAsyncRQMonitor, cls).tearDownClass()
+
+    def asgi_get(self, path, query_string=None, headers=None):
+        """
+        :return: status, headers and body of GET request sent to ASGI app
+        """
+        flask_request = self.app.test_request_context(path, query_string=query_string)
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": flask_request.request.query_string,
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in (headers or {}).items()
+            ],
+        }
+        messages = []
+
+        async def request():
+            received = []
+
+            async def receive():
+                if not received:
+                    received.append(True)
+                    return {"type": "http.request", "body": b""}
+                # client never disconnects
+                await asyncio.Event().wait()
+
+            async def send(message):
+                messages.append(message)
+
+            await self.asgi_app(scope, receive, send)
+
+        self.loop.run_until_complete(request())
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        return messages[0]["status"], dict(messages[0]["headers"]), body
+
+    def test_list_queues_same_as_wsgi(self):
+        some_queue = Queue(name="some_queue")
+        job = Job.create(func=fixtures.some_calculation, args=(3, 4), kwargs=dict(z=2))
+        some_queue.enqueue_job(job)
+
+        status, headers, body = self.asgi_get("/queues")
+        self.assertEqual(status, HTTP_OK)
+        self.assertEqual(
+            json.loads(body.decode("utf-8")),
+            json.loads(self.client.get("/queues").data.decode("utf-8")),
+        )
+
+        status, _, _ = self.asgi_get(
+            "/queues", headers={"If-None-Match": headers[b"etag"].decode("latin-1")}
+        )
+        self.assertEqual(status, HTTP_NOT_MODIFIED)
+
+    def test_list_queues_compressed(self):
+        for i in range(50):
+            Queue(name="some_queue_{0}".format(i)).enqueue_job(
+                Job.create(func=fixtures.say_hello)
+            )
+
+        status, headers, body = self.asgi_get(
+            "/queues", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(status, HTTP_OK)
+        self.assertEqual(headers[b"content-encoding"], b"gzip")
+        self.assertTrue(headers[b"etag"].startswith(b'W/"'))
+        self.assertEqual(
+            json.loads(gzip.decompress(body).decode("utf-8")),
+            json.loads(self.client.get("/queues").data.decode("utf-8")),
+        )
+
+        status, _, _ = self.asgi_get(
+            "/queues",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": headers[b"etag"].decode("latin-1"),
+            },
+        )
+        self.assertEqual(status, HTTP_NOT_MODIFIED)
+
+    def test_list_workers(self):
+        worker = Worker([Queue("q1")], name="worker1")
+        worker.register_birth()
+        status, _, body = self.asgi_get("/workers")
+        self.assertEqual(status, HTTP_OK)
+        workers = json.loads(body.decode("utf-8"))["data"]
+        self.assertEqual(len(workers), 1)
+        self.assertEqual(workers[0]["worker_name"], "worker1")
+        self.assertEqual(workers[0]["listening_on"], "q1")
+
+    def test_list_jobs_same_as_wsgi(self):
+        q1 = Queue("q1")
+        q2 = Queue("q2")
+        for queue, count in ((q1, 7), (q2, 6)):
+            for i in range(count):
+                job = Job.create(
+                    func=fixtures.some_calculation, args=(3, 4), kwargs=dict(z=2)
+                )
+                queue.enqueue_job(job)
+
+        query_string = {
+            "start": 5,
+            "length": 5,
+            "draw": 1,
+            "queues[]": ["q1", "q2"],
+            "jobstatus[]": ["queued", "failed"],
+        }
+        status, _, body = self.asgi_get("/jobs", query_string=query_string)
+        self.assertEqual(status, HTTP_OK)
+        expected = json.loads(
+            self.client.get("/jobs", query_string=query_string).data.decode("utf-8")
+        )
+        self.assertEqual(json.loads(body.decode("utf-8")), expected)
+        self.assertEqual(len(expected["data"]), 5)
+        self.assertEqual(expected["recordsTotal"], 13)
+
+    def test_list_jobs_skip_expired_entries_as_wsgi(self):
+        queue = Queue("q1")
+        jobs = [Job.create(func=fixtures.div_by_zero, origin="q1") for i in range(4)]
+        for i, job in enumerate(jobs):
+            job.save()
+            queue.failed_job_registry.add(job, ttl=100 + i)
+        # first one expired already, listings skip it without cleaning up
+        self.testconn.zadd(queue.failed_job_registry.key, {jobs[0].id: 1})
+
+        query_string = {
+            "start": 0,
+            "length": 2,
+            "draw": 3,
+            "queues[]": ["q1"],
+            "jobstatus[]": ["failed"],
+        }
+        status, _, body = self.asgi_get("/jobs", query_string=query_string)
+        self.assertEqual(status, HTTP_OK)
+        expected = json.loads(
+            self.client.get("/jobs", query_string=query_string).data.decode("utf-8")
+        )
+        self.assertEqual(json.loads(body.decode("utf-8")), expected)
+        self.assertEqual(expected["recordsTotal"], 3)
+        self.assertEqual(
+            [row["job_info"]["job_id"] for row in expected["data"]],
+            [jobs[1].id, jobs[2].id],
+        )
+        self.assertEqual(self.testconn.zcard(queue.failed_job_registry.key), 4)
+
+    def test_snapshots_shared_with_wsgi(self):
+        Queue(name="some_queue").enqueue_job(Job.create(func=fixtures.say_hello))
+        self.app.config["RQ_MONITOR_SNAPSHOT_TTL"] = 60
+        try:
+            expected = self.client.get("/queues").data
+            Queue(name="other_queue").enqueue_job(Job.create(func=fixtures.say_hello))
+            status, _, body = self.asgi_get("/queues")
+            self.assertEqual(status, HTTP_OK)
+            self.assertEqual(json.loads(body.decode("utf-8")), json.loads(expected))
+
+            query_string = {
+                "start": 0,
+                "length": 5,
+                "queues[]": ["some_queue"],
+                "jobstatus[]": ["queued"],
+            }
+            for draw in (1, 2):
+                query_string["draw"] = draw
+                status, _, body = self.asgi_get("/jobs", query_string=query_string)
+                self.assertEqual(json.loads(body.decode("utf-8"))["draw"], draw)
+            response = self.client.get("/jobs", query_string=dict(query_string, draw=7))
+            self.assertEqual(json.loads(response.data.decode("utf-8"))["draw"], 7)
+        finally:
+            self.app.config["RQ_MONITOR_SNAPSHOT_TTL"] = 0
+            self.app.snapshot_cache.invalidate()
+
+    def test_request_latencies_observed(self):
+        self.asgi_get("/queues")
+        self.asgi_get("/queues", query_string={"redis_instance_index": 5})
+        samples = "\n".join(self.app.request_latencies.samples())
+        self.assertIn('endpoint="rqmonitor.list_queues_api"', samples)
+
+    def test_list_all_instances(self):
+        some_queue = Queue(name="some_queue")
+        some_queue.enqueue_job(Job.create(func=fixtures.some_calculation, args=(3, 4)))
+        worker = Worker([Queue("q1")], name="worker1")
+        worker.register_birth()
+        query_string = {"all_instances": "true"}
+
+        status, _, body = self.asgi_get("/queues", query_string=query_string)
+        self.assertEqual(status, HTTP_OK)
+        self.assertEqual(
+            json.loads(body.decode("utf-8")),
+            json.loads(
+                self.client.get("/queues", query_string=query_string).data.decode(
+                    "utf-8"
+                )
+            ),
+        )
+
+        status, _, body = self.asgi_get("/workers", query_string=query_string)
+        workers = json.loads(body.decode("utf-8"))["data"]
+        self.assertEqual(workers[0]["worker_name"], "worker1")
+        self.assertEqual(workers[0]["redis_instance_index"], 0)
+
+    def test_redis_memory(self):
+        status, _, body = self.asgi_get("/redis/memory")
+        self.assertEqual(status, HTTP_OK)
+        self.assertIn("redis_memory_used", json.loads(body.decode("utf-8")))
+
+    def test_invalid_redis_instance_index(self):
+        status, _, _ = self.asgi_get(
+            "/queues", query_string={"redis_instance_index": 5}
+        )
+        self.assertEqual(status, HTTP_BAD_REQUEST)
+
+    def test_other_views_served_by_flask(self):
+        status, headers, body = self.asgi_get("/queues_dashboard")
+        self.assertEqual(status, HTTP_OK)
+        self.assertEqual(headers[b"cache-control"], b"no-store")
+        self.assertEqual(body, self.client.get("/queues_dashboard").data)
+
+    def test_streamed_views_served_by_flask(self):
+        some_queue = Queue(name="some_queue")
+        job = some_queue.enqueue_job(Job.create(func=fixtures.some_calculation))
+        query_string = {"queues[]": ["some_queue"], "jobstatus[]": ["queued"]}
+
+        status, headers, body = self.asgi_get("/jobs/export", query_string=query_string)
+        self.assertEqual(status, HTTP_OK)
+        self.assertNotIn(b"content-length", headers)
+        self.assertEqual(json.loads(body.decode("utf-8"))["job_id"], job.id)
+
+    def test_stream_sends_full_state_first(self):
+        some_queue = Queue(name="some_queue")
+        some_queue.enqueue_job(Job.create(func=fixtures.some_calculation))
+        scope = {"type": "http", "method": "GET", "path": "/stream"}
+        scope.update(query_string=b"", headers=[])
+        messages = []
+
+        async def request():
+            event_sent = asyncio.Event()
+
+            async def receive():
+                # disconnects once first event was sent
+                await event_sent.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                if message.get("body"):
+                    event_sent.set()
+
+            await asyncio.wait_for(self.asgi_app(scope, receive, send), 5)
+
+        self.loop.run_until_complete(request())
+        self.assertEqual(
+            dict(messages[0]["headers"])[b"content-type"],
+            b"text/event-stream; charset=utf-8",
+        )
+        event = messages[1]["body"].decode("utf-8")
+        self.assertTrue(event.startswith("data: "))
+        delta = json.loads(event[len("data: ") :])
+        self.assertTrue(delta["reset"])
+        self.assertEqual(delta["queues"]["changed"]["some_queue"]["job_count"], 1)
+        self.assertFalse(self.app.dashboard_samplers[0]._subscribers)
+
+    def test_basic_auth(self):
+        asgi_app = AsyncRQMonitor(self.app, username="admin", password="secret")
+
+        def authorization(credentials):
+            return "Basic " + base64.b64encode(credentials).decode("latin-1")
+
+        self.assertTrue(asgi_app.is_authorized(authorization(b"admin:secret")))
+        self.assertFalse(asgi_app.is_authorized(authorization(b"admin:wrong")))
+        self.assertFalse(asgi_app.is_authorized(authorization("admin:\u00e9".encode())))
+        self.assertFalse(asgi_app.is_authorized(None))
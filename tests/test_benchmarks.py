@@ -0,0 +1,61 @@
+import threading
+
+from tests import RQMonitorTestCase
+from benchmarks.runner import CommandCounter, percentile, run_benchmark
+from benchmarks.seed import seed
+from rqmonitor.utils import job_counts_in_queues_registries, list_all_queues_names
+
+
+class TestBenchmarks(RQMonitorTestCase):
+    def test_seed(self):
+        seed(self.testconn, queues=2, jobs=3, workers=1, payload_size=10)
+        queue_names = list_all_queues_names()
+        self.assertEqual(sorted(queue_names), ["bench-queue-0", "bench-queue-1"])
+        job_counts = job_counts_in_queues_registries(
+            queue_names, ["queued", "failed", "scheduled", "deferred"]
+        )
+        for counts in job_counts.values():
+            self.assertEqual(set(counts.values()), {3})
+
+    def test_command_counter(self):
+        with CommandCounter() as counter:
+            self.testconn.get("somekey")
+            with self.testconn.pipeline() as pipeline:
+                pipeline.get("somekey").llen("somekey").get("otherkey")
+                pipeline.execute()
+            self.assertEqual(counter.take(), {"GET": 3, "LLEN": 1})
+            self.assertEqual(counter.take(), {})
+            for name in ("rqmonitor-memory-estimator", "rqmonitor-bulk-task"):
+                thread = threading.Thread(
+                    target=self.testconn.get, args=("somekey",), name=name
+                )
+                thread.start()
+                thread.join()
+            # background samplers are left out, bulk tasks work for requests
+            self.assertEqual(counter.take(), {"GET": 1})
+        self.testconn.get("somekey")
+        self.assertEqual(counter.take(), {})
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile([3, 1, 2, 4], 99), 4)
+
+    def test_run_benchmark(self):
+        results = run_benchmark(
+            self.testconn,
+            self.app.config["RQ_MONITOR_REDIS_URL"],
+            queues=2,
+            jobs=2,
+            workers=1,
+            payload_size=10,
+            runs=2,
+            bulk_runs=1,
+        )
+        self.assertEqual(results["shape"]["queues"], 2)
+        self.assertIn("Lua script", results["redis_commands_note"])
+        self.assertIn("GET /jobs", results["endpoints"])
+        self.assertIn("POST /queues/delete/all", results["endpoints"])
+        queues = results["endpoints"]["GET /queues"]
+        self.assertEqual(queues["runs"], 2)
+        # queue list is cached after first request, its size alone is checked
+        self.assertEqual(queues["redis_commands_by_name"], {"SCARD": 1, "LLEN": 2})
+        self.assertLessEqual(queues["p50_ms"], queues["p99_ms"])
+        self.assertEqual(self.testconn.dbsize(), 0)
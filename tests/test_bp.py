@@ -1,16 +1,29 @@
 import sys
 import os
 import json
+import gzip
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.join(os.getcwd(), "../"))
 
-from tests import RQMonitorTestCase
+from tests import RQMonitorTestCase, CommandCounter
 from tests import fixtures
 from rq.job import Job
 from rq.queue import Queue
+from rq.worker import Worker
+from rqmonitor.defaults import RQ_MONITOR_REDIS_MAX_CONNECTIONS
+from flask import Flask
+from jinja2 import Template
+from rqmonitor.bp import MonitorBlueprint, monitor_blueprint, bulk_queues_message
 
 HTTP_OK = 200
+HTTP_ACCEPTED = 202
+HTTP_NOT_MODIFIED = 304
 HTTP_BAD_REQUEST = 400
+HTTP_NOT_FOUND = 404
 HTTP_INTERNAL_ERROR = 500
 HTTP_METHOD_NOT_ALLOWED = 405
 
@@ -20,6 +33,110 @@ class TestBlueprintViews(RQMonitorTestCase):
         response = self.client.get("/")
         self.assertEqual(response.status_code, HTTP_OK)
 
+    def test_dashboard_does_no_redis_work(self):
+        Queue(name="some_queue").enqueue_job(Job.create(func=fixtures.say_hello))
+        # app is set up on its first request, leave that out
+        self.client.get("/")
+        with CommandCounter() as counter:
+            response = self.client.get("/")
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(counter.counts, {})
+        self.assertNotIn(b"some_queue", response.data)
+
+        with CommandCounter() as counter:
+            response = self.client.get("/queues/sidebar")
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertIn(b'id="some_queue"', response.data)
+        self.assertIn("SCARD", counter.counts)
+
+    def test_compressed_responses(self):
+        for i in range(50):
+            Queue(name="some_queue_{0}".format(i)).enqueue_job(
+                Job.create(func=fixtures.say_hello)
+            )
+        plain = self.client.get("/queues")
+        self.assertNotIn("Content-Encoding", plain.headers)
+
+        response = self.client.get("/queues", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        etag, weak = response.get_etag()
+        self.assertTrue(weak)
+        self.assertEqual(etag, plain.get_etag()[0])
+        response = self.client.get(
+            "/queues",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": 'W/"{0}"'.format(etag),
+            },
+        )
+        self.assertEqual(response.status_code, HTTP_NOT_MODIFIED)
+
+        # small payloads are not worth it
+        response = self.client.get("/redis/memory", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+
+    def test_static_assets(self):
+        filename = "nunjucks/error.html"
+        fingerprint = monitor_blueprint.static_fingerprint(filename)
+        response = self.client.get("/")
+        self.assertIn(
+            "/static/{0}?v={1}".format(filename, fingerprint).encode("utf-8"),
+            response.data,
+        )
+        self.assertEqual(response.headers["Cache-Control"], "no-store")
+
+        response = self.client.get(
+            "/static/" + filename, query_string={"v": fingerprint}
+        )
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertNotIn("Content-Encoding", response.headers)
+        body = response.data
+        response.close()
+        response = self.client.get("/static/" + filename, query_string={"v": "stale"})
+        self.assertNotIn("immutable", response.headers.get("Cache-Control", ""))
+        response.close()
+
+        # precompressed siblings are written to a static folder of a test app,
+        # never to the one of the package
+        with tempfile.TemporaryDirectory() as static_folder:
+            path = os.path.join(static_folder, "error.html")
+            with open(path, "wb") as f:
+                f.write(body)
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(body))
+            app = Flask(__name__)
+            app.register_blueprint(
+                MonitorBlueprint(
+                    "precompressed",
+                    __name__,
+                    static_folder=static_folder,
+                    static_url_path="/static",
+                ),
+                url_prefix="/precompressed",
+            )
+            client = app.test_client()
+            response = client.get(
+                "/precompressed/static/error.html",
+                headers={"Accept-Encoding": "br, gzip"},
+            )
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+            self.assertEqual(response.mimetype, "text/html")
+            self.assertEqual(gzip.decompress(response.data), body)
+            response.close()
+
+            # a sibling older than its asset is stale, asset is sent as is
+            os.utime(path + ".gz", (0, 0))
+            response = client.get(
+                "/precompressed/static/error.html",
+                headers={"Accept-Encoding": "br, gzip"},
+            )
+            self.assertNotIn("Content-Encoding", response.headers)
+            self.assertEqual(response.data, body)
+            response.close()
+
     def test_job_cancel_without_id(self):
         response = self.client.post("/jobs/cancel")
         self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
@@ -94,17 +211,102 @@ class TestBlueprintViews(RQMonitorTestCase):
         response = self.client.post("/queues/empty/all")
 
         self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(
+            json.loads(response.data.decode("utf-8"))["message"],
+            "Successfully emptied 4 queues: q1, q2, q3, q4",
+        )
         for queue in some_queues_instances:
             self.assertEqual(queue.is_empty(), True)
 
+    def test_bulk_queues_message(self):
+        queue_names = ["q{0}".format(i) for i in range(30)]
+        stop_event = threading.Event()
+        self.assertEqual(
+            bulk_queues_message("deleted", queue_names[:2], queue_names[:2], {}),
+            "Successfully deleted 2 queues: q0, q1",
+        )
+        stop_event.set()
+        self.assertEqual(
+            bulk_queues_message(
+                "deleted", queue_names[:25], queue_names, {"stop_event": stop_event}
+            ),
+            "Cancelled part-way, deleted 25 of 30 queues: {0} and 5 more".format(
+                ", ".join(queue_names[:20])
+            ),
+        )
+        self.assertEqual(
+            bulk_queues_message("emptied", [], queue_names, {"stop_event": stop_event}),
+            "Cancelled part-way, emptied 0 of 30 queues",
+        )
+
     def test_redis_memory(self):
         response = self.client.get("/redis/memory")
         self.assertIn("redis_memory_used", json.loads(response.data.decode("utf-8")))
 
+    def test_redis_memory_refresh(self):
+        response = self.client.get("/redis/memory", query_string={"refresh": "true"})
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertIn(
+            "redis_memory_updated_at", json.loads(response.data.decode("utf-8"))
+        )
+
     def test_requeue_failed_jobs_without_queuelist(self):
         response = self.client.post("/jobs/requeue/all", data={})
         self.assertEqual(response.status_code, HTTP_OK)
 
+    def test_requeue_failed_jobs(self):
+        queue = Queue("q1")
+        job = Job.create(func=fixtures.div_by_zero, args=(1,), origin="q1")
+        job.save()
+        queue.failed_job_registry.add(job, ttl=100)
+        response = self.client.post("/jobs/requeue/all", data={"queues[]": ["q1"]})
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(
+            json.loads(response.data.decode("utf-8"))["message"],
+            "Successfully requeued 1 jobs on 1 queues: q1",
+        )
+        self.assertEqual(queue.get_job_ids(), [job.id])
+
+    def test_bulk_task_progress(self):
+        queue = Queue("q1")
+        for i in range(5):
+            job = Job.create(func=fixtures.some_calculation, args=(3, 4))
+            queue.enqueue_job(job)
+        self.app.config["RQ_MONITOR_TASK_WAIT"] = 0
+        try:
+            response = self.client.post("/jobs/cancel/all", data={"queues[]": ["q1"]})
+        finally:
+            self.app.config["RQ_MONITOR_TASK_WAIT"] = 10
+        self.assertIn(response.status_code, (HTTP_OK, HTTP_ACCEPTED))
+        task = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(task["total"], 5)
+
+        for i in range(50):
+            response = self.client.get("/tasks/{0}".format(task["task_id"]))
+            self.assertEqual(response.status_code, HTTP_OK)
+            task = json.loads(response.data.decode("utf-8"))
+            if task["status"] == "finished":
+                break
+            time.sleep(0.1)
+        self.assertEqual(task["processed"], 5)
+        self.assertEqual(
+            task["message"], "Successfully cancelled 5 jobs on 1 queues: q1"
+        )
+        self.assertEqual(len(queue), 0)
+
+        response = self.client.get("/tasks")
+        self.assertIn(
+            task["task_id"],
+            [
+                listed_task["task_id"]
+                for listed_task in json.loads(response.data.decode("utf-8"))["data"]
+            ],
+        )
+        response = self.client.post("/tasks/{0}/cancel".format(task["task_id"]))
+        self.assertEqual(response.status_code, HTTP_OK)
+        response = self.client.get("/tasks/somenonexistentid")
+        self.assertEqual(response.status_code, HTTP_NOT_FOUND)
+
     def test_jobs_pagination_non_overlap(self):
         q1 = Queue("q1")
         q2 = Queue("q2")
@@ -188,3 +390,253 @@ class TestBlueprintViews(RQMonitorTestCase):
         }
         response = self.client.get("/jobs", query_string=query_string)
         self.assertEqual(response.status_code, HTTP_OK)
+
+    def test_redis_connection_reused_across_requests(self):
+        self.client.get("/queues", query_string={"redis_instance_index": 0})
+        redis_connections = self.app.redis_connections
+        connection = redis_connections[0]
+        self.client.get("/queues", query_string={"redis_instance_index": 0})
+        self.assertIs(self.app.redis_connections, redis_connections)
+        self.assertIs(self.app.redis_connections[0], connection)
+        self.assertEqual(
+            connection.connection_pool.max_connections,
+            RQ_MONITOR_REDIS_MAX_CONNECTIONS,
+        )
+
+    def test_invalid_redis_instance_index(self):
+        response = self.client.get("/queues", query_string={"redis_instance_index": 5})
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_list_all_instances(self):
+        Queue("q1").enqueue_job(Job.create(func=fixtures.some_calculation, args=(3, 4)))
+        response = self.client.get("/queues", query_string={"all_instances": "true"})
+        self.assertEqual(response.status_code, HTTP_OK)
+        payload = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(payload["errors"], [])
+        self.assertEqual(
+            payload["data"],
+            [
+                {
+                    "queue_name": "q1",
+                    "job_count": 1,
+                    "redis_instance_index": 0,
+                    "redis_instance": self.app.config["RQ_MONITOR_REDIS_URL"][0][
+                        len("redis://") :
+                    ],
+                }
+            ],
+        )
+
+        response = self.client.get(
+            "/registries", query_string={"all_instances": "true"}
+        )
+        row = json.loads(response.data.decode("utf-8"))["data"][0]
+        self.assertEqual(row["queued"], 1)
+        self.assertEqual(row["failed"], 0)
+        self.assertEqual(row["redis_instance_index"], 0)
+
+    def test_timeseries(self):
+        Queue("q1").enqueue_job(Job.create(func=fixtures.some_calculation, args=(3, 4)))
+        self.client.get("/")
+        self.app.timeseries_samplers[0].sample()
+        response = self.client.get(
+            "/metrics/timeseries",
+            query_string={"queues[]": ["q1"], "jobstatus[]": ["queued"]},
+        )
+        self.assertEqual(response.status_code, HTTP_OK)
+        history = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(history["series"]["q1"]["queued"][-1], 1)
+        self.assertEqual(
+            len(history["timestamps"]), len(history["series"]["q1"]["queued"])
+        )
+
+        response = self.client.get(
+            "/metrics/timeseries", query_string={"jobstatus[]": ["unknown"]}
+        )
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_list_workers(self):
+        worker = Worker([Queue("q1")], name="worker1")
+        worker.register_birth()
+        response = self.client.get("/workers")
+        self.assertEqual(response.status_code, HTTP_OK)
+        workers = json.loads(response.data.decode("utf-8"))["data"]
+        self.assertEqual(len(workers), 1)
+        self.assertEqual(workers[0]["worker_name"], "worker1")
+        self.assertEqual(workers[0]["listening_on"], "q1")
+
+    def test_list_jobs_search(self):
+        some_queue = Queue(name="some_queue")
+        for i in range(3):
+            job = Job.create(func=fixtures.say_hello, args=("Jane",))
+            some_queue.enqueue_job(job)
+        job = Job.create(func=fixtures.some_calculation, args=(3, 4))
+        some_queue.enqueue_job(job)
+
+        query_string = {
+            "start": 0,
+            "length": 2,
+            "draw": 1,
+            "queues[]": ["some_queue"],
+            "jobstatus[]": ["queued", "failed"],
+            "search[value]": "say_hello",
+        }
+        response = self.client.get("/jobs", query_string=query_string)
+        json_resp = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(json_resp["recordsTotal"], 4)
+        self.assertEqual(json_resp["recordsFiltered"], 3)
+        self.assertEqual(len(json_resp["data"]), 2)
+
+    def test_list_jobs_fields_projection(self):
+        some_queue = Queue(name="some_queue")
+        job = Job.create(func=fixtures.some_calculation, args=(3, 4), kwargs=dict(z=2))
+        some_queue.enqueue_job(job)
+
+        query_string = {
+            "start": 0,
+            "length": 10,
+            "draw": 1,
+            "queues[]": ["some_queue"],
+            "jobstatus[]": ["queued"],
+            "fields": "status,origin",
+        }
+        response = self.client.get("/jobs", query_string=query_string)
+        job_info = json.loads(response.data.decode("utf-8"))["data"][0]["job_info"]
+        self.assertEqual(
+            job_info,
+            {"job_id": job.id, "job_status": "queued", "job_queue": "some_queue"},
+        )
+        # job info template leaves the traceback toggle out of projected rows
+        template = self.client.get("/static/nunjucks/job_info.html").data
+        rendered = Template(template.decode("utf-8")).render(job_data=job_info)
+        self.assertIn("status: <strong>queued</strong>", rendered)
+        self.assertNotIn("job-exc-info-toggle", rendered)
+
+        query_string["fields"] = "status,data"
+        response = self.client.get("/jobs", query_string=query_string)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_export_jobs(self):
+        some_queue = Queue(name="some_queue")
+        jobs = [
+            some_queue.enqueue_job(Job.create(func=fixtures.say_hello, args=("Jane",)))
+            for i in range(3)
+        ]
+        jobs[2].exc_info = "Traceback (most recent call last):\nValueError: went wrong"
+        jobs[2].save()
+        some_queue.failed_job_registry.add(jobs[2], ttl=100)
+
+        query_string = {
+            "queues[]": ["some_queue"],
+            "jobstatus[]": ["queued", "failed"],
+            "fields": "status,exc_info",
+        }
+        response = self.client.get("/jobs/export", query_string=query_string)
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertIn("jobs.ndjson", response.headers["Content-Disposition"])
+        rows = [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+        self.assertEqual(
+            [(row["job_id"], row["registry"]) for row in rows],
+            [(job.id, "queued") for job in jobs] + [(jobs[2].id, "failed")],
+        )
+        self.assertEqual(rows[-1]["exc_info"], jobs[2].exc_info)
+        self.assertEqual(set(rows[0]), {"job_id", "registry", "status", "exc_info"})
+
+        query_string["format"] = "csv"
+        response = self.client.get("/jobs/export", query_string=query_string)
+        self.assertEqual(response.mimetype, "text/csv")
+        lines = response.data.decode("utf-8").splitlines()
+        self.assertEqual(lines[0], "job_id,registry,status,exc_info")
+        self.assertEqual(lines[1], "{0},queued,queued,".format(jobs[0].id))
+
+        query_string["format"] = "xml"
+        response = self.client.get("/jobs/export", query_string=query_string)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_job_exc_info(self):
+        some_queue = Queue(name="some_queue")
+        job = Job.create(func=fixtures.some_calculation, args=(3, 4), kwargs=dict(z=2))
+        some_queue.enqueue_job(job)
+        job.exc_info = "Traceback (most recent call last):\nValueError: went wrong"
+        job.save()
+
+        response = self.client.get("/jobs/{0}/exc_info".format(job.id))
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(
+            json.loads(response.data.decode("utf-8"))["exc_info"], job.exc_info
+        )
+
+        response = self.client.get("/jobs/somenonexistentid/exc_info")
+        self.assertEqual(response.status_code, HTTP_NOT_FOUND)
+
+    def test_stream_sends_full_state_first(self):
+        some_queue = Queue(name="some_queue")
+        job = Job.create(func=fixtures.some_calculation, args=(3, 4), kwargs=dict(z=2))
+        some_queue.enqueue_job(job)
+
+        response = self.client.get("/stream", buffered=False)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        event = next(response.response).decode("utf-8")
+        response.close()
+
+        self.assertTrue(event.startswith("data: "))
+        delta = json.loads(event[len("data: ") :])
+        self.assertTrue(delta["reset"])
+        self.assertEqual(
+            delta["queues"]["changed"]["some_queue"],
+            {"queue_name": "some_queue", "job_count": 1},
+        )
+        self.assertEqual(delta["registries"]["changed"]["some_queue"]["queued"], 1)
+
+    def test_metrics(self):
+        Queue("q1").enqueue_job(Job.create(func=fixtures.some_calculation, args=(3, 4)))
+        worker = Worker([Queue("q1")], name="w1")
+        worker.register_birth()
+        worker.set_state("busy")
+        Worker([Queue("q1")], name="w2").register_birth()
+        self.client.get("/queues")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        lines = response.data.decode("utf-8").splitlines()
+        self.assertIn('rq_up{redis_instance="0"} 1', lines)
+        self.assertIn('rq_jobs{redis_instance="0",queue="q1",status="queued"} 1', lines)
+        self.assertIn('rq_jobs{redis_instance="0",queue="q1",status="failed"} 0', lines)
+        self.assertIn('rq_workers{redis_instance="0",state="?"} 1', lines)
+        self.assertIn('rq_workers{redis_instance="0",state="busy"} 1', lines)
+        self.assertIn('rq_workers_suspended{redis_instance="0"} 0', lines)
+        latency_count = (
+            "rqmonitor_request_duration_seconds_count"
+            '{endpoint="rqmonitor.list_queues_api",method="GET"} '
+        )
+        self.assertTrue(any(line.startswith(latency_count) for line in lines))
+
+        # served from cache until RQ_MONITOR_METRICS_TTL is over
+        Queue("q2").enqueue_job(Job.create(func=fixtures.some_calculation, args=(3, 4)))
+        response = self.client.get("/metrics")
+        self.assertNotIn('queue="q2"', response.data.decode("utf-8"))
+
+    def test_queue_analytics(self):
+        queue = Queue("q1")
+        job = Job.create(func=fixtures.some_calculation, args=(3, 4), origin="q1")
+        job.enqueued_at = datetime(2020, 1, 1)
+        job.started_at = job.enqueued_at + timedelta(seconds=2)
+        job.ended_at = job.started_at + timedelta(seconds=1)
+        job.save()
+        queue.finished_job_registry.add(job, ttl=100)
+        queue.enqueue_job(Job.create(func=fixtures.some_calculation, args=(3, 4)))
+
+        response = self.client.get(
+            "/queues/analytics", query_string={"queues[]": ["q1", "unknown"]}
+        )
+        self.assertEqual(response.status_code, HTTP_OK)
+        rows = json.loads(response.data.decode("utf-8"))["data"]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["func_name"], None)
+        self.assertEqual(rows[0]["wait_time"]["p99"], 2)
+        self.assertEqual(rows[1]["run_time"]["p50"], 1)
+
+        response = self.client.get("/queues/analytics")
+        self.assertEqual(json.loads(response.data.decode("utf-8"))["data"], [])
+        self.assertEqual(list(self.app.latency_analytics[0]._queues), ["q1"])
@@ -1,9 +1,11 @@
 import unittest
 import sys
 import os
+import json
 import redis
 from rq import pop_connection, push_connection
 from rqmonitor.cli import create_app_with_blueprint
+from rqmonitor.decorators import snapshot_key
 
 sys.path.insert(0, os.path.join(os.getcwd(), "../"))
 
@@ -32,3 +34,57 @@ class TestDecorators(unittest.TestCase):
     def test_cache_control_no_store(self):
         response = self.client.get("/")
         self.assertEqual(response.headers["Cache-Control"], "no-store")
+
+    def test_snapshot_cached(self):
+        self.app.config["RQ_MONITOR_SNAPSHOT_TTL"] = 60
+        self.client.get("/queues", query_string={"_": 1})
+        stats = self.app.snapshot_cache.stats()
+        self.client.get("/queues", query_string={"_": 2})
+        self.assertEqual(self.app.snapshot_cache.stats()["hits"], stats["hits"] + 1)
+
+        query_string = {"start": 0, "length": 10, "queues[]": ["q1"], "draw": 7}
+        query_string["jobstatus[]"] = ["queued"]
+        self.client.get("/jobs", query_string=query_string)
+        query_string["draw"] = 8
+        response = self.client.get("/jobs", query_string=query_string)
+        self.assertEqual(json.loads(response.data.decode("utf-8"))["draw"], 8)
+        self.assertEqual(self.app.snapshot_cache.stats()["hits"], stats["hits"] + 2)
+
+        # actions invalidate snapshots of the instance
+        self.client.post("/workers/resume")
+        self.assertEqual(self.app.snapshot_cache.stats()["entries"], 0)
+
+    def test_snapshot_cached_all_instances(self):
+        self.app.config["RQ_MONITOR_SNAPSHOT_TTL"] = 60
+        query_string = {"all_instances": "true", "redis_instance_index": 0}
+        self.client.get("/queues", query_string=query_string)
+        # merged rows don't depend on the requested instance
+        self.assertEqual(
+            snapshot_key(1, "/queues", [("all_instances", "true")]),
+            snapshot_key(0, "/queues", [("all_instances", "true")]),
+        )
+        self.assertIn(
+            ("all", "/queues", (("all_instances", "true"),)),
+            self.app.snapshot_cache._entries,
+        )
+
+        # and include rows of whichever instance an action changed
+        self.app.snapshot_cache.invalidate(1)
+        self.assertEqual(self.app.snapshot_cache.stats()["entries"], 0)
+
+    def test_etag_conditional(self):
+        response = self.client.get("/queues")
+        etag = response.headers["ETag"]
+        response = self.client.get("/queues", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        # draw changes on every datatables request but is not part of payload identity
+        query_string = {"start": 0, "length": 10, "queues[]": ["q1"], "draw": 1}
+        query_string["jobstatus[]"] = ["queued"]
+        etag = self.client.get("/jobs", query_string=query_string).headers["ETag"]
+        query_string["draw"] = 2
+        response = self.client.get(
+            "/jobs", query_string=query_string, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)